@@ -0,0 +1,180 @@
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from collector import get_collector, make_source
+
+
+# Headless mode: run the shared collector without the Streamlit UI and expose
+# its latest snapshot at /metrics in the Prometheus text format.
+#
+# The exposition text is rendered at most once per collector sample and then
+# served from memory, so any number of scrapers cost a dictionary lookup each
+# and never trigger psutil/NVML calls of their own.
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+PREFIX = "taskmanager_"
+
+
+def _escape(value):
+    # Label values as the text exposition format requires
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _metric(lines, name, kind, help_text, samples):
+    lines.append(f"# HELP {PREFIX}{name} {help_text}")
+    lines.append(f"# TYPE {PREFIX}{name} {kind}")
+    for labels, value in samples:
+        if value is None:
+            continue
+        if labels:
+            label_text = ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+            lines.append(f"{PREFIX}{name}{{{label_text}}} {value}")
+        else:
+            lines.append(f"{PREFIX}{name} {value}")
+
+
+def render_metrics(snapshot):
+    lines = []
+    if not snapshot:
+        return ""
+
+    _metric(lines, "cpu_percent", "gauge", "Total CPU utilisation.",
+            [({}, snapshot["cpu_percent"])])
+    _metric(lines, "cpu_core_percent", "gauge", "Per logical core CPU utilisation.",
+            [({"core": core}, value) for core, value in enumerate(snapshot["cpu_cores_percent"])])
+    if snapshot["cpu_freq"] is not None:
+        _metric(lines, "cpu_frequency_mhz", "gauge", "Current CPU frequency.",
+                [({}, snapshot["cpu_freq"].current)])
+
+    svmem = snapshot["memory"]
+    _metric(lines, "memory_total_bytes", "gauge", "Total physical memory.", [({}, svmem.total)])
+    _metric(lines, "memory_available_bytes", "gauge", "Available physical memory.", [({}, svmem.available)])
+    _metric(lines, "memory_used_bytes", "gauge", "Used physical memory.", [({}, svmem.used)])
+    _metric(lines, "memory_percent", "gauge", "Physical memory utilisation.", [({}, svmem.percent)])
+    _metric(lines, "swap_used_bytes", "gauge", "Used swap.", [({}, snapshot["swap"].used)])
+
+    _metric(lines, "disk_percent", "gauge", "Root filesystem utilisation.", [({}, snapshot["disk_percent"])])
+    _metric(lines, "disk_read_bytes_per_second", "gauge", "Read rate summed over whole disks.",
+            [({}, snapshot["disk_read_rate"])])
+    _metric(lines, "disk_write_bytes_per_second", "gauge", "Write rate summed over whole disks.",
+            [({}, snapshot["disk_write_rate"])])
+
+    _metric(lines, "network_sent_bytes_total", "counter", "Bytes sent on all interfaces.",
+            [({}, snapshot["network_sent"])])
+    _metric(lines, "network_received_bytes_total", "counter", "Bytes received on all interfaces.",
+            [({}, snapshot["network_recv"])])
+    _metric(lines, "network_sent_bytes_per_second", "gauge", "Send rate over non-loopback interfaces.",
+            [({}, snapshot["network_sent_rate"])])
+    _metric(lines, "network_received_bytes_per_second", "gauge", "Receive rate over non-loopback interfaces.",
+            [({}, snapshot["network_recv_rate"])])
+
+    gpus = snapshot["gpus"]
+    _metric(lines, "gpu_utilization_percent", "gauge", "GPU utilisation.",
+            [({"gpu": g.index}, g.utilization) for g in gpus])
+    _metric(lines, "gpu_memory_used_bytes", "gauge", "GPU memory in use.",
+            [({"gpu": g.index}, g.memory_used) for g in gpus])
+    _metric(lines, "gpu_memory_total_bytes", "gauge", "GPU memory size.",
+            [({"gpu": g.index}, g.memory_total) for g in gpus])
+    _metric(lines, "gpu_power_watts", "gauge", "GPU power draw.",
+            [({"gpu": g.index}, g.power) for g in gpus])
+    _metric(lines, "gpu_temperature_celsius", "gauge", "GPU core temperature.",
+            [({"gpu": g.index}, g.temperature) for g in gpus])
+    _metric(lines, "cpu_power_watts", "gauge", "Estimated CPU power draw.", [({}, snapshot["cpu_power"])])
+
+    battery = snapshot["battery"]
+    if battery is not None:
+        _metric(lines, "battery_percent", "gauge", "Battery charge.", [({}, battery.percent)])
+        _metric(lines, "battery_power_plugged", "gauge", "1 when running on AC power.",
+                [({}, int(bool(battery.power_plugged)))])
+
+    stats = snapshot.get("cgroup")
+    if stats is not None:
+        _metric(lines, "cgroup_cpu_limit_cores", "gauge", "CPU quota of the container's cgroup.",
+                [({}, stats["cpu_limit"])])
+        _metric(lines, "cgroup_cpu_throttled_percent", "gauge", "Share of CFS periods that were throttled.",
+                [({}, stats["throttled_percent"])])
+        _metric(lines, "cgroup_cpu_throttled_ms_per_second", "gauge", "Time spent throttled per second.",
+                [({}, stats["throttled_ms_per_s"])])
+        _metric(lines, "cgroup_pressure_some_avg10", "gauge", "PSI: share of time some tasks stalled (10 s average).",
+                [({"resource": r}, stats[f"{r}_some_avg10"]) for r in ("cpu", "memory", "io")])
+        _metric(lines, "cgroup_pressure_full_avg10", "gauge", "PSI: share of time all tasks stalled (10 s average).",
+                [({"resource": r}, stats[f"{r}_full_avg10"]) for r in ("memory", "io")])
+        _metric(lines, "cgroup_io_read_bytes_per_second", "gauge", "Read rate of the cgroup.",
+                [({}, stats["io_read_rate"])])
+        _metric(lines, "cgroup_io_write_bytes_per_second", "gauge", "Write rate of the cgroup.",
+                [({}, stats["io_write_rate"])])
+
+    if "alerts_firing" in snapshot:
+        _metric(lines, "alert_firing", "gauge", "1 for every alert rule currently firing.",
+                [({"rule": name}, 1) for name in snapshot["alerts_firing"]])
+
+    _metric(lines, "processes", "gauge", "Number of processes.", [({}, len(snapshot["processes"]))])
+    _metric(lines, "last_sample_timestamp_seconds", "gauge", "Unix time of the cached sample.",
+            [({}, snapshot["time"])])
+
+    lines.append("")
+    return "\n".join(lines)
+
+
+class MetricsExporter:
+    def __init__(self, collector):
+        self.collector = collector
+        self._lock = threading.Lock()
+        self._rendered_for = None
+        self._payload = b""
+
+    def payload(self):
+        self.collector.touch()  # A scraper counts as someone watching
+        snapshot = self.collector.snapshot()
+        sample_time = snapshot.get("time") if snapshot else None
+        with self._lock:
+            if sample_time != self._rendered_for:
+                self._payload = render_metrics(snapshot).encode("utf-8")
+                self._rendered_for = sample_time
+            return self._payload
+
+
+def make_handler(exporter):
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?", 1)[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = exporter.payload()
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # Scrapes every few seconds would flood stderr
+
+    return MetricsHandler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the Task Manager collector without the UI.")
+    parser.add_argument("--agent", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--host", default="127.0.0.1", help="address to bind the /metrics endpoint to")
+    parser.add_argument("--port", type=int, default=9877, help="port for the /metrics endpoint")
+    parser.add_argument("--interval", type=float, default=1.0, help="sampling interval in seconds")
+    parser.add_argument("--source", choices=["psutil", "procfs", "auto", "cgroup"], default=None,
+                        help="metrics source (default: $TASK_MANAGER_SOURCE or psutil)")
+    args = parser.parse_args(argv)
+
+    collector = get_collector(interval=args.interval, source=make_source(args.source))
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(MetricsExporter(collector)))
+    print(f"Serving metrics on http://{args.host}:{server.server_port}/metrics")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        collector.stop()
+
+
+if __name__ == "__main__":
+    main()
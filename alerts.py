@@ -0,0 +1,394 @@
+import json
+import logging
+import math
+import os
+import queue
+import threading
+import urllib.request
+from collections import deque
+
+
+# Alert rules evaluated against the live sample stream.
+#
+# A rule watches one metric (a collector series name such as "cpu", or
+# "process:<name>:rss" / "process:<name>:cpu" for per-process totals) through
+# a windowed aggregate, e.g.
+#
+#   {"name": "cpu-hot", "metric": "cpu", "aggregate": "avg", "window": 120,
+#    "op": ">", "threshold": 90, "clear": 80, "for": 0, "cooldown": 600}
+#
+# Aggregates update incrementally as samples arrive (running sums, monotonic
+# deques, fixed-bin histograms), and rules with the same metric, aggregate and
+# window share one instance, so hundreds of rules cost little more than the
+# distinct windows they use. Fired and resolved events go to sinks: any
+# callable taking the event dict (LogSink, WebhookSink, or a list's append in
+# tests).
+
+logger = logging.getLogger("task_manager.alerts")
+
+# Aggregates over a partly filled window are not trusted until the samples
+# cover this fraction of it
+MIN_COVERAGE = 0.8
+
+
+class Aggregate:
+    def __init__(self, window):
+        self.window = window
+        self._samples = deque()
+
+    def add(self, t, value):
+        self._samples.append((t, value))
+        self._added(t, value)
+        cutoff = t - self.window
+        while self._samples[0][0] < cutoff:
+            old_t, old_value = self._samples.popleft()
+            self._removed(old_t, old_value)
+
+    @property
+    def ready(self):
+        if not self._samples:
+            return False
+        return self._samples[-1][0] - self._samples[0][0] >= self.window * MIN_COVERAGE
+
+    def _added(self, t, value):
+        pass
+
+    def _removed(self, t, value):
+        pass
+
+
+class Last(Aggregate):
+    @property
+    def ready(self):
+        return bool(self._samples)
+
+    def value(self):
+        return self._samples[-1][1]
+
+
+class Mean(Aggregate):
+    def __init__(self, window):
+        super().__init__(window)
+        self._sum = 0.0
+
+    def _added(self, t, value):
+        self._sum += value
+
+    def _removed(self, t, value):
+        self._sum -= value
+
+    def value(self):
+        return self._sum / len(self._samples)
+
+
+class Extreme(Aggregate):
+    # Running max (or min) with a monotonic deque: amortised O(1) per sample
+    def __init__(self, window, largest=True):
+        super().__init__(window)
+        self.largest = largest
+        self._candidates = deque()
+
+    def _added(self, t, value):
+        candidates = self._candidates
+        if self.largest:
+            while candidates and candidates[-1][1] <= value:
+                candidates.pop()
+        else:
+            while candidates and candidates[-1][1] >= value:
+                candidates.pop()
+        candidates.append((t, value))
+
+    def _removed(self, t, value):
+        if self._candidates and self._candidates[0][0] <= t:
+            self._candidates.popleft()
+
+    def value(self):
+        return self._candidates[0][1]
+
+
+class Percentile(Aggregate):
+    # Fixed geometric bins (~5% wide) from 1e-3 up to 1e15, so memory and
+    # query cost do not depend on the window length. The answer is the upper
+    # edge of the bin holding the requested rank.
+    RATIO = 1.05
+    LOW = 1e-3
+    BINS = int(math.log(1e18) / math.log(RATIO)) + 2
+
+    def __init__(self, window, q):
+        super().__init__(window)
+        self.q = q
+        self._counts = [0] * self.BINS
+
+    def _bin(self, value):
+        if value <= self.LOW:
+            return 0
+        return min(int(math.log(value / self.LOW) / math.log(self.RATIO)) + 1, self.BINS - 1)
+
+    def _added(self, t, value):
+        self._counts[self._bin(value)] += 1
+
+    def _removed(self, t, value):
+        self._counts[self._bin(value)] -= 1
+
+    def value(self):
+        rank = math.ceil(self.q / 100.0 * len(self._samples))
+        seen = 0
+        for i, count in enumerate(self._counts):
+            seen += count
+            if seen >= rank:
+                return self.LOW * self.RATIO ** i
+        return self.LOW * self.RATIO ** (self.BINS - 1)
+
+
+class Rate(Aggregate):
+    # Change per ``per`` seconds between the oldest and newest sample
+    def __init__(self, window, per=1.0):
+        super().__init__(window)
+        self.per = per
+
+    def value(self):
+        (t0, v0), (t1, v1) = self._samples[0], self._samples[-1]
+        return (v1 - v0) / (t1 - t0) * self.per if t1 > t0 else 0.0
+
+
+def make_aggregate(kind, window):
+    if kind == "last":
+        return Last(window)
+    if kind == "avg":
+        return Mean(window)
+    if kind == "max":
+        return Extreme(window, largest=True)
+    if kind == "min":
+        return Extreme(window, largest=False)
+    if kind == "rate_per_s":
+        return Rate(window, 1.0)
+    if kind == "rate_per_min":
+        return Rate(window, 60.0)
+    if kind.startswith("p") and kind[1:].replace(".", "", 1).isdigit():
+        return Percentile(window, float(kind[1:]))
+    raise ValueError(f"Unknown aggregate {kind!r}")
+
+
+OPERATORS = {
+    ">": lambda a, b: a > b,
+    ">=": lambda a, b: a >= b,
+    "<": lambda a, b: a < b,
+    "<=": lambda a, b: a <= b,
+}
+
+
+class Rule:
+    def __init__(self, name, metric, threshold, op=">", aggregate="last", window=60, clear=None,
+                 for_seconds=0, cooldown=300, severity="warning", message=None):
+        # ``clear`` is the hysteresis level: a firing rule only resolves once
+        # the value is back past it (defaults to ``threshold``)
+        if op not in OPERATORS:
+            raise ValueError(f"Unknown operator {op!r}")
+        make_aggregate(aggregate, window)  # validate early
+        self.name = name
+        self.metric = metric
+        self.threshold = threshold
+        self.op = op
+        self.aggregate = aggregate
+        self.window = window
+        self.clear = threshold if clear is None else clear
+        self.for_seconds = for_seconds
+        self.cooldown = cooldown
+        self.severity = severity
+        if message is None:
+            over = "" if aggregate == "last" else f" {aggregate} over {window:g}s"
+            message = f"{metric}{over} {op} {threshold:g}"
+        self.message = message
+
+        self.state = "ok"  # ok | pending | firing
+        self.since = None
+        self.value = None
+        self.last_notified = None
+        self._notified_firing = False
+
+    @classmethod
+    def from_dict(cls, spec):
+        spec = dict(spec)
+        if "for" in spec:
+            spec["for_seconds"] = spec.pop("for")
+        return cls(**spec)
+
+    def breached(self, value):
+        return OPERATORS[self.op](value, self.threshold)
+
+    def cleared(self, value):
+        # The opposite side of the clear level
+        return not OPERATORS[self.op](value, self.clear)
+
+
+class AlertEngine:
+    def __init__(self, rules, sinks=()):
+        self.rules = list(rules)
+        self.sinks = list(sinks)
+        self._lock = threading.Lock()
+        self._aggregates = {}
+        self._by_metric = {}
+        for rule in self.rules:
+            key = (rule.metric, rule.aggregate, rule.window)
+            if key not in self._aggregates:
+                self._aggregates[key] = make_aggregate(rule.aggregate, rule.window)
+            self._by_metric.setdefault(rule.metric, {}).setdefault(key, []).append(rule)
+
+        # Process names referenced by rules; the collector only totals these
+        self.process_names = {rule.metric.split(":")[1] for rule in self.rules
+                              if rule.metric.startswith("process:") and rule.metric.count(":") == 2}
+
+    def observe(self, timestamp, values):
+        # ``values``: {metric: value} for the metrics sampled at ``timestamp``
+        events = []
+        with self._lock:
+            for metric, value in values.items():
+                if value is None or value != value or metric not in self._by_metric:
+                    continue
+                for key, rules in self._by_metric[metric].items():
+                    aggregate = self._aggregates[key]
+                    aggregate.add(timestamp, value)
+                    if not aggregate.ready:
+                        continue
+                    current = aggregate.value()
+                    for rule in rules:
+                        event = self._step(rule, current, timestamp)
+                        if event is not None:
+                            events.append(event)
+        for event in events:
+            self._emit(event)
+        return events
+
+    def _step(self, rule, value, now):
+        rule.value = value
+        if rule.state == "firing":
+            if not rule.cleared(value):
+                return None
+            rule.state, rule.since = "ok", None
+            if rule._notified_firing:
+                rule._notified_firing = False
+                return self._event(rule, "resolved", now)
+            return None
+
+        if not rule.breached(value):
+            rule.state, rule.since = "ok", None
+            return None
+        if rule.state == "ok":
+            rule.state, rule.since = "pending", now
+        if now - rule.since < rule.for_seconds:
+            return None
+
+        rule.state = "firing"
+        if rule.last_notified is not None and now - rule.last_notified < rule.cooldown:
+            return None  # Still cooling down from the previous notification
+        rule.last_notified = now
+        rule._notified_firing = True
+        return self._event(rule, "firing", now)
+
+    def _event(self, rule, state, now):
+        return {
+            "rule": rule.name,
+            "state": state,
+            "severity": rule.severity,
+            "metric": rule.metric,
+            "value": rule.value,
+            "threshold": rule.threshold if state == "firing" else rule.clear,
+            "time": now,
+            "message": rule.message,
+        }
+
+    def _emit(self, event):
+        for sink in self.sinks:
+            try:
+                sink(event)
+            except Exception:
+                logger.exception("Alert sink %r failed", sink)
+
+    def active(self):
+        # Rules currently firing, for the UI and the agent
+        with self._lock:
+            return [rule for rule in self.rules if rule.state == "firing"]
+
+
+def process_values(rows, names):
+    # {"process:<name>:rss": bytes, "process:<name>:cpu": percent} summed over
+    # every process with that name. Names with no running process report 0,
+    # so a rule on a process that has exited can still resolve.
+    totals = {}
+    for name in names:
+        totals[f"process:{name}:rss"] = 0
+        totals[f"process:{name}:cpu"] = 0.0
+    for row in rows:
+        name = row["name"]
+        if name not in names:
+            continue
+        rss_key, cpu_key = f"process:{name}:rss", f"process:{name}:cpu"
+        totals[rss_key] = totals.get(rss_key, 0) + (row["rss"] or 0)
+        totals[cpu_key] = totals.get(cpu_key, 0.0) + (row["cpu_percent"] or 0.0)
+    return totals
+
+
+class LogSink:
+    # Writes each event to the "task_manager.alerts" logger and, with a
+    # ``path``, appends it to a JSON-lines file
+    def __init__(self, path=None):
+        self.path = path
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def __call__(self, event):
+        level = logging.WARNING if event["state"] == "firing" else logging.INFO
+        logger.log(level, "[%s] %s: %s (value %.4g)", event["state"], event["rule"], event["message"], event["value"])
+        if self.path:
+            with open(self.path, "a") as f:
+                f.write(json.dumps(event) + "\n")
+
+
+class WebhookSink:
+    # POSTs events as JSON from a background thread, so a slow endpoint never
+    # stalls the collector. Events are dropped when the queue is full.
+    def __init__(self, url, timeout=5.0, max_pending=100):
+        self.url = url
+        self.timeout = timeout
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = threading.Thread(target=self._run, name="alert-webhook", daemon=True)
+        self._thread.start()
+
+    def __call__(self, event):
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            logger.warning("Dropping alert %s: webhook queue full", event["rule"])
+
+    def _run(self):
+        while True:
+            event = self._queue.get()
+            try:
+                request = urllib.request.Request(self.url, data=json.dumps(event).encode("utf-8"),
+                                                 headers={"Content-Type": "application/json"})
+                urllib.request.urlopen(request, timeout=self.timeout).close()
+            except OSError:
+                logger.warning("Alert webhook %s failed for %s", self.url, event["rule"])
+            except Exception:
+                # A bad URL or a malformed response must not end the thread,
+                # or every later event would pile up in the queue
+                logger.exception("Alert webhook %s failed for %s", self.url, event["rule"])
+
+
+DEFAULT_LOG = os.path.join(os.path.expanduser("~"), ".task_manager", "alerts.log")
+
+
+def load_engine(path=None, webhook=None, log_path=DEFAULT_LOG):
+    # Rules come from the JSON list in ``path`` ($TASK_MANAGER_ALERTS); events
+    # go to the log file and, if set, the webhook ($TASK_MANAGER_ALERT_WEBHOOK).
+    # Returns None when no rules are configured.
+    path = path or os.environ.get("TASK_MANAGER_ALERTS")
+    if not path:
+        return None
+    with open(path) as f:
+        rules = [Rule.from_dict(spec) for spec in json.load(f)]
+    sinks = [LogSink(log_path)]
+    webhook = webhook or os.environ.get("TASK_MANAGER_ALERT_WEBHOOK")
+    if webhook:
+        sinks.append(WebhookSink(webhook))
+    return AlertEngine(rules, sinks)
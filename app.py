@@ -1,25 +1,28 @@
 import streamlit as st
 from streamlit_option_menu import option_menu
 import psutil
-import platform
-import pynvml
-from datetime import datetime
+from datetime import datetime, timedelta
 import plotly.graph_objects as go
 import time
-from tabulate import tabulate
-from collections import deque
 import plotly.graph_objs as go
+import json
 import os
-import platform
-
-def get_disk_usage():
-    if os.name == 'nt':  # Windows
-        return psutil.disk_usage('C:\\')
-    else:  # Unix-like
-        return psutil.disk_usage('/')
-
-# Usage in your code
-disk_percent = get_disk_usage().percent
+import re
+import sys
+import agent
+import prockill
+import recording
+from collector import get_collector
+from charts import CoreHeatmap, LiveChart, group_cores, summarize_stats
+from sysinfo import cpu_topology, static_info, disk_partitions_usage
+from network import busiest_interfaces
+from diskio import busiest_devices
+from instrumentation import TIMINGS, SelfUsage, timed
+
+# Upper bound on points per trace sent to Plotly, whatever the time window
+MAX_CHART_POINTS = 1000
+# Points per sparkline in the process history table
+SPARKLINE_POINTS = 60
 
 def get_size(bytes, suffix="B"):
     factor = 1024
@@ -28,12 +31,17 @@ def get_size(bytes, suffix="B"):
             return f"{bytes:.2f}{unit}{suffix}"
         bytes /= factor
 
+def format_optional(value, fmt):
+    # "N/A" for metrics that have no value yet (rates before a second sample)
+    return fmt.format(value) if value is not None else "N/A"
+
 def system_overview():
     st.title("System Overview")
 
     # System Information
     st.header("System Information")
-    uname = platform.uname()
+    info = static_info()
+    uname = info["uname"]
     system_info = {
         "System": uname.system,
         "Node Name": uname.node,
@@ -45,77 +53,104 @@ def system_overview():
     
     st.table(system_info.items())
 
+    # Usage comes from the collector, so it is measured against the
+    # container's limits when it runs with the cgroup source
+    collector = get_collector()
+    collector.touch()
+    collector.wait_for_sample(timeout=5)
+    snapshot = collector.snapshot()
+
     # CPU Information
     st.header("CPU Information")
     cpu_freq = psutil.cpu_freq()
     cpu_info = {
-        "Physical Cores": psutil.cpu_count(logical=False),
-        "Total Cores": psutil.cpu_count(logical=True),
-        "Max Frequency": f"{cpu_freq.max:.2f} MHz",
-        "Min Frequency": f"{cpu_freq.min:.2f} MHz",
-        "Current Frequency": f"{cpu_freq.current:.2f} MHz",
-        "CPU Usage": f"{psutil.cpu_percent()}%"
+        "Physical Cores": info["physical_cores"],
+        "Total Cores": info["logical_cores"],
+        "Max Frequency": f"{info['max_frequency']:.2f} MHz" if info["max_frequency"] is not None else "N/A",
+        "Min Frequency": f"{info['min_frequency']:.2f} MHz" if info["min_frequency"] is not None else "N/A",
+        "Current Frequency": f"{cpu_freq.current:.2f} MHz" if cpu_freq else "N/A",
+        "CPU Usage": f"{snapshot.get('cpu_percent', 0.0)}%"
     }
     
     st.table(cpu_info.items())
 
     # Memory Information
     st.header("Memory Information")
-    svmem = psutil.virtual_memory()
+    svmem, swap = snapshot.get("memory") or psutil.virtual_memory(), snapshot.get("swap") or psutil.swap_memory()
     memory_info = {
         "Total": get_size(svmem.total),
         "Available": get_size(svmem.available),
         "Used": get_size(svmem.used),
         "Percentage": f"{svmem.percent}%",
-        "Swap Total": get_size(psutil.swap_memory().total),
-        "Swap Used": get_size(psutil.swap_memory().used)
+        "Swap Total": get_size(swap.total),
+        "Swap Used": get_size(swap.used)
     }
     
     st.table(memory_info.items())
 
+    # Container limits, with the cgroup source
+    stats = snapshot.get("cgroup")
+    if stats is not None:
+        st.header("Container Limits")
+        st.table({
+            "CPU Limit": f"{stats['cpu_limit']:.2f} cores",
+            "Memory Limit": get_size(svmem.total),
+            "CPU Throttled": format_optional(stats["throttled_percent"], "{:.1f}% of periods"),
+            "Throttled Time": format_optional(stats["throttled_ms_per_s"], "{:.1f} ms/s"),
+            "CPU Pressure (some, 10s)": format_optional(stats["cpu_some_avg10"], "{:.2f}%"),
+            "Memory Pressure (some / full, 10s)": " / ".join(
+                format_optional(stats[f"memory_{kind}_avg10"], "{:.2f}%") for kind in ("some", "full")),
+            "I/O Pressure (some / full, 10s)": " / ".join(
+                format_optional(stats[f"io_{kind}_avg10"], "{:.2f}%") for kind in ("some", "full")),
+        }.items())
+
     # Disk Information
     st.header("Disk Information")
     disk_info = []
-    partitions = psutil.disk_partitions()
     
-    for partition in partitions:
-        try:
-            partition_usage = psutil.disk_usage(partition.mountpoint)
+    # Mounts are queried concurrently; a hung one is reported, not waited on
+    for entry in disk_partitions_usage():
+        partition, partition_usage = entry["partition"], entry["usage"]
+        if entry["status"] == "unavailable":
+            continue
+        if partition_usage is None:
             disk_info.append({
                 "Disk": partition.device,
-                "Total Size": get_size(partition_usage.total),
-                "Used": get_size(partition_usage.used),
-                "Free": get_size(partition_usage.free),
-                "Percentage": f"{partition_usage.percent}%"
+                "Mount": partition.mountpoint,
+                "Total Size": "-",
+                "Used": "-",
+                "Free": "-",
+                "Percentage": entry["status"]
             })
-        except PermissionError:
             continue
+        disk_info.append({
+            "Disk": partition.device,
+            "Mount": partition.mountpoint,
+            "Total Size": get_size(partition_usage.total),
+            "Used": get_size(partition_usage.used),
+            "Free": get_size(partition_usage.free),
+            "Percentage": f"{partition_usage.percent}%"
+        })
     
     st.table(disk_info)
 
     # GPU Information
     st.header("GPU Information")
-    try:
-        pynvml.nvmlInit()
-        device_count = pynvml.nvmlDeviceGetCount()
-        for i in range(device_count):
-            handle = pynvml.nvmlDeviceGetHandleByIndex(i)
-            
-            # Get device name without decoding
-            device_name = pynvml.nvmlDeviceGetName(handle)
-            
-            memory_info = pynvml.nvmlDeviceGetMemoryInfo(handle)
-            st.subheader(f"GPU: {device_name}")  # No need to decode
-            col1, col2 = st.columns(2)
-            with col1:
-                st.metric("Memory Total", get_size(memory_info.total))
-                st.metric("Memory Free", get_size(memory_info.free))
-            with col2:
-                st.metric("Memory Used", get_size(memory_info.used))
-                st.metric("GPU Utilization", f"{pynvml.nvmlDeviceGetUtilizationRates(handle).gpu}%")
-        pynvml.nvmlShutdown()
-    except pynvml.NVMLError:
+    # Readings come from the collector, which keeps NVML initialised
+    gpus = snapshot.get("gpus") or []
+    if not gpus:
         st.write("No NVIDIA GPU detected or NVIDIA drivers not installed")
+    for reading in gpus:
+        st.subheader(f"GPU {reading.index}: {reading.name}")
+        col1, col2 = st.columns(2)
+        with col1:
+            st.metric("Memory Total", get_size(reading.memory_total))
+            st.metric("Memory Free", get_size(reading.memory_total - reading.memory_used) if reading.memory_used is not None else "N/A")
+            st.metric("Temperature", f"{reading.temperature} °C" if reading.temperature is not None else "N/A")
+        with col2:
+            st.metric("Memory Used", get_size(reading.memory_used) if reading.memory_used is not None else "N/A")
+            st.metric("GPU Utilization", f"{reading.utilization}%" if reading.utilization is not None else "N/A")
+            st.metric("Power", f"{reading.power:.1f} W" if reading.power is not None else "N/A")
 
 
     # Network Information
@@ -139,221 +174,522 @@ def system_overview():
 
 def process_manager():
     st.title("Process Manager")
-    
-    # Create static elements outside the loop
-    sort_by = st.radio("Sort by:", ("Memory Usage", "CPU Usage"), key="sort_option")
-    
-    col1, col2, col3 = st.columns(3)
+
+    collector = get_collector()
+    collector.wait_for_sample(timeout=5)
+    index = collector.process_index
+
+    # Create static elements outside the loop. Filtering, sorting and paging run
+    # against the collector's process index; only the visible page is formatted
+    # and sent to the browser.
+    col1, col2, col3 = st.columns([3, 1, 2])
+    with col1:
+        search = st.text_input("Search name, command line or user:", key="process_search")
+    with col2:
+        use_regex = st.checkbox("Regex", key="process_regex")
+    with col3:
+        user = st.selectbox("User:", ["All users"] + index.users(), key="process_user")
+
+    col1, col2 = st.columns(2)
+    with col1:
+        parent_text = st.text_input("Parent PID:", key="process_parent")
+    with col2:
+        subtree = st.checkbox("Include the whole subtree", key="process_subtree")
+
+    sort_columns = {
+        "Memory Usage": "memory_percent",
+        "CPU Usage": "cpu_percent",
+        "RSS": "rss",
+        "Threads": "num_threads",
+        "PID": "pid",
+        "Name": "name",
+        "User": "username",
+        "Status": "status",
+    }
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        sort_by = st.multiselect("Sort by:", list(sort_columns), default=["Memory Usage"], key="sort_option")
+    with col2:
+        descending = st.checkbox("Descending", value=True, key="sort_descending")
+
+    col1, col2, col3, col4 = st.columns(4)
     with col1:
         show_memory = st.checkbox("Show Memory Usage", value=True, key="show_memory")
     with col2:
         show_cpu = st.checkbox("Show CPU Usage", value=True, key="show_cpu")
     with col3:
         show_status = st.checkbox("Show Status", value=True, key="show_status")
-    
-    # Create a placeholder for the table
+    with col4:
+        show_cmdline = st.checkbox("Show Command Line", value=False, key="show_cmdline")
+
+    col1, col2 = st.columns(2)
+    with col1:
+        page_size = st.selectbox("Rows per page:", [25, 50, 100, 250], index=1, key="process_page_size")
+    with col2:
+        page_number = st.number_input("Page:", min_value=1, step=1, key="process_page")
+
+    parent = None
+    if parent_text.strip():
+        try:
+            parent = int(parent_text)
+        except ValueError:
+            st.error(f"Parent PID must be a number, not {parent_text!r}")
+            return
+    sort = [(sort_columns[label], descending) for label in sort_by] or [("memory_percent", True)]
+
+    # Create placeholders for the page summary and the table
+    status_placeholder = st.empty()
     table_placeholder = st.empty()
-    
-    # Create input and button for killing process
-    pid_to_kill = st.number_input("Enter PID to kill:", min_value=1, step=1, key="pid_input")
-    kill_button = st.button("Kill Process", key="kill_button")
-    
+
+    # Per-process series for the heaviest processes, kept by the collector
+    st.subheader("Top Consumers History")
+    history_windows = {"10 minutes": 600, "1 hour": 3600, "6 hours": 6 * 3600}
+    col1, col2 = st.columns([1, 2])
+    with col1:
+        history_label = st.selectbox("History window:", list(history_windows), key="process_history_window")
+    with col2:
+        drill_options = {f"{p['name']} ({p['pid']})": p["pid"] for p in collector.process_history.processes()}
+        drill_label = st.selectbox("Drill down:", ["None"] + list(drill_options), key="process_drill")
+    history_seconds = history_windows[history_label]
+    drill_pid = drill_options.get(drill_label)
+    history_placeholder = st.empty()
+    drill_placeholder = st.empty()
+    history_version = None
+
+    # Ending processes runs on a worker thread: SIGTERM, a grace period, then
+    # SIGKILL for anything still alive. Results fill in on later refreshes.
+    st.subheader("End Processes")
+    col1, col2 = st.columns([1, 2])
+    with col1:
+        kill_mode = st.selectbox("Select by:", ["PID", "Process tree", "Name pattern", "User"], key="kill_mode")
+    kill_pid = kill_name = kill_user = None
+    with col2:
+        if kill_mode in ("PID", "Process tree"):
+            kill_pid = st.number_input("PID:", min_value=1, step=1, key="pid_input")
+        elif kill_mode == "Name pattern":
+            kill_name = st.text_input("Process name (wildcards allowed, e.g. chrome*):", key="kill_name")
+        else:
+            kill_user = st.selectbox("Owner:", index.users(), key="kill_user")
+    grace = st.slider("Seconds to wait before forcing (SIGKILL):", 1, 30, 5, key="kill_grace")
+
+    targets = []
+    if kill_pid is not None or kill_name or kill_user:
+        targets = prockill.select_targets(index, pid=kill_pid, tree=kill_mode == "Process tree",
+                                          name=kill_name, user=kill_user)
+    if targets:
+        preview = ", ".join(f"{row['name']} ({row['pid']})" for row in targets[:10])
+        more = f" and {len(targets) - 10} more" if len(targets) > 10 else ""
+        st.caption(f"{len(targets)} matching: {preview}{more}")
+    else:
+        st.caption("No matching processes in the latest sample.")
+    confirmed = len(targets) <= 1 or st.checkbox(f"Yes, end all {len(targets)} processes", key="kill_confirm")
+    if st.button("End Processes", key="kill_button", disabled=not targets or not confirmed):
+        st.session_state.setdefault("kill_jobs", []).append(prockill.kill(targets, terminate_timeout=grace))
+    jobs_placeholder = st.empty()
+
     while True:
-        processes = []
-        for proc in psutil.process_iter(['pid', 'name', 'status', 'memory_percent', 'cpu_percent']):
-            try:
-                process = proc.info
-                processes.append([
-                    process['pid'],
-                    process['name'],
-                    f"{process['memory_percent']:.2f}%" if show_memory else "",
-                    f"{process['cpu_percent']:.2f}%" if show_cpu else "",
-                    process['status'] if show_status else ""
-                ])
-            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
-                pass
-        
-        # Sort processes based on user selection
-        sort_index = 2 if sort_by == "Memory Usage" else 3
-        processes.sort(key=lambda x: float(x[sort_index].strip('%') if x[sort_index] else 0), reverse=True)
-        
-        # Limit to top 20 processes
-        processes = processes[:20]
-        
-        # Create the table
-        headers = ["PID", "Name", "Memory Usage", "CPU Usage", "Status"]
-        table = tabulate(processes, headers=headers, tablefmt="grid")
-        
+        collector.touch()
+        try:
+            with timed("render: process query"):
+                total, page = index.query(search, regex=use_regex,
+                                          user=None if user == "All users" else user,
+                                          ppid=parent, tree=subtree, sort=sort,
+                                          offset=(page_number - 1) * page_size, limit=page_size)
+        except re.error as e:
+            status_placeholder.error(f"Invalid regular expression: {e}")
+            return
+
+        pages = max(1, -(-total // page_size))
+        if page:
+            first = (page_number - 1) * page_size + 1
+            status_placeholder.caption(f"Showing {first}-{first + len(page) - 1} of {total} processes "
+                                       f"(page {page_number} of {pages})")
+        else:
+            status_placeholder.caption(f"No processes on page {page_number} ({total} matching, {pages} pages)")
+
+        rows = []
+        for process in page:
+            row = {"PID": process["pid"], "Name": process["name"], "User": process["username"] or ""}
+            if show_memory:
+                row["Memory Usage"] = f"{process['memory_percent']:.2f}%"
+            if show_cpu:
+                row["CPU Usage"] = f"{process['cpu_percent'] or 0:.2f}%"
+            if show_status:
+                row["Status"] = process["status"]
+            if show_cmdline:
+                row["Command Line"] = process["cmdline"]
+            rows.append(row)
+
         # Update the table
-        table_placeholder.code(table)
-        
-        # Handle process termination
-        if kill_button:
-            try:
-                process = psutil.Process(pid_to_kill)
-                process.terminate()
-                st.success(f"Process with PID {pid_to_kill} has been terminated.")
-            except psutil.NoSuchProcess:
-                st.error(f"No process found with PID {pid_to_kill}")
-            except psutil.AccessDenied:
-                st.error(f"Access denied to terminate process with PID {pid_to_kill}")
-        
-        # Wait for 1 second before updating
-        time.sleep(1)
+        with timed("render: process table"):
+            table_placeholder.table(rows)
+        if TIMINGS.count_bytes:
+            TIMINGS.record_bytes("process table", len(json.dumps(rows)))
+
+        # The history only changes every few seconds; skip unchanged redraws
+        if collector.process_history.version != history_version:
+            history_version = collector.process_history.version
+            with timed("render: process history"):
+                render_process_history(collector, history_placeholder, drill_placeholder, history_seconds, drill_pid)
+
+        # Progress of this session's recent termination jobs
+        jobs = st.session_state.get("kill_jobs", [])[-3:]
+        if jobs:
+            with jobs_placeholder.container():
+                for job in reversed(jobs):
+                    counts = ", ".join(f"{count} {outcome}" for outcome, count in job.counts().items())
+                    st.caption(f"Job {job.id} ({'finished' if job.done else 'running'}): {counts}")
+                    st.table(job.results())
+
+        # Wait for the collector's next sample before updating
+        time.sleep(collector.interval)
+
+
+def render_process_history(collector, table_placeholder, drill_placeholder, seconds, drill_pid=None):
+    def sparkline(pid, metric, scale=1):
+        _, values = collector.history(f"process/{pid}/{metric}", seconds, SPARKLINE_POINTS)
+        return [float(v) / scale for v in values]
+
+    rows = []
+    for process in collector.process_history.processes():
+        pid = process["pid"]
+        rows.append({
+            "PID": pid,
+            "Name": process["name"],
+            "User": process["username"],
+            "Running": process["running"],
+            "CPU Usage": sparkline(pid, "cpu_percent"),
+            "RSS (MB)": sparkline(pid, "rss", 1024 ** 2),
+            "Read (KB/s)": sparkline(pid, "read_rate", 1024),
+            "Write (KB/s)": sparkline(pid, "write_rate", 1024),
+            "Threads": sparkline(pid, "num_threads"),
+        })
+    column_config = {name: st.column_config.LineChartColumn(name, y_min=0)
+                     for name in ["CPU Usage", "RSS (MB)", "Read (KB/s)", "Write (KB/s)", "Threads"]}
+    table_placeholder.dataframe(rows, column_config=column_config, hide_index=True, use_container_width=True)
+
+    if drill_pid is None:
+        return
+    charts = [
+        ("CPU Usage", "Percentage", [("cpu_percent", "CPU")]),
+        ("Resident Memory", "Bytes", [("rss", "RSS")]),
+        ("Disk I/O", "Bytes/s", [("read_rate", "Read"), ("write_rate", "Write")]),
+        ("Threads", "Count", [("num_threads", "Threads")]),
+    ]
+    with drill_placeholder.container():
+        columns = st.columns(2)
+        for i, (title, yaxis_title, traces) in enumerate(charts):
+            fig = go.Figure()
+            for metric, name in traces:
+                times, values = collector.history(f"process/{drill_pid}/{metric}", seconds, MAX_CHART_POINTS)
+                fig.add_trace(go.Scatter(x=times.astype('datetime64[s]'), y=values, mode='lines', name=name))
+            fig.update_layout(title=f"{title} (PID {drill_pid})", xaxis_title='Time', yaxis_title=yaxis_title,
+                              height=300, margin=dict(l=10, r=10, t=40, b=10))
+            columns[i % 2].plotly_chart(fig, use_container_width=True)
 
 
 def performance_graphs():
     st.title("Performance Graphs")
 
-    # Initialize data storage
-    time_window = 60  # 60 seconds of data
-    cpu_data = deque(maxlen=time_window)
-    cpu_cores_data = {core: deque(maxlen=time_window) for core in range(psutil.cpu_count(logical=True))}
-    memory_data = deque(maxlen=time_window)
-    disk_data = deque(maxlen=time_window)
-    gpu_data = deque(maxlen=time_window)
-    network_sent_data = deque(maxlen=time_window)
-    network_recv_data = deque(maxlen=time_window)
+    # All sampling happens in the shared collector thread; this page only reads
+    collector = get_collector()
+    collector.wait_for_sample(timeout=5)
+
+    # Long windows are downsampled before they are sent to the browser
+    window_options = {"1 minute": 60, "10 minutes": 600, "1 hour": 3600, "6 hours": 6 * 3600}
+    stored_options = {"24 hours": 24 * 3600, "7 days": 7 * 24 * 3600, "30 days": 30 * 24 * 3600, "Custom range": None}
+    window_label = st.selectbox("Time window", list(window_options) + list(stored_options) + ["Recording"],
+                                key="graph_window")
+
+    if window_label == "Recording":
+        replay_graphs(collector)
+        return
+
+    # Anything longer than the in-memory window is read from the on-disk history
+    if window_label in stored_options:
+        if collector.store is None:
+            st.warning("Metrics history is not available (the history database could not be opened).")
+            return
+        if window_label == "Custom range":
+            today = datetime.now().date()
+            picked = st.date_input("Range", value=(today - timedelta(days=1), today), key="graph_range")
+            if len(picked) != 2:
+                return
+            start = datetime.combine(picked[0], datetime.min.time()).timestamp()
+            end = datetime.combine(picked[1], datetime.max.time()).timestamp()
+        else:
+            end = time.time()
+            start = end - stored_options[window_label]
+        history_graphs(collector.store, start, end)
+        return
+
+    window_seconds = window_options[window_label]
+
+    col1, col2 = st.columns(2)
+    with col1:
+        render_mode = st.radio("Rendering:", ("Rolling window", "Full redraw"), key="render_mode", horizontal=True)
+    with col2:
+        measure_render = st.checkbox("Measure render cost", value=False, key="measure_render")
+    mode = "rolling" if render_mode == "Rolling window" else "full"
+
+    # Per-core history as a heatmap; on many-core hosts cores can be folded
+    # into their socket or NUMA node
+    col1, col2 = st.columns(2)
+    with col1:
+        grouping = st.selectbox("Core grouping", ["Per core", "By socket", "By NUMA node"], key="core_grouping")
+    with col2:
+        core_reducer = st.radio("Core heatmap shows", ("Mean", "Max"), key="core_reducer", horizontal=True)
+    _, core_values = collector.cores_history(0)
+    core_groups = group_cores(core_values.shape[1], {"By socket": "socket", "By NUMA node": "numa"}.get(grouping),
+                              cpu_topology())
+
+    # Only the picked devices get traces, however many the host has
+    disk_devices = collector.disk_devices()
+    selected_disks = st.multiselect("Disk devices", disk_devices, default=disk_devices[:4], key="disk_devices")
 
     # Create placeholders for graphs
     cpu_placeholder = st.empty()
     cpu_cores_placeholder = st.empty()
     memory_placeholder = st.empty()
-    disk_placeholder = st.empty()
+    throttling_placeholder = st.empty()
+    pressure_placeholder = st.empty()
+    disk_throughput_placeholder = st.empty()
+    disk_iops_placeholder = st.empty()
+    disk_latency_placeholder = st.empty()
+    disk_busy_placeholder = st.empty()
+    disks_placeholder = st.empty()
     gpu_placeholder = st.empty()
     network_placeholder = st.empty()
-
-    # Initialize NVML for GPU monitoring
-    pynvml.nvmlInit()
-    handle = pynvml.nvmlDeviceGetHandleByIndex(0)  # Assuming first GPU
+    interfaces_placeholder = st.empty()
+    render_stats_placeholder = st.empty()
+
+    # Layout and trace styling are fixed here; each tick only pushes new data
+    blue_fill = dict(line=dict(color='blue'), fill='tozeroy', fillcolor='rgba(0, 0, 255, 0.1)')
+    chart_options = dict(window_seconds=window_seconds, points=MAX_CHART_POINTS, mode=mode, measure=measure_render)
+    charts = {
+        "CPU": LiveChart(cpu_placeholder, collector, [dict(series="cpu", name='CPU Usage', **blue_fill)],
+                         'CPU Usage', 'Percentage', **chart_options),
+        "Memory": LiveChart(memory_placeholder, collector, [dict(series="memory", name='Memory Usage', **blue_fill)],
+                            'Memory Usage', 'Percentage', **chart_options),
+        "Container Throttling": LiveChart(throttling_placeholder, collector, [
+            dict(series="cgroup/throttled_percent", name='Throttled periods', **blue_fill),
+        ], 'Container CPU Throttling', 'Percentage', **chart_options),
+        "Container Pressure": LiveChart(pressure_placeholder, collector, [
+            dict(series=f"cgroup/{resource}_some_avg10", name=resource.upper() if resource == "io" else resource.title())
+            for resource in ("cpu", "memory", "io")
+        ], 'Container Pressure Stall (some, 10s avg)', 'Percentage', **chart_options),
+        "Disk Throughput": LiveChart(disk_throughput_placeholder, collector, [
+            dict(series=f"disk_io/{device}/{metric}", name=f'{device} {label}')
+            for device in selected_disks for metric, label in (("read_bytes", "read"), ("write_bytes", "write"))
+        ], 'Disk Throughput', 'Bytes/s', **chart_options),
+        "Disk IOPS": LiveChart(disk_iops_placeholder, collector, [
+            dict(series=f"disk_io/{device}/{metric}", name=f'{device} {label}')
+            for device in selected_disks for metric, label in (("read_iops", "read"), ("write_iops", "write"))
+        ], 'Disk IOPS', 'Operations/s', **chart_options),
+        "Disk Await": LiveChart(disk_latency_placeholder, collector, [
+            dict(series=f"disk_io/{device}/await_ms", name=device) for device in selected_disks
+        ], 'Disk Average Await', 'Milliseconds', **chart_options),
+        "Disk Busy": LiveChart(disk_busy_placeholder, collector, [
+            dict(series=f"disk_io/{device}/busy_percent", name=device) for device in selected_disks
+        ], 'Disk Busy', 'Percentage', **chart_options),
+        "GPU": LiveChart(gpu_placeholder, collector, [
+            dict(series=f"gpu/{device.index}/utilization", name=f'GPU {device.index}') for device in collector.gpus.devices
+        ], 'GPU Usage', 'Percentage', **chart_options),
+        "Network": LiveChart(network_placeholder, collector, [
+            dict(series="network_sent_rate", name='Sent', **blue_fill),
+            dict(series="network_recv_rate", name='Received', line=dict(color='lightblue'),
+                 fill='tozeroy', fillcolor='rgba(173, 216, 230, 0.1)'),
+        ], 'Network Throughput', 'Bytes/s', **chart_options),
+    }
+    cores_heatmap = CoreHeatmap(cpu_cores_placeholder, collector, window_seconds, groups=core_groups,
+                                reducer=core_reducer.lower(), points=MAX_CHART_POINTS)
 
     while True:
-        # Collect performance data
-        current_time = time.time()
-        cpu_percent = psutil.cpu_percent()
-        memory_percent = psutil.virtual_memory().percent
-        disk_percent = psutil.disk_usage('/').percent
-        
-        # Collect CPU core usage
-        cpu_cores_percent = psutil.cpu_percent(percpu=True)
-        for core, percent in enumerate(cpu_cores_percent):
-            cpu_cores_data[core].append((current_time, percent))
-
-        # GPU usage
-        gpu_utilization = pynvml.nvmlDeviceGetUtilizationRates(handle).gpu
-
-        # Network usage
-        network_stats = psutil.net_io_counters()
-        network_sent = network_stats.bytes_sent
-        network_recv = network_stats.bytes_recv
-
-        # Update data storage
-        cpu_data.append((current_time, cpu_percent))
-        memory_data.append((current_time, memory_percent))
-        disk_data.append((current_time, disk_percent))
-        gpu_data.append((current_time, gpu_utilization))
-        network_sent_data.append((current_time, network_sent))
-        network_recv_data.append((current_time, network_recv))
-
-        # Create and update CPU graph
-        cpu_fig = go.Figure(data=go.Scatter(x=[t for t, _ in cpu_data], 
-                                            y=[d for _, d in cpu_data], 
-                                            mode='lines', 
-                                            name='CPU Usage',
-                                            line=dict(color='blue'),
-                                            fill='tozeroy',
-                                            fillcolor='rgba(0, 0, 255, 0.1)'))
-        cpu_fig.update_layout(title='CPU Usage', xaxis_title='Time', yaxis_title='Percentage')
-        cpu_placeholder.plotly_chart(cpu_fig, use_container_width=True)
-
-        # Create and update CPU cores graph
-        cpu_cores_fig = go.Figure()
-        core_names = [f'Core {core}' for core in range(len(cpu_cores_data))]
-        core_values = [data[-1][1] if data else 0 for data in cpu_cores_data.values()]  # Get the latest value for each core
-
-        cpu_cores_fig.add_trace(go.Bar(
-            x=core_names,
-            y=core_values,
-            marker_color='blue',
-            opacity=0.8
-        ))
+        collector.touch()
+        charts["CPU"].update()
+        cores_heatmap.update()
+        charts["Memory"].update()
+        if collector.snapshot().get("cgroup") is not None:
+            charts["Container Throttling"].update()
+            charts["Container Pressure"].update()
+        for name in ("Disk Throughput", "Disk IOPS", "Disk Await", "Disk Busy"):
+            charts[name].update()
+
+        disk_io = collector.snapshot().get("disk_io")
+        if disk_io is not None and selected_disks:
+            disks_placeholder.table([{
+                "Device": row["device"],
+                "Read/s": get_size(row["read_bytes"]),
+                "Write/s": get_size(row["write_bytes"]),
+                "IOPS": f"{row['read_iops'] + row['write_iops']:.0f}",
+                "Await": f"{row['await_ms']:.2f} ms",
+                "Busy": f"{row['busy_percent']:.1f}%",
+            } for row in busiest_devices(disk_io, selected_disks)])
+        if collector.gpus.devices:
+            charts["GPU"].update()
+        else:
+            gpu_placeholder.info("No NVIDIA GPU detected or NVIDIA drivers not installed")
+        charts["Network"].update()
 
-        cpu_cores_fig.update_layout(
-            title='CPU Cores Usage',
-            xaxis_title='Cores',
-            yaxis_title='Percentage',
-            yaxis=dict(range=[0, 100]),  # Set y-axis range from 0 to 100%
-            bargap=0.2,  # Gap between bars
-        )
+        network = collector.snapshot().get("network")
+        if network is not None:
+            interfaces_placeholder.table([{
+                "Interface": row["interface"],
+                "Sent/s": get_size(row["bytes_sent"]),
+                "Received/s": get_size(row["bytes_recv"]),
+                "Packets/s": f"{row['packets_sent'] + row['packets_recv']:.0f}",
+                "Errors/s": f"{row['errin'] + row['errout']:.0f}",
+                "Drops/s": f"{row['dropin'] + row['dropout']:.0f}",
+            } for row in busiest_interfaces(network, 10)])
 
-        cpu_cores_placeholder.plotly_chart(cpu_cores_fig, use_container_width=True)
-
-        # Create and update Memory graph
-        memory_fig = go.Figure(data=go.Scatter(x=[t for t, _ in memory_data], 
-                                               y=[d for _, d in memory_data], 
-                                               mode='lines', 
-                                               name='Memory Usage',
-                                               line=dict(color='blue'),
-                                               fill='tozeroy',
-                                               fillcolor='rgba(0, 0, 255, 0.1)'))
-        memory_fig.update_layout(title='Memory Usage', xaxis_title='Time', yaxis_title='Percentage')
-        memory_placeholder.plotly_chart(memory_fig, use_container_width=True)
-
-        # Create and update Disk graph
-        disk_fig = go.Figure(data=go.Scatter(x=[t for t, _ in disk_data], 
-                                             y=[d for _, d in disk_data], 
-                                             mode='lines', 
-                                             name='Disk Usage',
-                                             line=dict(color='blue'),
-                                             fill='tozeroy',
-                                             fillcolor='rgba(0, 0, 255, 0.1)'))
-        disk_fig.update_layout(title='Disk Usage', xaxis_title='Time', yaxis_title='Percentage')
-        disk_placeholder.plotly_chart(disk_fig, use_container_width=True)
-
-        # Create and update GPU graph
-        gpu_fig = go.Figure(data=go.Scatter(x=[t for t, _ in gpu_data], 
-                                            y=[d for _, d in gpu_data], 
-                                            mode='lines', 
-                                            name='GPU Usage',
-                                            line=dict(color='blue'),
-                                            fill='tozeroy',
-                                            fillcolor='rgba(0, 0, 255, 0.1)'))
-        gpu_fig.update_layout(title='GPU Usage', xaxis_title='Time', yaxis_title='Percentage')
-        gpu_placeholder.plotly_chart(gpu_fig, use_container_width=True)
-
-        # Create and update Network graph
-        network_fig = go.Figure()
-        network_fig.add_trace(go.Scatter(x=[t for t, _ in network_sent_data], 
-                                         y=[d for _, d in network_sent_data], 
-                                         mode='lines', 
-                                         name='Bytes Sent',
-                                         line=dict(color='blue'),
-                                         fill='tozeroy',
-                                         fillcolor='rgba(0, 0, 255, 0.1)'))
-        network_fig.add_trace(go.Scatter(x=[t for t, _ in network_recv_data], 
-                                         y=[d for _, d in network_recv_data], 
-                                         mode='lines', 
-                                         name='Bytes Received',
-                                         line=dict(color='lightblue'),
-                                         fill='tozeroy',
-                                         fillcolor='rgba(173, 216, 230, 0.1)'))
-        network_fig.update_layout(title='Network Usage', xaxis_title='Time', yaxis_title='Bytes')
-        network_placeholder.plotly_chart(network_fig, use_container_width=True)
-
-        # Wait for 1 second before updating
-        time.sleep(1)
-
-    # Shutdown NVML
-    pynvml.nvmlShutdown()
+        if measure_render:
+            render_stats_placeholder.table(summarize_stats(charts))
 
+        # Wait for the collector's next sample before updating
+        time.sleep(collector.interval)
 
 
 
+
+def replay_graphs(collector):
+    # Plays a session recording ($TASK_MANAGER_RECORD) back through the same
+    # charts, reading the memory-mapped file at the cursor position
+    directory = collector.recorder.directory if collector.recorder is not None else recording.DEFAULT_DIR
+    paths = recording.list_recordings(directory)
+    if not paths:
+        st.info(f"No recordings in {directory}. Start the app with TASK_MANAGER_RECORD=1 to record sessions.")
+        return
+    path = st.selectbox("Recording", paths, format_func=os.path.basename, key="replay_path")
+    replay = recording.Recording(path)
+    try:
+        replay_recording(collector, replay)
+    finally:
+        replay.close()
+
+
+def replay_recording(collector, replay):
+    if not len(replay):
+        st.info("This recording has no samples yet.")
+        return
+
+    window_options = {"1 minute": 60, "10 minutes": 600, "1 hour": 3600, "6 hours": 6 * 3600}
+    col1, col2, col3 = st.columns([3, 1, 1])
+    with col1:
+        start = datetime.fromtimestamp(replay.start).replace(microsecond=0)
+        end = datetime.fromtimestamp(replay.end).replace(microsecond=0)
+        position = st.slider("Position", min_value=start, max_value=max(end, start + timedelta(seconds=1)),
+                             value=start, step=timedelta(seconds=1), format="YYYY-MM-DD HH:mm:ss",
+                             key="replay_position")
+    with col2:
+        window_label = st.selectbox("Window", list(window_options), key="replay_window")
+    with col3:
+        speed = st.selectbox("Speed", [1, 2, 5, 10, 60, 600], format_func=lambda x: f"{x}×", key="replay_speed")
+    play = st.checkbox("Play", key="replay_play")
+    st.caption(f"{len(replay)} samples from {replay.host or 'unknown host'}, "
+               f"{start:%Y-%m-%d %H:%M:%S} to {end:%H:%M:%S}")
+
+    cursor = recording.ReplayCursor(replay, collector.interval)
+    cursor.seek(position.timestamp())
+
+    disk_devices = sorted({name.split("/")[1] for name in replay.columns if name.startswith("disk_io/")})
+    gpu_indices = sorted({name.split("/")[1] for name in replay.columns if name.startswith("gpu/")}, key=int)
+    blue_fill = dict(line=dict(color='blue'), fill='tozeroy', fillcolor='rgba(0, 0, 255, 0.1)')
+    chart_options = dict(window_seconds=window_options[window_label], points=MAX_CHART_POINTS, mode="full")
+    position_placeholder = st.empty()
+    charts = [
+        LiveChart(st.empty(), cursor, [dict(series="cpu", name='CPU Usage', **blue_fill)],
+                  'CPU Usage', 'Percentage', **chart_options),
+        LiveChart(st.empty(), cursor, [dict(series="memory", name='Memory Usage', **blue_fill)],
+                  'Memory Usage', 'Percentage', **chart_options),
+        LiveChart(st.empty(), cursor, [
+            dict(series=f"disk_io/{device}/{metric}", name=f'{device} {label}')
+            for device in disk_devices for metric, label in (("read_bytes", "read"), ("write_bytes", "write"))
+        ], 'Disk Throughput', 'Bytes/s', **chart_options),
+        LiveChart(st.empty(), cursor, [
+            dict(series="network_sent_rate", name='Sent', **blue_fill),
+            dict(series="network_recv_rate", name='Received', line=dict(color='lightblue'),
+                 fill='tozeroy', fillcolor='rgba(173, 216, 230, 0.1)'),
+        ], 'Network Throughput', 'Bytes/s', **chart_options),
+    ]
+    if gpu_indices:
+        charts.append(LiveChart(st.empty(), cursor, [
+            dict(series=f"gpu/{index}/utilization", name=f'GPU {index}') for index in gpu_indices
+        ], 'GPU Usage', 'Percentage', **chart_options))
+    if "cgroup/throttled_percent" in replay.columns:
+        charts.append(LiveChart(st.empty(), cursor, [
+            dict(series="cgroup/throttled_percent", name='Throttled periods', **blue_fill),
+        ], 'Container CPU Throttling', 'Percentage', **chart_options))
+    processes_placeholder = st.empty()
+
+    drawn = None
+    while True:
+        position_placeholder.caption(f"At {datetime.fromtimestamp(cursor.position):%Y-%m-%d %H:%M:%S}")
+        # Only redraw when the window covers other rows (not when parked
+        # at the end, or stepping between two samples)
+        span = replay.span(cursor.position - window_options[window_label], cursor.position)
+        if span != drawn:
+            drawn = span
+            for chart in charts:
+                chart.update()
+
+        # Process snapshot at or before the cursor, when they were recorded
+        processes = replay.processes(cursor.position)
+        if processes is not None:
+            top = sorted(processes, key=lambda row: row["cpu_percent"] or 0.0, reverse=True)[:20]
+            processes_placeholder.table([{
+                "PID": row["pid"],
+                "Name": row["name"],
+                "User": row["username"] or "",
+                "CPU Usage": f"{row['cpu_percent'] or 0:.2f}%",
+                "Memory Usage": f"{row['memory_percent']:.2f}%",
+                "Status": row["status"],
+            } for row in top])
+
+        if not play:
+            break
+        if not cursor.advance(speed * collector.interval):
+            # At the end: pick up rows a live recorder has written since
+            replay.refresh()
+        time.sleep(collector.interval)
+
+
+def history_graphs(store, start, end):
+    store.flush()  # Include samples still buffered in the writer
+
+    charts = [
+        ("CPU Usage", "Percentage", [("cpu", "CPU Usage", "blue")]),
+        ("Memory Usage", "Percentage", [("memory", "Memory Usage", "blue")]),
+        ("Disk Usage", "Percentage", [("disk", "Disk Usage", "blue")]),
+        ("Disk Throughput", "Bytes/s", [("disk_read_rate", "Read", "blue"), ("disk_write_rate", "Write", "lightblue")]),
+        ("GPU Usage", "Percentage", [("gpu", "GPU Usage", "blue")]),
+        ("Network Throughput", "Bytes/s", [("network_sent_rate", "Sent", "blue"), ("network_recv_rate", "Received", "lightblue")]),
+    ]
+
+    table, bucket = store.pick_tier(start, end)
+    st.caption(f"Reading {table} ({bucket}s resolution) from {store.path}")
+
+    for title, yaxis_title, traces in charts:
+        fig = go.Figure()
+        for series, name, color in traces:
+            times, mins, avgs, maxs = store.query(series, start, end, MAX_CHART_POINTS)
+            times = times.astype('datetime64[s]')
+            # Min/max envelope drawn as a band behind the average line
+            fig.add_trace(go.Scatter(x=times, y=maxs, mode='lines', line=dict(width=0), showlegend=False, hoverinfo='skip'))
+            fig.add_trace(go.Scatter(x=times, y=mins, mode='lines', line=dict(width=0), fill='tonexty',
+                                     fillcolor='rgba(0, 0, 255, 0.1)', name=f'{name} (min/max)'))
+            fig.add_trace(go.Scatter(x=times, y=avgs, mode='lines', name=name, line=dict(color=color)))
+        fig.update_layout(title=title, xaxis_title='Time', yaxis_title=yaxis_title)
+        st.plotly_chart(fig, use_container_width=True)
+
+
 def battery_and_power_management():
     st.title("Battery and Power Management")
 
+    collector = get_collector()
+    collector.wait_for_sample(timeout=5)
+
     # Check if battery is present
-    battery = psutil.sensors_battery()
+    battery = collector.snapshot().get("battery")
     if battery is None:
         st.warning("No battery detected. This might be a desktop computer.")
         return
@@ -363,13 +699,11 @@ def battery_and_power_management():
     battery_chart = st.empty()
     power_plan = st.empty()
 
-    # Initialize data storage for battery percentage
-    time_window = 60  # 60 seconds of data
-    battery_data = deque(maxlen=time_window)
-
     while True:
+        collector.touch()
         # Get current battery information
-        battery = psutil.sensors_battery()
+        battery = collector.snapshot().get("battery")
+        battery_times, battery_values = collector.history("battery", 600, MAX_CHART_POINTS)  # Battery is sampled every ~30 s; NaN gaps dropped
         percent = battery.percent
         power_plugged = battery.power_plugged
         
@@ -378,17 +712,13 @@ def battery_and_power_management():
         battery_status.metric(
             "Battery Status", 
             f"{percent}% ({status})",
-            f"{percent - battery_data[-1][1] if battery_data else 0:+.2f}%"
+            f"{percent - battery_values[-2] if len(battery_values) > 1 else 0:+.2f}%"
         )
 
-        # Update battery data
-        current_time = time.time()
-        battery_data.append((current_time, percent))
-
         # Create and update battery chart
         fig = go.Figure(data=go.Scatter(
-            x=[t for t, _ in battery_data],
-            y=[d for _, d in battery_data],
+            x=battery_times,
+            y=battery_values,
             mode='lines+markers',
             name='Battery Percentage',
             line=dict(color='blue'),
@@ -418,53 +748,39 @@ def battery_and_power_management():
         else:
             st.info("Power adapter is connected.")
 
-        # Wait for 1 second before updating
-        time.sleep(1)
+        # Wait for the collector's next sample before updating
+        time.sleep(collector.interval)
 
 
 def battery_and_power_management():
     st.title("Battery and Power Management")
 
-    # Initialize NVML for GPU monitoring
-    pynvml.nvmlInit()
-    handle = pynvml.nvmlDeviceGetHandleByIndex(0)  # Assuming first GPU
+    collector = get_collector()
+    collector.wait_for_sample(timeout=5)
 
     # Create placeholders for dynamic content
     power_usage = st.empty()
     battery_status = st.empty()
     battery_graph = st.empty()
 
-    # Initialize data storage for battery percentage
-    time_window = 60  # 60 seconds of data
-    battery_data = deque(maxlen=time_window)
-
-    def get_cpu_power():
-        physical_cores = psutil.cpu_count(logical=False)
-        freq = psutil.cpu_freq().current
-        usage = psutil.cpu_percent(interval=1) / 100.0
-        base_tdp = 35  # Assume a base TDP of 35W for a typical laptop CPU
-        estimated_tdp = base_tdp * (freq / 2000)  # Adjust TDP based on frequency
-        power = estimated_tdp * usage * physical_cores
-        return max(power, 1.0)  # Ensure we always return at least 1W when the CPU is on
-
     def get_power_usage():
-        cpu_power = get_cpu_power()
-        ram_power = psutil.virtual_memory().percent * 0.3  # Rough estimate, 0.3W per GB at 100% usage
-        gpu_power = pynvml.nvmlDeviceGetPowerUsage(handle) / 1000  # Convert mW to W
-        return cpu_power, ram_power, gpu_power
+        # Computed once per tick by the shared collector (RAPL when available)
+        snapshot = collector.snapshot()
+        return snapshot["cpu_power"], snapshot["ram_power"], snapshot["gpu_power"] or 0.0, snapshot["power_source"]
 
     def update_power_usage():
-        cpu_power, ram_power, gpu_power = get_power_usage()
+        cpu_power, ram_power, gpu_power, source = get_power_usage()
+        label = "measured via RAPL" if source == "rapl" else "estimated"
         power_usage.markdown(f"""
         ### Power Usage Estimates:
-        - CPU: {cpu_power:.2f} W
-        - RAM: {ram_power:.2f} W
+        - CPU: {cpu_power:.2f} W ({label})
+        - RAM: {ram_power:.2f} W ({label})
         - GPU: {gpu_power:.2f} W
         - Total: {cpu_power + ram_power + gpu_power:.2f} W
         """)
 
     def update_battery_status():
-        battery = psutil.sensors_battery()
+        battery = collector.snapshot().get("battery")
         if battery is None:
             battery_status.warning("No battery detected. This might be a desktop computer.")
             return None
@@ -478,12 +794,11 @@ def battery_and_power_management():
             delta=None
         )
 
-        current_time = datetime.now().strftime('%H:%M:%S')
-        battery_data.append((current_time, percent))
+        battery_times, battery_values = collector.history("battery", 600, MAX_CHART_POINTS)  # Battery is sampled every ~30 s; NaN gaps dropped
 
         fig = go.Figure(data=go.Scatter(
-            x=[t for t, _ in battery_data],
-            y=[d for _, d in battery_data],
+            x=[datetime.fromtimestamp(t).strftime('%H:%M:%S') for t in battery_times],
+            y=battery_values,
             mode='lines+markers',
             name='Battery Percentage',
             line=dict(color='blue'),
@@ -520,14 +835,75 @@ def battery_and_power_management():
     # Main loop for updating data
     update_interval = 5  # Update every 5 seconds
     for _ in range(12):  # Run for 1 minute (12 * 5 seconds)
+        collector.touch()
         update_power_usage()
         battery = update_battery_status()
         if battery is None:
             break  # Exit loop if no battery is detected
         time.sleep(update_interval)
 
-    # Shutdown NVML
-    pynvml.nvmlShutdown()
+
+def monitor_overhead():
+    st.title("Monitor Overhead")
+    st.caption("Timings cover every session of this process: the shared collector's steps "
+               "and each page's render steps, over the last 1000 calls of each.")
+
+    collector = get_collector()
+    collector.wait_for_sample(timeout=5)
+    usage = SelfUsage()
+
+    if st.button("Reset timings", key="reset_timings"):
+        TIMINGS.reset()
+
+    usage_placeholder = st.empty()
+    rates_placeholder = st.empty()
+    timings_placeholder = st.empty()
+    bytes_placeholder = st.empty()
+
+    # Chart payloads are only serialised for counting while this page is open
+    with TIMINGS.counting_bytes():
+        while True:
+            collector.touch()
+            own = usage.sample()
+            with usage_placeholder.container():
+                col1, col2, col3, col4 = st.columns(4)
+                col1.metric("Own CPU", f"{own['cpu_percent']:.1f}%")
+                col2.metric("Own RSS", get_size(own["rss"]))
+                col3.metric("Threads", own["threads"])
+                col4.metric("Base interval", f"{collector.interval:.2f} s")
+
+            # Effective per-metric sampling rates chosen by the scheduler
+            rates_placeholder.table([{
+                "Metric": row["metric"],
+                "Base": f"{row['base_s']:.2f} s",
+                "Interval": f"{row['interval_s']:.2f} s",
+                "Rate": f"{row['hz']:.2f} Hz",
+                "State": row["state"],
+            } for row in collector.scheduler.rates()])
+
+            timings_placeholder.table([{
+                "Step": row["step"],
+                "Calls": row["calls"],
+                "p50": f"{row['p50_ms']:.2f} ms",
+                "p99": f"{row['p99_ms']:.2f} ms",
+                "Max": f"{row['max_ms']:.2f} ms",
+            } for row in TIMINGS.summary()])
+
+            sizes = TIMINGS.bytes_summary()
+            if sizes:
+                bytes_placeholder.table([{
+                    "Sent to browser": row["step"],
+                    "Last tick": get_size(row["last_bytes"]),
+                    "Mean per tick": get_size(row["mean_bytes"]),
+                } for row in sizes] + [{
+                    "Sent to browser": "Total",
+                    "Last tick": get_size(sum(row["last_bytes"] for row in sizes)),
+                    "Mean per tick": get_size(sum(row["mean_bytes"] for row in sizes)),
+                }])
+            else:
+                bytes_placeholder.info("Open the Process Manager or Performance Graphs in another tab to see bytes per tick.")
+
+            time.sleep(2)
 
 
 def main():
@@ -538,8 +914,8 @@ def main():
         
         selected = option_menu(
             menu_title="Navigation",
-            options=["System Overview", "Process Manager", "Performance Graphs", "Battery & Power Management"],
-            icons=["cpu", "list", "bar-chart", "toggle-off", "battery", "thermometer"],
+            options=["System Overview", "Process Manager", "Performance Graphs", "Battery & Power Management", "Monitor Overhead"],
+            icons=["cpu", "list", "bar-chart", "toggle-off", "speedometer", "battery", "thermometer"],
             menu_icon="menu-button-wide",
             default_index=0,
             styles={
@@ -549,6 +925,15 @@ def main():
                 "nav-link-selected": {"background-color": "#FF0000", "color": "#FFFFFF"},
             },
         )
+
+        # Alert rules ($TASK_MANAGER_ALERTS) as of this page load
+        collector = get_collector()
+        if collector.alerts is not None:
+            firing = collector.alerts.active()
+            for rule in firing:
+                st.error(f"🔔 {rule.name}: {rule.message} (now {rule.value:.4g})")
+            if not firing:
+                st.caption(f"{len(collector.alerts.rules)} alert rules, none firing")
     
     if selected == "System Overview":
         system_overview()
@@ -558,6 +943,11 @@ def main():
         performance_graphs()
     elif selected == "Battery & Power Management":
         battery_and_power_management()
+    elif selected == "Monitor Overhead":
+        monitor_overhead()
 
 if __name__ == "__main__":
-    main()
+    if "--agent" in sys.argv[1:]:
+        agent.main(sys.argv[1:])
+    else:
+        main()
@@ -0,0 +1,79 @@
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import psutil
+
+import procfs
+from benchmarks.fakeproc import write_tree
+from processes import ProcessTable
+
+
+# Compares the psutil path (ProcessTable + system calls) with the bulk /proc
+# reader on synthetic /proc trees of increasing size.
+#
+#   python benchmarks/bench_procfs.py --sizes 1000 5000 20000
+
+
+def time_ticks(fn, ticks):
+    fn()  # first tick primes caches / previous samples
+    samples = []
+    for _ in range(ticks):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples), max(samples)
+
+
+def bench(size, ticks):
+    with tempfile.TemporaryDirectory() as root:
+        write_tree(root, processes=size)
+
+        old_procfs_path = psutil.PROCFS_PATH
+        psutil.PROCFS_PATH = root
+        try:
+            table = ProcessTable()
+
+            def psutil_tick():
+                psutil.cpu_percent(percpu=True)
+                psutil.virtual_memory()
+                psutil.net_io_counters()
+                table.sample()
+
+            psutil_ms = time_ticks(psutil_tick, ticks)
+        finally:
+            psutil.PROCFS_PATH = old_procfs_path
+
+        source = procfs.ProcfsSource(root)
+
+        def procfs_tick():
+            source.cpu_percent()
+            source.memory()
+            source.net_io()
+            source.processes()
+
+        procfs_ms = time_ticks(procfs_tick, ticks)
+        source.close()
+
+    return psutil_ms, procfs_ms
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 5000, 20000])
+    parser.add_argument("--ticks", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    print(f"{'processes':>10} {'psutil p50 ms':>14} {'procfs p50 ms':>14} {'speedup':>8}")
+    for size in args.sizes:
+        (psutil_p50, _), (procfs_p50, _) = bench(size, args.ticks)
+        print(f"{size:>10} {psutil_p50:>14.1f} {procfs_p50:>14.1f} {psutil_p50 / procfs_p50:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
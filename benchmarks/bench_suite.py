@@ -0,0 +1,281 @@
+import argparse
+import itertools
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import psutil
+from tabulate import tabulate
+
+import cgroup
+import procfs
+import recording
+from benchmarks.fakeproc import write_cgroup, write_tree
+from charts import CoreHeatmap, LiveChart, group_cores
+from collector import SERIES_GROUPS, MetricsCollector, PsutilSource
+from gpu import FakeNVML
+
+
+# Collection and rendering benchmarks against synthetic sources: a fake /proc
+# tree (read by psutil through psutil.PROCFS_PATH, and by the procfs source
+# directly), a fake cgroup v2 directory and FakeNVML, at a configurable number of processes, cores, NICs,
+# disks, GPUs and history length. Each case reports per-tick latency, bytes
+# allocated per tick and peak traced memory; --output saves the results as
+# JSON and --compare prints the change against an earlier run.
+#
+#   python benchmarks/bench_suite.py --processes 5000 --output before.json
+#   python benchmarks/bench_suite.py --processes 5000 --compare before.json
+
+
+class FakePlaceholder:
+    # Stands in for st.empty(): serialises the figure like Streamlit would
+    def __init__(self):
+        self.bytes = 0
+
+    def plotly_chart(self, figure, **kwargs):
+        self.bytes = len(figure.to_json())
+
+    def code(self, text):
+        self.bytes = len(text)
+
+    def table(self, rows):
+        self.bytes = len(json.dumps(rows))
+
+
+def measure(fn, ticks, warmup=1):
+    # Latency over ``ticks`` plain calls, then one more pass under tracemalloc
+    # for allocations (kept separate so tracing does not skew the timings)
+    for _ in range(warmup):
+        fn()
+
+    durations = []
+    for _ in range(ticks):
+        started = time.perf_counter()
+        fn()
+        durations.append(time.perf_counter() - started)
+
+    allocated = []
+    peaks = []
+    tracemalloc.start()
+    try:
+        for _ in range(ticks):
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+            fn()
+            after, peak = tracemalloc.get_traced_memory()
+            allocated.append(max(after - before, 0))
+            peaks.append(peak - before)
+    finally:
+        tracemalloc.stop()
+
+    durations = np.array(durations) * 1000
+    return {
+        "ticks": ticks,
+        "p50_ms": float(np.percentile(durations, 50)),
+        "p99_ms": float(np.percentile(durations, 99)),
+        "mean_ms": float(durations.mean()),
+        "retained_bytes_per_tick": float(np.mean(allocated)),
+        "peak_bytes_per_tick": float(np.max(peaks)),
+    }
+
+
+def backfill(collector, seconds, cores):
+    # Synthetic history so charts and queries see a full window
+    rng = np.random.default_rng(0)
+    now = time.time()
+    for i in range(int(seconds / collector.interval)):
+        t = now - seconds + i * collector.interval
+        for group, names in SERIES_GROUPS.items():
+            collector._history[group].append(t, rng.uniform(0, 100, len(names)))
+        collector._cores_history.append(t, rng.uniform(0, 100, cores))
+
+
+def make_collector(args, source):
+    return MetricsCollector(
+        interval=1.0,
+        history_seconds=args.history,
+        store=None,
+        source=source,
+        gpu_backend=FakeNVML(args.gpus),
+        cpu_count=args.cores,
+    )
+
+
+def run_cases(args, root):
+    results = {}
+
+    old_procfs_path = psutil.PROCFS_PATH
+    psutil.PROCFS_PATH = root
+    try:
+        collector = make_collector(args, PsutilSource())
+        results["collect_psutil"] = measure(collector.sample, args.ticks)
+        collector.stop()
+    finally:
+        psutil.PROCFS_PATH = old_procfs_path
+
+    cgroup_collector = make_collector(args, cgroup.CgroupSource(procfs.ProcfsSource(root), os.path.join(root, "cgroup")))
+    results["collect_cgroup"] = measure(cgroup_collector.sample, args.ticks)
+    cgroup_collector.stop()
+
+    collector = make_collector(args, procfs.ProcfsSource(root))
+    results["collect_procfs"] = measure(collector.sample, args.ticks)
+    # Same, also writing every series and process snapshots to a recording,
+    # kept under the temporary root so it goes away with it
+    recording_dir = os.path.join(root, "recordings")
+    collector.recorder = recording.Recorder(recording_dir, process_interval=60)
+    results["collect_recording"] = measure(collector.sample, args.ticks)
+    collector.recorder.close()
+    collector.recorder = None
+    backfill(collector, args.history, args.cores)
+    snapshot = collector.sample()
+
+    index = collector.process_index
+    results["process_index_update"] = measure(lambda: index.update(snapshot["processes"]), args.ticks)
+    history = collector.process_history
+    results["process_history_update"] = measure(
+        lambda: history.update(snapshot["processes"], time.time(), collector.source.process_io), args.ticks)
+    results["process_search"] = measure(lambda: index.query("worker", sort=[("rss", True), ("pid", False)]),
+                                        args.ticks)
+
+    def process_table():
+        # Same work as one process_manager() tick on its default page
+        _, page = index.query(sort=[("memory_percent", True)], limit=50)
+        rows = [{"PID": p["pid"], "Name": p["name"], "User": p["username"] or "",
+                 "Memory Usage": f"{p['memory_percent']:.2f}%", "CPU Usage": f"{p['cpu_percent'] or 0:.2f}%",
+                 "Status": p["status"]} for p in page]
+        placeholder.table(rows)
+
+    placeholder = FakePlaceholder()
+    results["render_process_table"] = measure(process_table, args.ticks)
+    results["render_process_table"]["bytes_per_tick"] = placeholder.bytes
+
+    for window in args.windows:
+        for mode in ("rolling", "full"):
+            placeholder = FakePlaceholder()
+            chart = LiveChart(placeholder, collector, [dict(series="cpu", name="CPU Usage")],
+                              "CPU Usage", "Percentage", window_seconds=window, points=args.points, mode=mode)
+
+            def render():
+                # A synthetic row stands in for the collector tick, so only
+                # the chart's own cost is measured
+                collector._history["cpu"].append(time.time(), [50.0])
+                chart.update()
+
+            name = f"render_chart_{mode}_{window}s"
+            results[name] = measure(render, args.ticks)
+            results[name]["bytes_per_tick"] = placeholder.bytes
+
+    cores_row = np.full(args.cores, 50.0)
+    # One base interval per tick: the per-core buffer averages faster appends
+    # into the current row, which the heatmap would then skip
+    tick_times = itertools.count(time.time(), collector.interval)
+    topology = {"numa": {core: core * 4 // args.cores for core in range(args.cores)}}
+    for grouping in (None, "numa"):
+        placeholder = FakePlaceholder()
+        heatmap = CoreHeatmap(placeholder, collector, args.history, groups=group_cores(args.cores, grouping, topology),
+                              points=args.points)
+
+        def render():
+            collector._cores_history.append(next(tick_times), cores_row)
+            heatmap.update()
+
+        name = f"render_core_heatmap_{grouping or 'cores'}"
+        results[name] = measure(render, args.ticks)
+        results[name]["bytes_per_tick"] = placeholder.bytes
+
+    results["history_query"] = measure(lambda: collector.history("cpu", args.history, args.points), args.ticks)
+    results["cores_window"] = measure(lambda: collector.cores_history(args.history), args.ticks)
+
+    # A recording as long as the history, replayed through the chart query
+    recorder = recording.Recorder(recording_dir)
+    times, values = collector.history("cpu")
+    for t, value in zip(times.tolist(), values.tolist()):
+        recorder.append(t, {"cpu": value})
+    recorder.close()
+    replay = recording.Recording(recorder.path)
+    cursor = recording.ReplayCursor(replay)
+    cursor.seek(replay.end)
+    results["replay_window"] = measure(lambda: cursor.history("cpu", args.history, args.points), args.ticks)
+    replay.close()
+    collector.stop()
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results, baseline=None):
+    rows = []
+    for name, r in results.items():
+        row = [name, f"{r['p50_ms']:.2f}", f"{r['p99_ms']:.2f}",
+               f"{r['retained_bytes_per_tick'] / 1024:.1f}", f"{r['peak_bytes_per_tick'] / 1024:.1f}",
+               r.get("bytes_per_tick", "")]
+        if baseline is not None:
+            before = baseline.get(name)
+            row.append(f"{r['p50_ms'] / before['p50_ms']:.2f}x" if before and before["p50_ms"] else "new")
+        rows.append(row)
+    headers = ["case", "p50 ms", "p99 ms", "retained KiB/tick", "peak KiB/tick", "bytes out"]
+    if baseline is not None:
+        headers.append("p50 vs baseline")
+    print(tabulate(rows, headers=headers))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark collection and rendering on synthetic sources.")
+    parser.add_argument("--processes", type=int, default=2000)
+    parser.add_argument("--cores", type=int, default=16)
+    parser.add_argument("--nics", type=int, default=8)
+    parser.add_argument("--disks", type=int, default=8)
+    parser.add_argument("--gpus", type=int, default=2)
+    parser.add_argument("--history", type=int, default=3600, help="history length in seconds")
+    parser.add_argument("--windows", type=int, nargs="+", default=[60, 3600], help="chart windows in seconds")
+    parser.add_argument("--points", type=int, default=1000, help="max points per chart trace")
+    parser.add_argument("--ticks", type=int, default=20)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="JSON file from an earlier run to compare against")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as root:
+        write_tree(root, processes=args.processes, cpus=args.cores, nics=args.nics, disks=args.disks)
+        write_cgroup(os.path.join(root, "cgroup"), devices=args.disks)
+        results = run_cases(args, root)
+
+    report = {
+        "revision": git_revision(),
+        "time": time.time(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "parameters": {k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+        # ru_maxrss is KiB on Linux, bytes on macOS
+        "peak_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == "darwin" else 1024),
+        "results": results,
+    }
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+    print_results(results, baseline)
+    print(f"peak RSS: {report['peak_rss_bytes'] / 1024 ** 2:.1f} MiB")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
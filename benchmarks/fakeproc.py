@@ -0,0 +1,122 @@
+import os
+import random
+
+
+# Writes a synthetic /proc tree with just enough files for both psutil
+# (pointed at it through psutil.PROCFS_PATH) and procfs.ProcfsSource, and a
+# synthetic cgroup v2 directory for cgroup.CgroupSource.
+
+STAT_TEMPLATE = (
+    "{pid} ({name}) {state} {ppid} {pid} {pid} 0 -1 4194304 80 0 0 0 {utime} {stime} 0 0 20 0 "
+    "{threads} 0 {start} {vsize} {rss} 18446744073709551615 0 0 0 0 0 0 0 0 0 0 0 0 17 0 0 0 0 0 0 0 0 0 0 0 0 0 0\n"
+)
+
+MEMINFO = """MemTotal:       16384000 kB
+MemFree:         4096000 kB
+MemAvailable:    8192000 kB
+Buffers:          512000 kB
+Cached:          3072000 kB
+SwapCached:            0 kB
+Active:          6144000 kB
+Inactive:        2048000 kB
+SwapTotal:       2097152 kB
+SwapFree:        2097152 kB
+Shmem:            102400 kB
+SReclaimable:     256000 kB
+"""
+
+NET_DEV_HEADER = (
+    "Inter-|   Receive                                                |  Transmit\n"
+    " face |bytes    packets errs drop fifo frame compressed multicast|bytes    packets errs drop fifo colls carrier compressed\n"
+)
+
+
+def write_tree(root, processes=1000, cpus=8, nics=4, disks=4, seed=0):
+    rng = random.Random(seed)
+    os.makedirs(os.path.join(root, "net"), exist_ok=True)
+
+    with open(os.path.join(root, "stat"), "w") as f:
+        f.write("cpu  %s\n" % " ".join(str(rng.randint(1000, 100000) * cpus) for _ in range(10)))
+        for cpu in range(cpus):
+            f.write("cpu%d %s\n" % (cpu, " ".join(str(rng.randint(1000, 100000)) for _ in range(10))))
+        f.write("intr 0\nctxt 0\nbtime 1700000000\nprocesses %d\nprocs_running 1\nprocs_blocked 0\n" % processes)
+
+    with open(os.path.join(root, "meminfo"), "w") as f:
+        f.write(MEMINFO)
+
+    with open(os.path.join(root, "vmstat"), "w") as f:
+        f.write("pgpgin 0\npgpgout 0\npswpin 0\npswpout 0\n")
+
+    with open(os.path.join(root, "cpuinfo"), "w") as f:
+        for cpu in range(cpus):
+            f.write("processor\t: %d\ncpu MHz\t\t: %.3f\n\n" % (cpu, rng.uniform(1200, 3600)))
+
+    with open(os.path.join(root, "net", "dev"), "w") as f:
+        f.write(NET_DEV_HEADER)
+        for nic in range(nics):
+            counters = " ".join(str(rng.randint(0, 10 ** 9)) for _ in range(16))
+            f.write("  eth%d: %s\n" % (nic, counters))
+
+    with open(os.path.join(root, "diskstats"), "w") as f:
+        for disk in range(disks):
+            counters = " ".join(str(rng.randint(0, 10 ** 6)) for _ in range(17))
+            f.write(" 259       %d nvme%dn1 %s\n" % (disk, disk, counters))
+
+    for pid in range(1, processes + 1):
+        pid_dir = os.path.join(root, str(pid))
+        os.makedirs(pid_dir, exist_ok=True)
+        rss = rng.randint(100, 100000)
+        threads = rng.randint(1, 32)
+        with open(os.path.join(pid_dir, "stat"), "w") as f:
+            f.write(STAT_TEMPLATE.format(
+                pid=pid, name="proc-%d" % pid, state=rng.choice("RSSSSD"), ppid=max(1, pid // 2),
+                utime=rng.randint(0, 10 ** 6), stime=rng.randint(0, 10 ** 5), threads=threads,
+                start=rng.randint(0, 10 ** 6), vsize=rss * 8192, rss=rss,
+            ))
+        with open(os.path.join(pid_dir, "statm"), "w") as f:
+            f.write("%d %d %d 1 0 %d 0\n" % (rss * 2, rss, rss // 4, rss))
+        with open(os.path.join(pid_dir, "status"), "w") as f:
+            f.write("Name:\tproc-%d\nState:\tS (sleeping)\nPPid:\t%d\nUid:\t0\t0\t0\t0\nThreads:\t%d\n"
+                    % (pid, max(1, pid // 2), threads))
+        with open(os.path.join(pid_dir, "cmdline"), "w") as f:
+            f.write("/usr/bin/proc-%d\0--worker\0%d\0" % (pid, rng.randint(0, 99)))
+        with open(os.path.join(pid_dir, "io"), "w") as f:
+            read_bytes, write_bytes = rng.randint(0, 10 ** 9), rng.randint(0, 10 ** 9)
+            f.write("rchar: %d\nwchar: %d\nsyscr: 0\nsyscw: 0\nread_bytes: %d\nwrite_bytes: %d\n"
+                    "cancelled_write_bytes: 0\n" % (read_bytes, write_bytes, read_bytes, write_bytes))
+
+    return root
+
+
+def write_cgroup(path, cpu_quota=200000, cpu_period=100000, cpus="0-7", memory_max=2 * 1024 ** 3,
+                 memory_current=1024 ** 3, inactive_file=128 * 1024 ** 2, usage_usec=10 ** 9,
+                 nr_periods=1000, nr_throttled=100, throttled_usec=5 * 10 ** 6, devices=2):
+    # One cgroup directory; call again with larger counters to advance it.
+    # ``cpu_quota``/``memory_max`` of None write "max" (no limit).
+    os.makedirs(path, exist_ok=True)
+    files = {
+        "cgroup.controllers": "cpuset cpu io memory pids\n",
+        "cpu.max": "%s %d\n" % ("max" if cpu_quota is None else cpu_quota, cpu_period),
+        "cpuset.cpus.effective": cpus + "\n",
+        "cpu.stat": "usage_usec %d\nuser_usec %d\nsystem_usec %d\nnr_periods %d\nnr_throttled %d\n"
+                    "throttled_usec %d\n" % (usage_usec, usage_usec * 3 // 4, usage_usec // 4, nr_periods,
+                                             nr_throttled, throttled_usec),
+        "memory.current": "%d\n" % memory_current,
+        "memory.max": "max\n" if memory_max is None else "%d\n" % memory_max,
+        "memory.stat": "anon %d\nfile %d\ninactive_file %d\nactive_file 0\n"
+                       % (memory_current - 2 * inactive_file, 2 * inactive_file, inactive_file),
+        "memory.swap.current": "0\n",
+        "memory.swap.max": "max\n",
+        "io.stat": "".join("259:%d rbytes=%d wbytes=%d rios=%d wios=%d dbytes=0 dios=0\n"
+                           % (d, usage_usec * 4, usage_usec * 2, usage_usec // 4096, usage_usec // 8192)
+                           for d in range(devices)),
+    }
+    for resource, some, full in (("cpu", 1.5, 0.0), ("memory", 0.25, 0.1), ("io", 3.0, 1.0)):
+        files[resource + ".pressure"] = ("some avg10=%.2f avg60=0.00 avg300=0.00 total=0\n"
+                                         "full avg10=%.2f avg60=0.00 avg300=0.00 total=0\n" % (some, full))
+    for name, content in files.items():
+        # Rewritten in place, so handles kept open by a source see the update
+        with open(os.path.join(path, name), "r+" if os.path.exists(os.path.join(path, name)) else "w") as f:
+            f.write(content)
+            f.truncate()
+    return path
@@ -0,0 +1,226 @@
+import os
+import time
+
+from procfs import Memory, Swap, _ProcFile
+
+
+# Container-aware CPU and memory: inside a container, /proc and psutil report
+# the host, so usage is read from this process's cgroup v2 directory instead
+# and measured against its quotas:
+#
+#   cpu.stat, cpu.max           CPU time used vs. the quota, throttling
+#   memory.current, memory.max  usage vs. the limit (minus inactive page cache
+#   memory.stat                 from memory.stat, like `docker stats`)
+#   memory.swap.*               swap usage vs. its limit, when present
+#   io.stat                     bytes and IOs across all devices
+#   *.pressure                  PSI stall averages
+#
+# Files are opened once and re-read in place like the procfs source. A file
+# the cgroup does not have (the root cgroup has no cpu.max or memory.max, a
+# controller may be disabled) falls back to the host value. ``path`` can point
+# at any directory with the same layout (see benchmarks/fakeproc.py).
+#
+# CgroupSource wraps another source (procfs or psutil) and only replaces
+# cpu_percent() and memory(); processes, network and per-disk I/O still come
+# from the wrapped source, as does the per-core breakdown, which cgroups do
+# not account.
+
+CGROUP_ROOT = "/sys/fs/cgroup"
+
+METRICS = [
+    "cpu_limit",
+    "throttled_percent",
+    "throttled_ms_per_s",
+    "cpu_some_avg10",
+    "memory_some_avg10",
+    "memory_full_avg10",
+    "io_some_avg10",
+    "io_full_avg10",
+    "io_read_rate",
+    "io_write_rate",
+    "io_read_iops",
+    "io_write_iops",
+]
+
+IO_FIELDS = {b"rbytes": 0, b"wbytes": 1, b"rios": 2, b"wios": 3}
+
+
+def is_supported(path):
+    return os.path.isfile(os.path.join(path, "cgroup.controllers"))
+
+
+def find_cgroup(root=CGROUP_ROOT, proc_root="/proc"):
+    # This process's cgroup v2 directory, or None on a v1-only host. With a
+    # cgroup namespace (the container default) the path is "/", i.e. ``root``.
+    try:
+        with open(os.path.join(proc_root, "self", "cgroup")) as f:
+            lines = f.read().splitlines()
+    except OSError:
+        lines = []
+    for line in lines:
+        if line.startswith("0::"):
+            path = os.path.join(root, line[3:].lstrip("/"))
+            if is_supported(path):
+                return path
+    return root if is_supported(root) else None
+
+
+def _flat_keyed(data):
+    # "key value" lines (cpu.stat, memory.stat) -> {key: int}
+    values = {}
+    for line in data.split(b"\n"):
+        key, _, value = line.partition(b" ")
+        if value:
+            values[key.decode()] = int(value)
+    return values
+
+
+def _pressure(data):
+    # PSI file -> {"some": avg10, "full": avg10}
+    values = {}
+    for line in data.split(b"\n"):
+        kind, _, rest = line.partition(b" ")
+        for field in rest.split():
+            if field.startswith(b"avg10="):
+                values[kind.decode()] = float(field[6:])
+    return values
+
+
+def _limit(data):
+    # "max" or a number of bytes
+    value = data.strip()
+    return None if value == b"max" or not value else int(value)
+
+
+class CgroupSource:
+    name = "cgroup"
+
+    def __init__(self, base, path=None):
+        # ``base``: the source everything not cgroup-specific is read from
+        path = path or os.environ.get("TASK_MANAGER_CGROUP_PATH") or find_cgroup()
+        if path is None or not is_supported(path):
+            raise RuntimeError("The cgroup source needs a cgroup v2 hierarchy")
+        self.base = base
+        self.path = path
+        self._files = {}
+        for name in ("cpu.stat", "cpu.max", "cpuset.cpus.effective", "memory.current", "memory.max",
+                     "memory.stat", "memory.swap.current", "memory.swap.max", "io.stat",
+                     "cpu.pressure", "memory.pressure", "io.pressure"):
+            file_path = os.path.join(path, name)
+            if os.path.exists(file_path):
+                self._files[name] = _ProcFile(file_path)
+
+        self._host_cpus = self._count_host_cpus()
+        self._prev_usage = None
+        self._prev_stats = None
+        self.cpu_percent()
+        self.stats()
+
+    def __getattr__(self, name):
+        # net_io, disk_io, processes, process_io, ... come from the base source
+        if name == "base":
+            raise AttributeError(name)
+        return getattr(self.base, name)
+
+    def close(self):
+        for f in self._files.values():
+            f.close()
+        self.base.close()
+
+    def _read(self, name):
+        f = self._files.get(name)
+        return f.read() if f is not None else None
+
+    def _count_host_cpus(self):
+        # CPUs the cgroup may run on (cpuset), else every CPU
+        data = self._read("cpuset.cpus.effective")
+        count = 0
+        for part in (data or b"").strip().split(b","):
+            if not part:
+                continue
+            low, _, high = part.partition(b"-")
+            count += int(high or low) - int(low) + 1
+        return count or os.cpu_count() or 1
+
+    def cpu_limit(self):
+        # Cores the cgroup may use: quota / period from cpu.max, else its CPUs
+        data = self._read("cpu.max")
+        if data:
+            quota, _, period = data.strip().partition(b" ")
+            if quota != b"max" and period:
+                return min(int(quota) / int(period), self._host_cpus)
+        return float(self._host_cpus)
+
+    def cpu_percent(self):
+        # Share of the quota used since the last call; per-core values are the
+        # host's, from the base source
+        _, cores = self.base.cpu_percent()
+        data = self._read("cpu.stat")
+        if data is None:
+            return 0.0, cores
+        usage, now = _flat_keyed(data).get("usage_usec", 0), time.monotonic()
+        prev, self._prev_usage = self._prev_usage, (usage, now)
+        if prev is None or now <= prev[1]:
+            return 0.0, cores
+        percent = (usage - prev[0]) / ((now - prev[1]) * 1e6 * self.cpu_limit()) * 100.0
+        return round(min(max(percent, 0.0), 100.0), 1), cores
+
+    def memory(self):
+        host_memory, host_swap = self.base.memory()
+        current = self._read("memory.current")
+        if current is None:
+            return host_memory, host_swap
+        current = int(current)
+        limit = _limit(self._read("memory.max") or b"max")
+        total = min(limit, host_memory.total) if limit is not None else host_memory.total
+        inactive_file = _flat_keyed(self._read("memory.stat") or b"").get("inactive_file", 0)
+        used = max(current - inactive_file, 0)
+        available = max(total - used, 0)
+        percent = round(used * 100.0 / total, 1) if total else 0.0
+        memory = Memory(total, available, percent, used, max(total - current, 0))
+
+        swap_current = self._read("memory.swap.current")
+        if swap_current is None:
+            return memory, host_swap
+        swap_used = int(swap_current)
+        swap_limit = _limit(self._read("memory.swap.max") or b"max")
+        swap_total = min(swap_limit, host_swap.total) if swap_limit is not None else host_swap.total
+        swap_percent = round(swap_used * 100.0 / swap_total, 1) if swap_total else 0.0
+        return memory, Swap(swap_total, swap_used, max(swap_total - swap_used, 0), swap_percent)
+
+    def _io_totals(self):
+        # (rbytes, wbytes, rios, wios) summed over every device in io.stat
+        totals = [0, 0, 0, 0]
+        for line in (self._read("io.stat") or b"").split(b"\n"):
+            for field in line.split()[1:]:
+                key, _, value = field.partition(b"=")
+                index = IO_FIELDS.get(key)
+                if index is not None:
+                    totals[index] += int(value)
+        return totals
+
+    def stats(self):
+        # {metric: value} for METRICS; rates are None on the first call
+        now = time.monotonic()
+        cpu = _flat_keyed(self._read("cpu.stat") or b"")
+        io = self._io_totals()
+        counters = (cpu.get("nr_periods", 0), cpu.get("nr_throttled", 0), cpu.get("throttled_usec", 0), io)
+        prev, self._prev_stats = self._prev_stats, (now, counters)
+
+        values = dict.fromkeys(METRICS)
+        values["cpu_limit"] = self.cpu_limit()
+        for resource in ("cpu", "memory", "io"):
+            pressure = _pressure(self._read(f"{resource}.pressure") or b"")
+            values[f"{resource}_some_avg10"] = pressure.get("some")
+            if resource != "cpu":
+                values[f"{resource}_full_avg10"] = pressure.get("full")
+
+        if prev is not None and now > prev[0]:
+            elapsed = now - prev[0]
+            (periods, throttled, throttled_usec, prev_io) = prev[1]
+            d_periods = counters[0] - periods
+            values["throttled_percent"] = (counters[1] - throttled) * 100.0 / d_periods if d_periods > 0 else 0.0
+            values["throttled_ms_per_s"] = max(counters[2] - throttled_usec, 0) / 1000.0 / elapsed
+            rates = [max(a - b, 0) / elapsed for a, b in zip(io, prev_io)]
+            values.update(io_read_rate=rates[0], io_write_rate=rates[1], io_read_iops=rates[2], io_write_iops=rates[3])
+        return values
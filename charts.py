@@ -0,0 +1,325 @@
+import time
+
+import numpy as np
+import plotly.graph_objects as go
+
+from instrumentation import TIMINGS
+
+
+# Streamlit re-sends the whole figure spec on every plotly_chart call, so each
+# tick sends the full visible window whatever the mode. LiveChart's rolling
+# mode is a fixed-size window redraw: the figure is built once and its trace
+# data is a fixed number of time buckets, into which only the samples that
+# arrived since the last tick are folded. The full mode re-queries and
+# downsamples the window and builds a new figure every tick.
+#
+# Streamlit's own theme replaces the figure template in the browser, so in
+# both modes the default Plotly template (several KB of JSON per chart) is
+# never sent.
+
+EMPTY_TEMPLATE = go.layout.Template()
+
+# Upper bound on heatmap cells (rows x time buckets) per figure; more rows
+# (cores or core groups) means fewer, wider time buckets
+MAX_HEATMAP_CELLS = 50000
+
+
+class RollingSeries:
+    # Fixed number of time buckets covering ``window_seconds``. New samples are
+    # folded into the newest bucket (keeping the max, so spikes stay visible)
+    # and old buckets drop off the left as time advances.
+
+    def __init__(self, window_seconds, points, interval=1.0):
+        self.points = int(max(2, min(points, window_seconds / interval)))
+        self.bucket = window_seconds / self.points
+        self.x = np.full(self.points, np.nan)
+        self.y = np.full(self.points, np.nan)
+        self.filled = 0
+        self.last_time = None
+        self._last_bucket = None
+
+    def extend(self, times, values):
+        if self.last_time is not None:
+            start = np.searchsorted(times, self.last_time, side="right")
+            times, values = times[start:], values[start:]
+        if not len(times):
+            return 0
+
+        for t, v in zip(times.tolist(), values.tolist()):
+            if v != v:  # NaN: metric unavailable for this sample
+                continue
+            b = int(t // self.bucket)
+            if b == self._last_bucket:
+                if not self.y[-1] >= v:
+                    self.y[-1] = v
+                self.x[-1] = t
+                continue
+            if self._last_bucket is None:
+                shift = self.points
+                self.filled = 1
+            else:
+                shift = min(b - self._last_bucket, self.points)
+                self.filled = min(self.filled + shift, self.points)
+            self.x[:-shift] = self.x[shift:]
+            self.y[:-shift] = self.y[shift:]
+            self.x[-shift:] = np.nan
+            self.y[-shift:] = np.nan
+            self.x[-1] = t
+            self.y[-1] = v
+            self._last_bucket = b
+
+        self.last_time = times[-1]
+        return len(times)
+
+    def data(self):
+        x = self.x[-self.filled:]
+        y = self.y[-self.filled:]
+        mask = np.isfinite(x)
+        return x[mask], y[mask]
+
+
+class RollingMatrix:
+    # RollingSeries for many columns at once, for the per-core heatmap: a
+    # preallocated (points, rows) block of time buckets. Each sample's columns
+    # are first folded into rows (the groups' mean, or max with
+    # reducer="max"); each bucket then keeps the mean or max of its samples.
+    # Only samples newer than the last call are read, vectorised per call.
+
+    def __init__(self, window_seconds, points, interval=1.0, groups=None, columns=1, reducer="mean"):
+        # ``groups``: [(label, [column, ...]), ...]; default one row per column
+        if groups is None:
+            groups = [(str(i), [i]) for i in range(columns)]
+        self.labels = [label for label, _ in groups]
+        self.reducer = reducer
+        self._order = np.concatenate([np.asarray(members, dtype=np.intp) for _, members in groups])
+        sizes = np.array([len(members) for _, members in groups])
+        self._starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+        self._sizes = sizes
+
+        self.points = int(max(2, min(points, window_seconds / interval)))
+        self.bucket = window_seconds / self.points
+        rows = len(groups)
+        self.x = np.full(self.points, np.nan)
+        self._sum = np.zeros((self.points, rows))
+        self._max = np.full((self.points, rows), np.nan)
+        self._count = np.zeros(self.points, dtype=np.int64)
+        self.last_time = None
+        self._last_bucket = None
+
+    def _rows(self, values):
+        values = values[:, self._order]
+        if self.reducer == "max":
+            return np.maximum.reduceat(values, self._starts, axis=1)
+        return np.add.reduceat(values, self._starts, axis=1) / self._sizes
+
+    def _shift(self, shift):
+        # Drop the oldest ``shift`` buckets and clear as many at the right
+        shift = min(shift, self.points)
+        for block, empty in ((self.x, np.nan), (self._sum, 0.0), (self._max, np.nan), (self._count, 0)):
+            block[:-shift] = block[shift:]
+            block[-shift:] = empty
+
+    def extend(self, times, values):
+        if self.last_time is not None:
+            start = np.searchsorted(times, self.last_time, side="right")
+            times, values = times[start:], values[start:]
+        if not len(times):
+            return 0
+        self.last_time = times[-1]
+        finite = np.isfinite(values).all(axis=1)
+        times, values = times[finite], values[finite]
+        if not len(times):
+            return 0
+
+        rows = self._rows(values.astype(np.float64))
+        buckets = (times // self.bucket).astype(np.int64)
+        newest = int(buckets[-1])
+        if self._last_bucket is None:
+            self._shift(self.points)
+        elif newest > self._last_bucket:
+            self._shift(newest - self._last_bucket)
+        self._last_bucket = newest
+
+        # One entry per run of samples in the same bucket, merged into place
+        starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+        ends = np.r_[starts[1:], len(times)]
+        positions = self.points - 1 - (newest - buckets[starts])
+        keep = positions >= 0  # runs older than the window; always a prefix
+        starts, ends, positions = starts[keep], ends[keep], positions[keep]
+        if len(positions):
+            self._sum[positions] += np.add.reduceat(rows, starts, axis=0)
+            self._max[positions] = np.fmax(self._max[positions], np.maximum.reduceat(rows, starts, axis=0))
+            self._count[positions] += ends - starts
+            self.x[positions] = times[ends - 1]
+        return len(times)
+
+    def data(self):
+        # (times (n,), values (n, rows)) for the buckets that have samples
+        filled = self._count > 0
+        if self.reducer == "max":
+            values = self._max[filled]
+        else:
+            values = self._sum[filled] / self._count[filled, None]
+        return self.x[filled], values
+
+
+def group_cores(count, by=None, topology=None):
+    # Heatmap rows: one per core, or one per socket / NUMA node (``by`` is a
+    # key of sysinfo.cpu_topology()). Cores missing from the topology keep
+    # their own row.
+    mapping = (topology or {}).get(by) or {}
+    if not mapping:
+        return [(f"Core {core}", [core]) for core in range(count)]
+    label = "Socket" if by == "socket" else "Node"
+    groups = {}
+    for core in range(count):
+        key = mapping.get(core)
+        groups.setdefault((0, key) if key is not None else (1, core), []).append(core)
+    return [(f"{label} {key}" if unknown == 0 else f"Core {key}", members)
+            for (unknown, key), members in sorted(groups.items())]
+
+
+class CoreHeatmap:
+    # Cores (or core groups) x time heatmap over the collector's preallocated
+    # per-core buffer. The bucket count is capped so rows x buckets stays
+    # under MAX_HEATMAP_CELLS, keeping the payload flat as core count grows.
+    def __init__(self, placeholder, collector, window_seconds, groups=None, reducer="mean",
+                 points=1000, max_cells=MAX_HEATMAP_CELLS, title='CPU Cores Usage'):
+        self.placeholder = placeholder
+        self.collector = collector
+        self.window_seconds = window_seconds
+        _, values = collector.cores_history(0)
+        columns = values.shape[1]
+        rows = len(groups) if groups is not None else columns
+        self.title = title
+        self.matrix = RollingMatrix(window_seconds, min(points, max(2, max_cells // rows)), collector.interval,
+                                    groups, columns, reducer)
+        self._figure = go.Figure(go.Heatmap(
+            x=[], y=self.matrix.labels, z=[], zmin=0, zmax=100, colorscale="Blues",
+            colorbar=dict(title="%"), hovertemplate="%{y}<br>%{x}<br>%{z:.1f}%<extra></extra>"))
+        self._figure.update_layout(title=title, xaxis_title='Time', template=EMPTY_TEMPLATE, uirevision=title,
+                                   yaxis=dict(autorange="reversed"))
+        self._drawn = False
+
+    def update(self):
+        started = time.perf_counter()
+        times, values = self.collector.cores_history(self.window_seconds)
+        if not self.matrix.extend(times, values) and self._drawn:
+            return  # the CPU group was not sampled since the last tick
+        self._drawn = True
+        x, z = self.matrix.data()
+        heatmap = self._figure.data[0]
+        heatmap.x = (x * 1000).astype("datetime64[ms]")
+        # Plotly ships arrays as binary; float32 is plenty for a colour scale
+        heatmap.z = z.T.astype(np.float32)
+        TIMINGS.record(f"render: figure {self.title}", time.perf_counter() - started)
+        payload = self._figure.to_json() if TIMINGS.count_bytes else None
+        with TIMINGS.time(f"render: plotly_chart {self.title}"):
+            self.placeholder.plotly_chart(self._figure, use_container_width=True)
+        if payload is not None:
+            TIMINGS.record_bytes(f"chart {self.title}", len(payload))
+
+
+class LiveChart:
+    def __init__(self, placeholder, collector, traces, title, yaxis_title, window_seconds,
+                 points=1000, mode="rolling", measure=False):
+        # ``traces`` is a list of dicts with the collector series name plus the
+        # Scatter styling (name, line, fill, fillcolor, ...)
+        self.placeholder = placeholder
+        self.collector = collector
+        self.traces = traces
+        self.window_seconds = window_seconds
+        self.points = points
+        self.mode = mode
+        self.measure = measure
+        self.layout = dict(title=title, xaxis_title='Time', yaxis_title=yaxis_title, template=EMPTY_TEMPLATE)
+
+        self.stats = RenderStats()
+        self._series = [RollingSeries(window_seconds, points, collector.interval) for _ in traces]
+        self._figure = self._build_figure()
+        self._figure.update_layout(uirevision=title)
+
+    def _build_figure(self, data=None):
+        figure = go.Figure()
+        for i, trace in enumerate(self.traces):
+            style = {k: v for k, v in trace.items() if k != "series"}
+            x, y = data[i] if data is not None else ((), ())
+            figure.add_trace(go.Scatter(x=x, y=y, mode='lines', **style))
+        figure.update_layout(**self.layout)
+        return figure
+
+    def _full_figure(self):
+        data = [self.collector.history(trace["series"], self.window_seconds, self.points) for trace in self.traces]
+        return self._build_figure(data)
+
+    def _rolling_figure(self):
+        with self._figure.batch_update():
+            for trace, series, fig_trace in zip(self.traces, self._series, self._figure.data):
+                times, values = self.collector.history(trace["series"], self.window_seconds)
+                series.extend(times, values)
+                fig_trace.x, fig_trace.y = series.data()
+        return self._figure
+
+    def update(self):
+        title = self.layout["title"]
+        started = time.perf_counter()
+        figure = self._rolling_figure() if self.mode == "rolling" else self._full_figure()
+        built = time.perf_counter()
+        TIMINGS.record(f"render: figure {title}", built - started)
+        payload = figure.to_json() if self.measure or TIMINGS.count_bytes else None
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        with TIMINGS.time(f"render: plotly_chart {title}"):
+            self.placeholder.plotly_chart(figure, use_container_width=True)
+        if payload is not None:
+            TIMINGS.record_bytes(f"chart {title}", len(payload))
+
+        if self.measure:
+            # Shadow the full rebuild so the saving can be reported side by side
+            started = time.perf_counter()
+            full_payload = self._full_figure().to_json() if self.mode == "rolling" else payload
+            full_ms = (time.perf_counter() - started) * 1000 if self.mode == "rolling" else elapsed_ms
+            self.stats.record(len(payload), elapsed_ms, len(full_payload), full_ms)
+
+
+class RenderStats:
+    def __init__(self):
+        self.ticks = 0
+        self.bytes = 0
+        self.ms = 0.0
+        self.full_bytes = 0
+        self.full_ms = 0.0
+
+    def record(self, nbytes, ms, full_bytes, full_ms):
+        self.ticks += 1
+        self.bytes = nbytes
+        self.ms = ms
+        self.full_bytes = full_bytes
+        self.full_ms = full_ms
+
+    @property
+    def bytes_saved(self):
+        return self.full_bytes - self.bytes
+
+    @property
+    def ms_saved(self):
+        return self.full_ms - self.ms
+
+
+def summarize_stats(charts):
+    # One row per chart for st.table
+    rows = []
+    for name, chart in charts.items():
+        s = chart.stats
+        if not s.ticks:
+            continue
+        rows.append({
+            "Chart": name,
+            "Bytes/tick": s.bytes,
+            "Full redraw bytes": s.full_bytes,
+            "Bytes saved": s.bytes_saved,
+            "ms/tick": f"{s.ms:.2f}",
+            "Full redraw ms": f"{s.full_ms:.2f}",
+            "ms saved": f"{s.ms_saved:.2f}",
+        })
+    return rows
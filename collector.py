@@ -0,0 +1,477 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+import psutil
+
+import alerts
+import cgroup
+import diskio
+import gpu
+import procfs
+import recording
+from history import HistoryStore
+from instrumentation import timed
+from network import NetworkRates, total_rate
+from power import PowerMonitor
+from processes import ProcessTable
+from prochistory import ProcessHistory
+from procindex import ProcessIndex
+from scheduler import AdaptiveScheduler, default_schedules
+from timeseries import RingBuffer, downsample
+
+
+# One sampler per process. Every Streamlit session (and every page inside a
+# session) reads the snapshot/history kept here instead of calling psutil and
+# NVML itself, so the sampling cost does not grow with the number of viewers.
+
+class PsutilSource:
+    # Portable source. procfs.ProcfsSource implements the same methods with
+    # bulk /proc reads on Linux.
+    name = "psutil"
+
+    def __init__(self):
+        self._process_table = ProcessTable()
+        # Prime the non-blocking cpu_percent counters
+        psutil.cpu_percent()
+        psutil.cpu_percent(percpu=True)
+
+    def cpu_percent(self):
+        return psutil.cpu_percent(), psutil.cpu_percent(percpu=True)
+
+    def memory(self):
+        return psutil.virtual_memory(), psutil.swap_memory()
+
+    def net_io(self, pernic=False):
+        return psutil.net_io_counters(pernic=pernic)
+
+    def disk_io(self):
+        return psutil.disk_io_counters(perdisk=True) or {}
+
+    def processes(self):
+        return self._process_table.sample()
+
+    def process_io(self, pids):
+        return self._process_table.io_counters(pids)
+
+    def close(self):
+        pass
+
+
+def make_source(name=None):
+    # "psutil" (default), "procfs", "auto" (procfs when /proc is usable), or
+    # "cgroup" (CPU and memory against this container's cgroup v2 limits,
+    # everything else from procfs or psutil)
+    name = name or os.environ.get("TASK_MANAGER_SOURCE", "psutil")
+    if name == "cgroup":
+        return cgroup.CgroupSource(make_source("auto"))
+    if name in ("procfs", "auto") and psutil.LINUX and procfs.is_supported():
+        return procfs.ProcfsSource()
+    if name == "procfs":
+        raise RuntimeError("The procfs source needs a Linux /proc filesystem")
+    return PsutilSource()
+
+
+# Network series are rates in bytes/s (the raw counters only ever grow)
+SERIES = ["cpu", "memory", "disk", "gpu", "network_sent_rate", "network_recv_rate",
+          "disk_read_rate", "disk_write_rate", "battery"]
+# The scheduler group each series is sampled with; every group has its own
+# history buffer, as groups are sampled at different (and changing) rates
+SERIES_GROUPS = {
+    "cpu": ["cpu"],
+    "memory": ["memory"],
+    "disk_usage": ["disk"],
+    "gpu": ["gpu"],
+    "network": ["network_sent_rate", "network_recv_rate"],
+    "disk_io": ["disk_read_rate", "disk_write_rate"],
+    "battery": ["battery"],
+}
+_SERIES_GROUP = {name: group for group, names in SERIES_GROUPS.items() for name in names}
+
+# Shortest sleep between scheduler wake-ups
+MIN_WAKEUP = 0.05
+
+logger = logging.getLogger("task_manager.collector")
+
+
+class MetricsCollector:
+    def __init__(self, interval=1.0, history_seconds=6 * 3600, store=None, source=None, disk_filter=None,
+                 gpu_backend=None, cpu_count=None, adaptive=None,
+                 alert_engine=None, recorder=None):
+        self.interval = interval
+        self.history_seconds = history_seconds
+        self.source = source if source is not None else make_source()
+        # Optional on-disk HistoryStore; every sampled series is appended to it
+        self.store = store
+        # Optional alerts.AlertEngine fed with every freshly sampled value
+        self.alerts = alert_engine
+        # Optional recording.Recorder; gets every series incl. per-core,
+        # per-device and per-GPU ones, plus process snapshots
+        self.recorder = recorder
+        # Search/sort/paging over the latest process rows for the process page
+        self.process_index = ProcessIndex()
+
+        # Each metric group gets its own interval; ``interval`` is the base.
+        # TASK_MANAGER_ADAPTIVE=0 pins every group to its base interval.
+        if adaptive is None:
+            adaptive = os.environ.get("TASK_MANAGER_ADAPTIVE", "1") != "0"
+        self.scheduler = AdaptiveScheduler(default_schedules(interval), adaptive=adaptive)
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+
+        self._snapshot = {}
+        # Groups whose last read failed, so each failure is logged once
+        self._failing = set()
+        # Buffers hold ``history_seconds`` at their group's fastest rate, so a
+        # group polled faster while in alert does not shorten its window
+        capacity = self._capacity
+        self._history = {group: RingBuffer(capacity(group), names, dtype=np.float64)
+                         for group, names in SERIES_GROUPS.items()}
+        # The wide buffers (per core, device, GPU) keep one row per base
+        # interval instead; faster alert-rate samples are averaged into it.
+        # ``cpu_count`` overrides the detected core count (synthetic sources)
+        bucketed = self._bucketed
+        self._cores_history = bucketed("cpu", range(cpu_count or psutil.cpu_count(logical=True) or 1))
+        self._power = PowerMonitor(psutil.cpu_count(logical=False) or 1)
+        self._network = NetworkRates()
+        # Per-device I/O history is kept for the devices ``disk_filter`` accepts
+        self._disk_io = diskio.DiskIORates(disk_filter, capacity=int(history_seconds / self._base("disk_io")),
+                                           bucket=self._base("disk_io"))
+
+        # NVML is initialised once for the lifetime of the collector; an
+        # empty monitor (no driver, no device) is the CPU-only case
+        self.gpus = gpu.GpuMonitor(gpu_backend)
+        self._gpu_history = bucketed(
+            "gpu", [f"{device.index}/{metric}" for device in self.gpus.devices for metric in gpu.METRICS])
+        # Throttling, PSI and I/O of the container, with the cgroup source
+        self._cgroup_history = bucketed("cgroup", cgroup.METRICS) if hasattr(self.source, "stats") else None
+        # Per-process series, kept for the heaviest processes only
+        self.process_history = ProcessHistory(seconds=history_seconds, cpu_count=cpu_count)
+
+    def _capacity(self, group):
+        return int(self.history_seconds / max(self.scheduler.shortest_interval(group), MIN_WAKEUP))
+
+    def _base(self, group):
+        return max(self.scheduler.schedules[group].base, MIN_WAKEUP)
+
+    def _bucketed(self, group, columns):
+        base = self._base(group)
+        return RingBuffer(int(self.history_seconds / base), columns, bucket=base)
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._wake.clear()
+        self._thread = threading.Thread(target=self._run, name="metrics-collector", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.source.close()
+        self._power.close()
+        if self.store is not None:
+            self.store.close()
+        if self.recorder is not None:
+            self.recorder.close()
+        self.gpus.close()
+
+    def _run(self):
+        while not self._stop.is_set():
+            due = self.scheduler.due()
+            try:
+                with timed("collect: total"):
+                    self.sample(due)
+            except Exception:
+                # A failing sample must never kill the shared thread; the
+                # groups it covered are backed off like unavailable ones
+                self.scheduler.observe({name: None for name in due})
+            self._wake.wait(max(MIN_WAKEUP, self.scheduler.next_wakeup()))
+            self._wake.clear()
+
+    def touch(self):
+        # Pages and the agent call this while someone is watching; without it
+        # the scheduler slows everything down
+        if self.scheduler.touch():
+            self._wake.set()
+
+    def sample(self, due=None):
+        # ``due`` is the set of metric groups to read (all of them when None).
+        # Groups not read keep their previous values in the snapshot and are
+        # left out (NaN) of this history row. A group whose read fails is
+        # treated the same way and reported to the scheduler as unavailable,
+        # so one failing reader cannot hold back the others.
+        current_time = time.time()
+        due = set(self.scheduler.schedules) if due is None else due
+        snapshot = dict(self.snapshot())
+        snapshot["time"] = current_time
+        series = {}
+        observed = {}
+        failed = set()
+
+        if "cpu" in due:
+            with self._reading("cpu", failed):
+                with timed("collect: cpu"):
+                    cpu_percent, cpu_cores_percent = self.source.cpu_percent()
+                    cpu_freq = psutil.cpu_freq()
+                snapshot.update(cpu_percent=cpu_percent, cpu_cores_percent=cpu_cores_percent, cpu_freq=cpu_freq)
+                series["cpu"] = observed["cpu"] = cpu_percent
+                self._cores_history.append(current_time, cpu_cores_percent[:len(self._cores_history.columns)])
+
+        if "memory" in due:
+            with self._reading("memory", failed):
+                with timed("collect: memory"):
+                    svmem, swap = self.source.memory()
+                snapshot.update(memory=svmem, memory_percent=svmem.percent, swap=swap)
+                series["memory"] = observed["memory"] = svmem.percent
+
+        if "disk_usage" in due:
+            with self._reading("disk_usage", failed):
+                with timed("collect: disk usage"):
+                    disk_percent = psutil.disk_usage('C:\\' if psutil.WINDOWS else '/').percent
+                snapshot["disk_percent"] = disk_percent
+                series["disk"] = observed["disk_usage"] = disk_percent
+
+        if "network" in due:
+            with self._reading("network", failed):
+                with timed("collect: network"):
+                    network = self._network.update(self.source.net_io(pernic=True))
+                    network_totals = network.counters.sum(axis=0)
+                    network_sent_rate = total_rate(network, "bytes_sent")
+                    network_recv_rate = total_rate(network, "bytes_recv")
+                snapshot.update(
+                    network_sent=int(network_totals[0]),
+                    network_recv=int(network_totals[1]),
+                    network_sent_rate=network_sent_rate,
+                    network_recv_rate=network_recv_rate,
+                    network=network,
+                )
+                series["network_sent_rate"] = network_sent_rate
+                series["network_recv_rate"] = network_recv_rate
+                observed["network"] = (None if network_sent_rate is None
+                                        else network_sent_rate + (network_recv_rate or 0))
+
+        if "disk_io" in due:
+            with self._reading("disk_io", failed):
+                with timed("collect: disk io"):
+                    disk_io = self._disk_io.update(self.source.disk_io(), current_time)
+                    disk_read_rate = diskio.total_rate(disk_io, "read_bytes", self._disk_io.device_filter)
+                    disk_write_rate = diskio.total_rate(disk_io, "write_bytes", self._disk_io.device_filter)
+                snapshot.update(disk_io=disk_io, disk_read_rate=disk_read_rate, disk_write_rate=disk_write_rate)
+                series["disk_read_rate"] = disk_read_rate
+                series["disk_write_rate"] = disk_write_rate
+                observed["disk_io"] = None if disk_read_rate is None else disk_read_rate + (disk_write_rate or 0)
+
+        if "battery" in due:
+            with self._reading("battery", failed):
+                with timed("collect: battery"):
+                    battery = psutil.sensors_battery()
+                snapshot["battery"] = battery
+                series["battery"] = observed["battery"] = battery.percent if battery is not None else None
+
+        if "gpu" in due:
+            with self._reading("gpu", failed):
+                with timed("collect: nvml"):
+                    gpus = self.gpus.sample()
+                    gpu_utilization = gpu.average(gpus, "utilization")
+                    gpu_power = gpu.total(gpus, "power")
+                snapshot.update(gpus=gpus, gpu_utilization=gpu_utilization, gpu_power=gpu_power)
+                series["gpu"] = observed["gpu"] = gpu_utilization
+                if gpus:
+                    self._gpu_history.append(current_time, [v for reading in gpus for v in gpu.metric_values(reading)])
+
+        if "cgroup" in due:
+            with self._reading("cgroup", failed):
+                if self._cgroup_history is not None:
+                    with timed("collect: cgroup"):
+                        cgroup_stats = self.source.stats()
+                    snapshot["cgroup"] = cgroup_stats
+                    self._cgroup_history.append(current_time, cgroup_stats)
+                    observed["cgroup"] = cgroup_stats["throttled_percent"]
+                else:
+                    observed["cgroup"] = None
+
+        if "power" in due:
+            with self._reading("power", failed):
+                cpu_freq = snapshot.get("cpu_freq")
+                with timed("collect: power"):
+                    cpu_power, ram_power, power_source = self._power.sample(
+                        snapshot.get("cpu_percent", 0.0), cpu_freq.current if cpu_freq else 2000,
+                        snapshot.get("memory_percent", 0.0))
+                snapshot.update(cpu_power=cpu_power, ram_power=ram_power, power_source=power_source)
+                observed["power"] = cpu_power
+
+        if "processes" in due:
+            with self._reading("processes", failed):
+                with timed("collect: processes"):
+                    processes = self.source.processes()
+                with timed("collect: process index"):
+                    self.process_index.update(processes)
+                with timed("collect: process history"):
+                    self.process_history.update(processes, current_time, self.source.process_io)
+                snapshot["processes"] = processes
+                observed["processes"] = len(processes)
+
+        for name in failed:
+            observed[name] = None
+        sampled = due - failed
+
+        if series:
+            with timed("collect: history"):
+                for group, names in SERIES_GROUPS.items():
+                    if group in sampled:
+                        self._history[group].append(current_time, {name: series.get(name) for name in names})
+
+        if self.alerts is not None:
+            with timed("collect: alerts"):
+                values = dict(series)
+                if "processes" in sampled and self.alerts.process_names:
+                    values.update(alerts.process_values(snapshot["processes"], self.alerts.process_names))
+                self.alerts.observe(current_time, values)
+            snapshot["alerts_firing"] = [rule.name for rule in self.alerts.active()]
+
+        with self._lock:
+            # Readers hold on to the previous dict, so swap rather than mutate
+            self._snapshot = snapshot
+
+        if self.store is not None:
+            with timed("collect: history store"):
+                self.store.append(current_time, series)
+
+        if self.recorder is not None:
+            with timed("collect: record"):
+                self.recorder.append(current_time, self._record_row(series, snapshot, sampled),
+                                     snapshot["processes"] if "processes" in sampled else None)
+
+        self.scheduler.observe(observed)
+        return snapshot
+
+    @contextmanager
+    def _reading(self, group, failed):
+        # Swallows a failing group's error, logged when the group starts
+        # failing rather than on every attempt
+        try:
+            yield
+        except Exception:
+            failed.add(group)
+            if group not in self._failing:
+                self._failing.add(group)
+                logger.warning("Reading %s failed", group, exc_info=True)
+        else:
+            self._failing.discard(group)
+
+    def _record_row(self, series, snapshot, due):
+        # The row written to the recording, with names history() understands
+        row = dict(series)
+        if "cpu" in due:
+            for i, value in enumerate(snapshot["cpu_cores_percent"]):
+                row[f"core/{i}"] = value
+        if "disk_io" in due:
+            disk_io, devices = snapshot["disk_io"], set(self._disk_io.devices())
+            for device, rates in zip(disk_io.names, disk_io.rates.tolist()):
+                if device in devices:
+                    for metric, value in zip(diskio.METRICS, rates):
+                        row[f"disk_io/{device}/{metric}"] = value
+        if "gpu" in due:
+            for reading in snapshot["gpus"]:
+                for metric, value in zip(gpu.METRICS, gpu.metric_values(reading)):
+                    row[f"gpu/{reading.index}/{metric}"] = value
+        if "cgroup" in due and "cgroup" in snapshot:
+            for metric, value in snapshot["cgroup"].items():
+                row[f"cgroup/{metric}"] = value
+        return row
+
+    def snapshot(self):
+        with self._lock:
+            return self._snapshot
+
+    def history(self, name, seconds=None, max_points=None, method="minmax"):
+        # (times, values) arrays; views unless ``max_points`` forces a downsample.
+        # Per-device series are named "disk_io/<device>/<metric>" and
+        # "gpu/<index>/<metric>"; tracked processes are "process/<pid>/<metric>"
+        # and the cgroup source's metrics "cgroup/<metric>".
+        if name.startswith("disk_io/"):
+            _, device, metric = name.split("/", 2)
+            times, values = self._disk_io.history(device, metric, seconds=seconds)
+        elif name.startswith("gpu/"):
+            times, values = self._gpu_history.column(name[len("gpu/"):], seconds=seconds)
+        elif name.startswith("cgroup/"):
+            if self._cgroup_history is None:
+                return np.empty(0), np.empty(0)
+            times, values = self._cgroup_history.column(name[len("cgroup/"):], seconds=seconds)
+        elif name.startswith("process/"):
+            _, pid, metric = name.split("/", 2)
+            times, values = self.process_history.series(int(pid), metric, seconds=seconds)
+        else:
+            times, values = self._history[_SERIES_GROUP[name]].column(name, seconds=seconds)
+        if max_points is not None:
+            times, values = downsample(times, values, max_points, method=method)
+        return times, values
+
+    def disk_devices(self):
+        # Devices with per-device I/O history, i.e. those that passed the filter
+        return self._disk_io.devices()
+
+    def cores_history(self, seconds=None):
+        # (times, values) with one column per logical core
+        return self._cores_history.window(seconds=seconds)
+
+    def wait_for_sample(self, timeout=None):
+        # Block until the first sample has landed (used right after start-up)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self.snapshot():
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+
+def make_recorder():
+    # TASK_MANAGER_RECORD=1 records to recording.DEFAULT_DIR, any other value
+    # is the directory to record to; TASK_MANAGER_RECORD_PROCESSES adds a
+    # process-table snapshot every that many seconds
+    target = os.environ.get("TASK_MANAGER_RECORD")
+    if not target or target == "0":
+        return None
+    process_interval = os.environ.get("TASK_MANAGER_RECORD_PROCESSES")
+    try:
+        return recording.Recorder(recording.DEFAULT_DIR if target == "1" else target,
+                                  process_interval=float(process_interval) if process_interval else None)
+    except OSError as e:
+        recording.logger.error("Recording disabled: %s", e)
+        return None
+
+
+_collector = None
+_collector_lock = threading.Lock()
+
+
+def get_collector(**options):
+    # ``options`` only apply when the first caller creates the collector
+    global _collector
+    with _collector_lock:
+        if _collector is None:
+            try:
+                store = HistoryStore()
+            except (OSError, sqlite3.Error):
+                store = None  # History is best effort; live graphs still work
+            try:
+                alert_engine = alerts.load_engine()
+            except (OSError, ValueError, TypeError) as e:
+                alerts.logger.error("Alert rules not loaded: %s", e)
+                alert_engine = None
+            _collector = MetricsCollector(store=store, alert_engine=alert_engine, recorder=make_recorder(),
+                                          **options)
+            _collector.start()
+    return _collector
@@ -0,0 +1,136 @@
+import logging
+import os
+import re
+from collections import namedtuple
+
+import numpy as np
+
+from timeseries import CounterDeltas, RingBuffer
+
+
+# Per-device disk I/O from disk_io_counters(perdisk=True): throughput, IOPS,
+# average await and busy %, all derived from counter deltas. Every device is
+# diffed each tick (one array operation), but per-device history is only kept
+# for the devices that pass the filter, so hosts with dozens of partitions or
+# device-mapper nodes stay bounded.
+
+FIELDS = ("read_count", "write_count", "read_bytes", "write_bytes", "read_time", "write_time", "busy_time")
+METRICS = ("read_bytes", "write_bytes", "read_iops", "write_iops", "await_ms", "busy_percent")
+
+# Partitions, loop/ram/optical devices and device-mapper nodes; whole disks
+# (sda, nvme0n1, vda, mmcblk0, md0, ...) are kept
+DEFAULT_EXCLUDE = (r"^(loop|ram|zram|fd|sr|dm-)\d+$"
+                   r"|^(sd|hd|vd|xvd)[a-z]+\d+$"
+                   r"|^(nvme\d+n\d+|mmcblk\d+)p\d+$")
+
+# Devices with per-device history when no include pattern is set; devices an
+# explicit include pattern matches are all tracked
+MAX_TRACKED_DEVICES = 8
+
+# names: device names; rates: float64 (n, len(METRICS)), NaN where unknown
+DiskIOSample = namedtuple("DiskIOSample", "names rates")
+
+logger = logging.getLogger("task_manager.diskio")
+
+
+class DeviceFilter:
+    # Regex include/exclude on device names. ``include`` defaults to
+    # $TASK_MANAGER_DISKS when set (e.g. "nvme0n1|sda").
+    def __init__(self, include=None, exclude=DEFAULT_EXCLUDE):
+        include = include if include is not None else os.environ.get("TASK_MANAGER_DISKS")
+        self.include = re.compile(include) if include else None
+        self.exclude = re.compile(exclude) if exclude else None
+        self._cache = {}
+
+    def __call__(self, name):
+        keep = self._cache.get(name)
+        if keep is None:
+            if self.include is not None:
+                keep = bool(self.include.search(name))
+            else:
+                keep = not (self.exclude and self.exclude.search(name))
+            self._cache[name] = keep
+        return keep
+
+
+def _column(name):
+    return FIELDS.index(name)
+
+
+class DiskIORates:
+    def __init__(self, device_filter=None, capacity=3600, max_devices=MAX_TRACKED_DEVICES, bucket=None):
+        # ``bucket``: see RingBuffer; rows per device are at most one per bucket
+        self.device_filter = device_filter if device_filter is not None else DeviceFilter()
+        self.capacity = capacity
+        self.bucket = bucket
+        self.max_devices = max_devices
+        self._deltas = CounterDeltas(FIELDS)
+        self._history = {}
+        # Devices left untracked by the cap (logged once each)
+        self._dropped = set()
+
+    def update(self, perdisk, timestamp, now=None):
+        # ``perdisk`` is the {device: counters} dict from disk_io_counters(perdisk=True)
+        names, _, deltas, elapsed = self._deltas.update(perdisk, now)
+        rates = np.full((len(names), len(METRICS)), np.nan)
+        if elapsed:
+            ios = deltas[:, _column("read_count")] + deltas[:, _column("write_count")]
+            io_time = deltas[:, _column("read_time")] + deltas[:, _column("write_time")]
+            rates[:, 0] = deltas[:, _column("read_bytes")] / elapsed
+            rates[:, 1] = deltas[:, _column("write_bytes")] / elapsed
+            rates[:, 2] = deltas[:, _column("read_count")] / elapsed
+            rates[:, 3] = deltas[:, _column("write_count")] / elapsed
+            with np.errstate(divide="ignore", invalid="ignore"):
+                # Milliseconds spent per completed request; 0 for an idle device
+                rates[:, 4] = np.where(ios > 0, io_time / ios, 0.0)
+            # busy_time is in ms; it is 0 on platforms that do not report it
+            rates[:, 5] = np.clip(deltas[:, _column("busy_time")] / (elapsed * 10.0), 0.0, 100.0)
+
+        sample = DiskIOSample(names, rates)
+        for i, name in enumerate(names):
+            if not self.device_filter(name):
+                continue
+            buffer = self._history.get(name)
+            if buffer is None:
+                if len(self._history) >= self.max_devices and getattr(self.device_filter, "include", None) is None:
+                    if name not in self._dropped:
+                        self._dropped.add(name)
+                        logger.warning("No I/O history for %s: only the first %d disks are tracked; set "
+                                       "TASK_MANAGER_DISKS to choose", name, self.max_devices)
+                    continue
+                buffer = self._history[name] = RingBuffer(self.capacity, METRICS, bucket=self.bucket)
+            buffer.append(timestamp, rates[i])
+        return sample
+
+    def devices(self):
+        return sorted(self._history)
+
+    def history(self, device, metric, seconds=None):
+        buffer = self._history.get(device)
+        if buffer is None:
+            empty = np.empty(0)
+            return empty, empty
+        return buffer.column(metric, seconds=seconds)
+
+
+def total_rate(sample, metric, device_filter):
+    # Sum of one metric over the devices that pass ``device_filter``; whole
+    # disks only by default, so partitions are not counted twice
+    column = sample.rates[:, METRICS.index(metric)]
+    keep = np.array([device_filter(name) for name in sample.names], dtype=bool)
+    if not keep.any() or np.isnan(column[keep]).all():
+        return None
+    return float(np.nansum(column[keep]))
+
+
+def busiest_devices(sample, devices=None, n=10):
+    # Rows for the ``n`` busiest devices (optionally limited to ``devices``)
+    rows = []
+    for i, name in enumerate(sample.names):
+        if devices is not None and name not in devices:
+            continue
+        row = {"device": name}
+        row.update(zip(METRICS, np.nan_to_num(sample.rates[i]).tolist()))
+        rows.append(row)
+    rows.sort(key=lambda row: (row["busy_percent"], row["read_bytes"] + row["write_bytes"]), reverse=True)
+    return rows[:n]
@@ -0,0 +1,183 @@
+import os
+from collections import namedtuple
+
+import pynvml
+
+
+# NVIDIA GPUs through NVML. NVML is initialised once per GpuMonitor and the
+# device handles, names and memory sizes are looked up once; each tick then
+# reads utilisation, memory, power and temperature for every device in one
+# pass. Fields a device reports as unsupported are not asked for again.
+#
+# The backend is anything with pynvml's function names (the module itself by
+# default). FakeNVML stands in for it on machines without a GPU; set
+# TASK_MANAGER_FAKE_GPUS=<count> to run the app against fake devices.
+
+METRICS = ("utilization", "memory_percent", "power", "temperature")
+
+GpuDevice = namedtuple("GpuDevice", "index name memory_total")
+# memory in bytes, power in W, temperature in C; None when not available
+GpuReading = namedtuple("GpuReading", "index name utilization memory_used memory_total power temperature")
+
+
+class GpuMonitor:
+    def __init__(self, backend=None):
+        if backend is None:
+            count = int(os.environ.get("TASK_MANAGER_FAKE_GPUS", "0") or 0)
+            backend = FakeNVML(count) if count > 0 else pynvml
+        self.nvml = backend
+        self.devices = []
+        self._handles = []
+        self._unsupported = []
+        self._initialized = False
+
+        try:
+            self.nvml.nvmlInit()
+            self._initialized = True
+            for index in range(self.nvml.nvmlDeviceGetCount()):
+                handle = self.nvml.nvmlDeviceGetHandleByIndex(index)
+                name = self.nvml.nvmlDeviceGetName(handle)
+                if isinstance(name, bytes):
+                    name = name.decode(errors="replace")  # Older pynvml returns bytes
+                memory_total = self.nvml.nvmlDeviceGetMemoryInfo(handle).total
+                self.devices.append(GpuDevice(index, name, memory_total))
+                self._handles.append(handle)
+                self._unsupported.append(set())
+        except self.nvml.NVMLError:
+            # No driver or no device: the monitor simply reports no GPUs
+            self.devices, self._handles, self._unsupported = [], [], []
+
+    def __len__(self):
+        return len(self.devices)
+
+    def _read(self, i, field, read):
+        if field in self._unsupported[i]:
+            return None
+        try:
+            return read(self._handles[i])
+        except self.nvml.NVMLError_NotSupported:
+            self._unsupported[i].add(field)
+        except self.nvml.NVMLError:
+            pass  # Transient (e.g. GPU lost or reset); try again next tick
+        return None
+
+    def sample(self):
+        nvml = self.nvml
+        readings = []
+        for i, device in enumerate(self.devices):
+            utilization = self._read(i, "utilization", lambda h: nvml.nvmlDeviceGetUtilizationRates(h).gpu)
+            memory_used = self._read(i, "memory", lambda h: nvml.nvmlDeviceGetMemoryInfo(h).used)
+            power = self._read(i, "power", lambda h: nvml.nvmlDeviceGetPowerUsage(h) / 1000)  # mW to W
+            temperature = self._read(
+                i, "temperature", lambda h: nvml.nvmlDeviceGetTemperature(h, nvml.NVML_TEMPERATURE_GPU))
+            readings.append(GpuReading(device.index, device.name, utilization, memory_used,
+                                       device.memory_total, power, temperature))
+        return readings
+
+    def close(self):
+        if self._initialized:
+            try:
+                self.nvml.nvmlShutdown()
+            except self.nvml.NVMLError:
+                pass
+            self._initialized = False
+
+
+def metric_values(reading):
+    # Values in METRICS order, for the per-GPU history columns
+    memory_percent = None
+    if reading.memory_used is not None and reading.memory_total:
+        memory_percent = reading.memory_used * 100.0 / reading.memory_total
+    return [reading.utilization, memory_percent, reading.power, reading.temperature]
+
+
+def average(readings, field):
+    values = [getattr(r, field) for r in readings if getattr(r, field) is not None]
+    return sum(values) / len(values) if values else None
+
+
+def total(readings, field):
+    values = [getattr(r, field) for r in readings if getattr(r, field) is not None]
+    return sum(values) if values else None
+
+
+class _FakeMemory:
+    def __init__(self, total, used):
+        self.total = total
+        self.used = used
+        self.free = total - used
+
+
+class _FakeUtilization:
+    def __init__(self, gpu, memory):
+        self.gpu = gpu
+        self.memory = memory
+
+
+class FakeNVML:
+    # In-process stand-in for the pynvml module. Values follow a fixed
+    # per-device pattern that moves each call, so charts have something to
+    # draw and tests get deterministic numbers.
+
+    NVMLError = pynvml.NVMLError
+    NVMLError_NotSupported = pynvml.NVMLError_NotSupported
+    NVML_TEMPERATURE_GPU = pynvml.NVML_TEMPERATURE_GPU
+
+    def __init__(self, count=2, memory_total=16 * 1024 ** 3, unsupported=(), name="Fake GPU"):
+        # ``unsupported`` holds method names (e.g. "nvmlDeviceGetPowerUsage")
+        # that raise NVMLError_NotSupported, like power on many consumer cards
+        self.count = count
+        self.memory_total = memory_total
+        self.unsupported = set(unsupported)
+        self.name = name
+        self.initialized = False
+        self.calls = {}
+        self._ticks = [0] * count
+
+    def _call(self, method, handle=None):
+        self.calls[method] = self.calls.get(method, 0) + 1
+        if not self.initialized:
+            raise pynvml.NVMLError(pynvml.NVML_ERROR_UNINITIALIZED)
+        if method in self.unsupported:
+            raise pynvml.NVMLError(pynvml.NVML_ERROR_NOT_SUPPORTED)
+
+    def nvmlInit(self):
+        self.calls["nvmlInit"] = self.calls.get("nvmlInit", 0) + 1
+        self.initialized = True
+
+    def nvmlShutdown(self):
+        self._call("nvmlShutdown")
+        self.initialized = False
+
+    def nvmlDeviceGetCount(self):
+        self._call("nvmlDeviceGetCount")
+        return self.count
+
+    def nvmlDeviceGetHandleByIndex(self, index):
+        self._call("nvmlDeviceGetHandleByIndex")
+        if not 0 <= index < self.count:
+            raise pynvml.NVMLError(pynvml.NVML_ERROR_INVALID_ARGUMENT)
+        return index
+
+    def nvmlDeviceGetName(self, handle):
+        self._call("nvmlDeviceGetName", handle)
+        return f"{self.name} {handle}"
+
+    def nvmlDeviceGetUtilizationRates(self, handle):
+        self._call("nvmlDeviceGetUtilizationRates", handle)
+        self._ticks[handle] += 1
+        gpu = (handle * 17 + self._ticks[handle] * 7) % 101
+        return _FakeUtilization(gpu, gpu // 2)
+
+    def nvmlDeviceGetMemoryInfo(self, handle):
+        self._call("nvmlDeviceGetMemoryInfo", handle)
+        used = self.memory_total * ((handle * 13 + self._ticks[handle] * 3) % 90 + 5) // 100
+        return _FakeMemory(self.memory_total, used)
+
+    def nvmlDeviceGetPowerUsage(self, handle):
+        self._call("nvmlDeviceGetPowerUsage", handle)
+        return 30000 + (handle * 11 + self._ticks[handle] * 5) % 200 * 1000  # mW
+
+    def nvmlDeviceGetTemperature(self, handle, sensor):
+        self._call("nvmlDeviceGetTemperature", handle)
+        return 35 + (handle * 5 + self._ticks[handle]) % 45
@@ -0,0 +1,211 @@
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+
+# Persistent metrics history in SQLite.
+#
+# Raw samples are kept for a day. Every sample is also folded into 1 minute and
+# 1 hour rollup rows (min/avg/max/count) as it is written, so long ranges read
+# a few hundred precomputed rows instead of scanning raw data. Rollup upserts
+# merge with any existing row, which keeps them correct across restarts.
+
+DEFAULT_PATH = os.environ.get(
+    "TASK_MANAGER_HISTORY",
+    os.path.join(os.path.expanduser("~"), ".task_manager", "metrics.db"),
+)
+
+# (table, bucket seconds, retention seconds)
+TIERS = [
+    ("raw", 1, 24 * 3600),
+    ("rollup_1m", 60, 30 * 24 * 3600),
+    ("rollup_1h", 3600, 365 * 24 * 3600),
+]
+
+# Finest tier is used as long as the range needs at most this many rows
+MAX_ROWS_PER_QUERY = 20000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS series (
+    id INTEGER PRIMARY KEY,
+    name TEXT UNIQUE NOT NULL
+);
+CREATE TABLE IF NOT EXISTS raw (
+    series INTEGER NOT NULL,
+    ts INTEGER NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (series, ts)
+) WITHOUT ROWID;
+"""
+
+ROLLUP_SCHEMA = """
+CREATE TABLE IF NOT EXISTS {table} (
+    series INTEGER NOT NULL,
+    ts INTEGER NOT NULL,
+    min REAL NOT NULL,
+    avg REAL NOT NULL,
+    max REAL NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (series, ts)
+) WITHOUT ROWID;
+"""
+
+ROLLUP_UPSERT = """
+INSERT INTO {table} (series, ts, min, avg, max, count) VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT (series, ts) DO UPDATE SET
+    min = MIN(min, excluded.min),
+    max = MAX(max, excluded.max),
+    avg = (avg * count + excluded.avg * excluded.count) / (count + excluded.count),
+    count = count + excluded.count
+"""
+
+
+def _regroup(times, mins, avgs, maxs, max_points):
+    # Merge consecutive rows into at most ``max_points`` groups, keeping the
+    # min/max envelope intact
+    group = -(-len(times) // max_points)
+    pad = (-len(times)) % group
+
+    def shaped(a, fill):
+        return np.concatenate([a, np.full(pad, fill)]).reshape(-1, group)
+
+    counts = shaped(np.ones(len(times)), 0.0).sum(axis=1)
+    return (
+        shaped(times, np.nan)[:, 0],
+        shaped(mins, np.inf).min(axis=1),
+        shaped(avgs, 0.0).sum(axis=1) / counts,
+        shaped(maxs, -np.inf).max(axis=1),
+    )
+
+
+class HistoryStore:
+    def __init__(self, path=DEFAULT_PATH, flush_interval=10.0):
+        self.path = path
+        self.flush_interval = flush_interval
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._conn = self._connect()
+        self._conn.executescript(SCHEMA)
+        for table, _, _ in TIERS[1:]:
+            self._conn.executescript(ROLLUP_SCHEMA.format(table=table))
+        self._conn.commit()
+
+        self._series_ids = dict((name, sid) for sid, name in self._conn.execute("SELECT id, name FROM series"))
+        self._pending = []
+        self._rollups = {table: {} for table, _, _ in TIERS[1:]}
+        self._last_flush = time.monotonic()
+        self._last_prune = 0.0
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        if self.path != ":memory:":
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _reader(self):
+        # Readers (one per Streamlit session thread) never contend with the writer
+        if self.path == ":memory:":
+            return self._conn
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path, check_same_thread=False)
+        return conn
+
+    def _series_id(self, name):
+        sid = self._series_ids.get(name)
+        if sid is None:
+            self._conn.execute("INSERT OR IGNORE INTO series (name) VALUES (?)", (name,))
+            sid = self._conn.execute("SELECT id FROM series WHERE name = ?", (name,)).fetchone()[0]
+            self._series_ids[name] = sid
+        return sid
+
+    def append(self, timestamp, values):
+        ts = int(timestamp)
+        with self._lock:
+            for name, value in values.items():
+                if value is None or value != value:
+                    continue
+                sid = self._series_id(name)
+                self._pending.append((sid, ts, float(value)))
+                for table, bucket, _ in TIERS[1:]:
+                    key = (sid, ts - ts % bucket)
+                    acc = self._rollups[table].get(key)
+                    if acc is None:
+                        self._rollups[table][key] = [value, value, value, 1]
+                    else:
+                        acc[0] = min(acc[0], value)
+                        acc[1] += value
+                        acc[2] = max(acc[2], value)
+                        acc[3] += 1
+
+            if time.monotonic() - self._last_flush >= self.flush_interval:
+                self._flush_locked()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        conn = self._conn
+        conn.executemany("INSERT OR REPLACE INTO raw (series, ts, value) VALUES (?, ?, ?)", self._pending)
+        for table, _, _ in TIERS[1:]:
+            rows = [(sid, ts, lo, total / count, hi, count)
+                    for (sid, ts), (lo, total, hi, count) in self._rollups[table].items()]
+            conn.executemany(ROLLUP_UPSERT.format(table=table), rows)
+            self._rollups[table].clear()
+        conn.commit()
+        self._pending = []
+        self._last_flush = time.monotonic()
+
+        if time.monotonic() - self._last_prune >= 600:
+            self._prune_locked()
+
+    def _prune_locked(self):
+        now = int(time.time())
+        for table, _, retention in TIERS:
+            self._conn.execute(f"DELETE FROM {table} WHERE ts < ?", (now - retention,))
+        self._conn.commit()
+        self._last_prune = time.monotonic()
+
+    def pick_tier(self, start, end):
+        now = time.time()
+        for table, bucket, retention in TIERS:
+            if start >= now - retention and (end - start) / bucket <= MAX_ROWS_PER_QUERY:
+                return table, bucket
+        table, bucket, _ = TIERS[-1]
+        return table, bucket
+
+    def query(self, name, start, end, max_points=1000):
+        # Returns (times, mins, avgs, maxs) arrays for [start, end], read from
+        # the finest tier that covers the range cheaply
+        table, _ = self.pick_tier(start, end)
+        sid = self._series_ids.get(name)
+        empty = np.empty(0)
+        if sid is None:
+            return empty, empty, empty, empty
+
+        if table == "raw":
+            sql = "SELECT ts, value, value, value FROM raw WHERE series = ? AND ts BETWEEN ? AND ? ORDER BY ts"
+        else:
+            sql = f"SELECT ts, min, avg, max FROM {table} WHERE series = ? AND ts BETWEEN ? AND ? ORDER BY ts"
+        rows = self._reader().execute(sql, (sid, int(start), int(end))).fetchall()
+        if not rows:
+            return empty, empty, empty, empty
+
+        data = np.asarray(rows, dtype=np.float64)
+        times, mins, avgs, maxs = data[:, 0], data[:, 1], data[:, 2], data[:, 3]
+        if len(times) > max_points:
+            times, mins, avgs, maxs = _regroup(times, mins, avgs, maxs, max_points)
+        return times, mins, avgs, maxs
+
+    def close(self):
+        self.flush()
+        self._conn.close()
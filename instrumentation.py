@@ -0,0 +1,119 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+import psutil
+
+
+# Self-instrumentation: how long each collection and render step takes and how
+# many bytes each tick pushes to the browser. One process-wide registry, like
+# the collector, so the "Monitor Overhead" page sees every session's renders.
+#
+# Recording is a perf_counter() pair and a deque append; percentiles are only
+# computed when the overhead page asks for them.
+
+SAMPLES_PER_STEP = 1000
+
+
+class Timings:
+    def __init__(self, samples=SAMPLES_PER_STEP):
+        self.samples = samples
+        self._lock = threading.Lock()
+        self._durations = {}
+        self._bytes = {}
+        self._calls = {}
+        # Serialising figures just to count their bytes costs CPU, so it is
+        # only done while at least one session has the overhead page open
+        self._byte_counters = 0
+
+    @property
+    def count_bytes(self):
+        return self._byte_counters > 0
+
+    @contextmanager
+    def counting_bytes(self):
+        # Held by each open overhead page; counting stops when the last closes
+        with self._lock:
+            self._byte_counters += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._byte_counters -= 1
+
+    @contextmanager
+    def time(self, step):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(step, time.perf_counter() - started)
+
+    def record(self, step, seconds):
+        with self._lock:
+            durations = self._durations.get(step)
+            if durations is None:
+                durations = self._durations[step] = deque(maxlen=self.samples)
+            durations.append(seconds)
+            self._calls[step] = self._calls.get(step, 0) + 1
+
+    def record_bytes(self, step, nbytes):
+        with self._lock:
+            sizes = self._bytes.get(step)
+            if sizes is None:
+                sizes = self._bytes[step] = deque(maxlen=self.samples)
+            sizes.append(nbytes)
+
+    def reset(self):
+        with self._lock:
+            self._durations.clear()
+            self._bytes.clear()
+            self._calls.clear()
+
+    def summary(self):
+        # One row per step: calls, p50/p99/max in ms over the recent samples
+        with self._lock:
+            steps = [(step, np.fromiter(d, dtype=np.float64), self._calls[step])
+                     for step, d in self._durations.items()]
+        rows = []
+        for step, durations, calls in sorted(steps):
+            p50, p99 = np.percentile(durations, [50, 99]) * 1000
+            rows.append({
+                "step": step,
+                "calls": calls,
+                "p50_ms": float(p50),
+                "p99_ms": float(p99),
+                "max_ms": float(durations.max() * 1000),
+            })
+        return rows
+
+    def bytes_summary(self):
+        # One row per render target: last and mean bytes per tick
+        with self._lock:
+            sizes = [(step, list(d)) for step, d in self._bytes.items()]
+        return [{"step": step, "last_bytes": values[-1], "mean_bytes": sum(values) / len(values)}
+                for step, values in sorted(sizes) if values]
+
+
+TIMINGS = Timings()
+
+
+def timed(step):
+    return TIMINGS.time(step)
+
+
+class SelfUsage:
+    # CPU% and memory of this process (all threads: collector, sessions, HTTP)
+    def __init__(self):
+        self._process = psutil.Process()
+        self._process.cpu_percent(None)
+
+    def sample(self):
+        with self._process.oneshot():
+            return {
+                "cpu_percent": self._process.cpu_percent(None),
+                "rss": self._process.memory_info().rss,
+                "threads": self._process.num_threads(),
+            }
@@ -0,0 +1,59 @@
+from collections import namedtuple
+
+import numpy as np
+
+from timeseries import CounterDeltas
+
+
+# Per-interface network rates. The counters of every NIC are diffed in one
+# vectorised pass (timeseries.CounterDeltas), which keeps hosts with hundreds
+# of veth/bridge devices cheap.
+
+FIELDS = ("bytes_sent", "bytes_recv", "packets_sent", "packets_recv", "errin", "errout", "dropin", "dropout")
+
+# names: interface names; counters: int64 (n, 8) totals in FIELDS order;
+# rates: float64 (n, 8) per second, NaN for interfaces seen for the first time
+NetworkSample = namedtuple("NetworkSample", "names counters rates")
+
+
+def _column(name):
+    return FIELDS.index(name)
+
+
+class NetworkRates:
+    def __init__(self):
+        self._deltas = CounterDeltas(FIELDS)
+
+    def update(self, pernic, now=None):
+        # ``pernic`` is the {name: counters} dict from net_io(pernic=True)
+        names, counters, deltas, elapsed = self._deltas.update(pernic, now)
+        rates = deltas / elapsed if elapsed else deltas
+        return NetworkSample(names, counters, rates)
+
+
+def total_rate(sample, field, exclude=("lo",)):
+    # Sum of one rate column over all interfaces, skipping loopback by default
+    if not sample.names:
+        return None
+    column = sample.rates[:, _column(field)]
+    if exclude:
+        keep = np.array([name not in exclude for name in sample.names])
+        column = column[keep]
+    if column.size == 0 or np.isnan(column).all():
+        return None
+    return float(np.nansum(column))
+
+
+def busiest_interfaces(sample, n=10):
+    # Rows for the ``n`` interfaces with the highest combined throughput
+    if not sample.names:
+        return []
+    rates = np.nan_to_num(sample.rates)
+    throughput = rates[:, _column("bytes_sent")] + rates[:, _column("bytes_recv")]
+    order = np.argsort(throughput)[::-1][:n]
+    rows = []
+    for i in order:
+        row = {"interface": sample.names[i]}
+        row.update(zip(FIELDS, rates[i].tolist()))
+        rows.append(row)
+    return rows
@@ -0,0 +1,119 @@
+import os
+import time
+
+
+# CPU/DRAM power from RAPL energy counters (/sys/class/powercap, exposed as
+# "intel-rapl" zones on both Intel and recent AMD kernels). Watts come from the
+# energy delta between two reads, so nothing here ever blocks waiting for a
+# measurement window. When RAPL is missing or unreadable (energy_uj is
+# root-only on many kernels) the old TDP-based estimate is used instead.
+
+POWERCAP_ROOT = "/sys/class/powercap"
+
+
+def estimate_cpu_power(cpu_percent, freq, physical_cores):
+    usage = cpu_percent / 100.0
+    base_tdp = 35  # Assume a base TDP of 35W for a typical laptop CPU
+    estimated_tdp = base_tdp * (freq / 2000)  # Adjust TDP based on frequency
+    power = estimated_tdp * usage * physical_cores
+    return max(power, 1.0)  # Ensure we always return at least 1W when the CPU is on
+
+
+def estimate_ram_power(memory_percent):
+    return memory_percent * 0.3  # Rough estimate, 0.3W per GB at 100% usage
+
+
+class RaplZone:
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "name")) as f:
+            self.name = f.read().strip()
+        with open(os.path.join(path, "max_energy_range_uj")) as f:
+            self.max_energy_range = int(f.read())
+        self._energy = open(os.path.join(path, "energy_uj"), "rb", buffering=0)
+        self._last_energy = None
+        self._last_time = None
+
+    def read_energy(self):
+        self._energy.seek(0)
+        return int(self._energy.read())
+
+    def watts(self, now=None):
+        # Average power since the previous call; None on the first call
+        now = time.monotonic() if now is None else now
+        energy = self.read_energy()
+        last_energy, last_time = self._last_energy, self._last_time
+        self._last_energy, self._last_time = energy, now
+        if last_energy is None or now <= last_time:
+            return None
+
+        delta = energy - last_energy
+        if delta < 0:
+            # The counter wrapped at max_energy_range_uj
+            delta += self.max_energy_range
+        return delta / 1e6 / (now - last_time)
+
+    def close(self):
+        self._energy.close()
+
+
+def discover_zones(root=POWERCAP_ROOT):
+    zones = []
+    try:
+        entries = sorted(os.listdir(root))
+    except OSError:
+        return zones
+    for entry in entries:
+        if not entry.startswith("intel-rapl:"):
+            continue
+        try:
+            zones.append(RaplZone(os.path.join(root, entry)))
+        except (OSError, ValueError):
+            continue  # Unreadable zone (usually energy_uj permissions)
+    return zones
+
+
+class PowerMonitor:
+    def __init__(self, physical_cores, root=POWERCAP_ROOT):
+        self.physical_cores = physical_cores
+        self.zones = discover_zones(root)
+        # Package zones already include core/uncore; psys would double count
+        self._cpu_zones = [z for z in self.zones if z.name.startswith("package")]
+        self._dram_zones = [z for z in self.zones if z.name == "dram"]
+        self.prime()
+
+    @property
+    def has_rapl(self):
+        return bool(self._cpu_zones)
+
+    def prime(self):
+        now = time.monotonic()
+        for zone in self._cpu_zones + self._dram_zones:
+            zone.watts(now)
+
+    def sample(self, cpu_percent, freq, memory_percent):
+        # Returns (cpu_watts, ram_watts, source)
+        now = time.monotonic()
+        cpu_power = ram_power = None
+        if self._cpu_zones:
+            try:
+                readings = [zone.watts(now) for zone in self._cpu_zones]
+                if None not in readings:
+                    cpu_power = sum(readings)
+                if self._dram_zones:
+                    readings = [zone.watts(now) for zone in self._dram_zones]
+                    if None not in readings:
+                        ram_power = sum(readings)
+            except (OSError, ValueError):
+                cpu_power = ram_power = None
+
+        source = "rapl" if cpu_power is not None else "estimate"
+        if cpu_power is None:
+            cpu_power = estimate_cpu_power(cpu_percent, freq, self.physical_cores)
+        if ram_power is None:
+            ram_power = estimate_ram_power(memory_percent)
+        return cpu_power, ram_power, source
+
+    def close(self):
+        for zone in self.zones:
+            zone.close()
@@ -0,0 +1,119 @@
+import psutil
+
+
+# Process handles are kept across ticks so that cpu_percent() always has a
+# previous sample to diff against. A cached handle is dropped when its PID
+# disappears or is reused by a new process (different create time).
+#
+# Fields that never change for a process (cmdline, user, create time) are read
+# once, when its handle is created, and reused from then on.
+#
+# psutil (pinned to 7.0) builds a throwaway Process on every is_running() and
+# ppid() call to rule out PID reuse. On Linux the start time and ppid are
+# instead read through the handle's platform layer, from the same
+# /proc/<pid>/stat read oneshot() caches for the other fields.
+
+
+def _pid_reused(proc):
+    # psutil identifies a process by PID + start time, but Process and its
+    # platform layer both cache the first start time they read
+    if psutil.LINUX:
+        start = float(proc._proc._parse_stat_file()["create_time"]) / psutil._psplatform.CLOCK_TICKS
+        return start != proc._proc._ctime
+    return not proc.is_running()
+
+
+def _ppid(proc):
+    return proc._proc.ppid() if psutil.LINUX else proc.ppid()
+
+
+class ProcessTable:
+    def __init__(self):
+        self._procs = {}
+        self._static = {}
+        self._total_memory = psutil.virtual_memory().total
+
+    def __len__(self):
+        return len(self._procs)
+
+    def _handle(self, pid):
+        proc = self._procs.get(pid)
+        if proc is not None:
+            return proc, False
+        proc = psutil.Process(pid)
+        # Cache the handle only once its static fields were read; a handle
+        # without them would fail every later tick
+        static = self._read_static(proc)
+        self._procs[pid] = proc
+        self._static[pid] = static
+        return proc, True
+
+    def _read_static(self, proc):
+        with proc.oneshot():
+            try:
+                cmdline = " ".join(proc.cmdline())
+            except (psutil.AccessDenied, psutil.ZombieProcess):
+                cmdline = ""
+            try:
+                username = proc.username()
+            except (psutil.AccessDenied, KeyError):
+                username = ""  # KeyError: uid without a passwd entry
+            return cmdline, username, proc.create_time()
+
+    def sample(self):
+        rows = []
+        pids = psutil.pids()
+
+        for pid in pids:
+            try:
+                proc, is_new = self._handle(pid)
+                cmdline, username, create_time = self._static[pid]
+                with proc.oneshot():
+                    if not is_new and _pid_reused(proc):
+                        # Dropped below; the new process is picked up next tick
+                        raise psutil.NoSuchProcess(pid)
+                    cpu_percent = proc.cpu_percent(None)
+                    rss = proc.memory_info().rss
+                    rows.append({
+                        "pid": pid,
+                        "name": proc.name(),
+                        "status": proc.status(),
+                        # A freshly cached handle has no previous sample yet
+                        "cpu_percent": None if is_new else cpu_percent,
+                        "memory_percent": rss / self._total_memory * 100,
+                        "rss": rss,
+                        "ppid": _ppid(proc),
+                        "num_threads": proc.num_threads(),
+                        "cmdline": cmdline,
+                        "username": username,
+                        "create_time": create_time,
+                    })
+            except (psutil.NoSuchProcess, psutil.ZombieProcess):
+                self._procs.pop(pid, None)
+                self._static.pop(pid, None)
+            except psutil.AccessDenied:
+                pass
+
+        # Forget handles whose PID has gone away
+        if len(self._procs) > len(pids):
+            alive = set(pids)
+            for pid in [pid for pid in self._procs if pid not in alive]:
+                del self._procs[pid]
+                self._static.pop(pid, None)
+
+        return rows
+
+    def io_counters(self, pids):
+        # {pid: (read_bytes, write_bytes)} for just these PIDs, through the
+        # cached handles
+        counters = {}
+        for pid in pids:
+            proc = self._procs.get(pid)
+            if proc is None or not hasattr(proc, "io_counters"):
+                continue  # not in the last sample, or no I/O counters on this OS
+            try:
+                io = proc.io_counters()
+            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+                continue
+            counters[pid] = (io.read_bytes, io.write_bytes)
+        return counters
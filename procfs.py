@@ -0,0 +1,297 @@
+import os
+import pwd
+import time
+from collections import namedtuple
+
+import numpy as np
+
+
+# Linux fast path: read /proc in bulk instead of going through psutil one call
+# (and one Process object) at a time. System-wide files stay open and are
+# re-read in place with seek(0) + readinto() on a reused buffer; per-process
+# stat files are read with a single os.readv() into one shared buffer.
+#
+# ProcfsSource exposes the same methods as collector.PsutilSource, so the
+# collector can use either. ``root`` points at /proc by default and can be any
+# directory with the same layout (recorded fixtures, synthetic trees).
+
+Memory = namedtuple("Memory", "total available percent used free")
+Swap = namedtuple("Swap", "total used free percent")
+NetIO = namedtuple("NetIO", "bytes_sent bytes_recv packets_sent packets_recv errin errout dropin dropout")
+DiskIO = namedtuple("DiskIO", "read_count write_count read_bytes write_bytes read_time write_time busy_time")
+
+SECTOR_SIZE = 512
+
+STATUS = {
+    "R": "running",
+    "S": "sleeping",
+    "D": "disk-sleep",
+    "Z": "zombie",
+    "T": "stopped",
+    "t": "tracing-stop",
+    "X": "dead",
+    "x": "dead",
+    "I": "idle",
+    "P": "parked",
+    "K": "wake-kill",
+    "W": "waking",
+}
+
+
+def is_supported(root="/proc"):
+    return os.path.isfile(os.path.join(root, "stat")) and os.path.isfile(os.path.join(root, "meminfo"))
+
+
+class _ProcFile:
+    # A /proc file kept open and re-read into the same buffer every tick
+
+    def __init__(self, path, size=16384):
+        self.path = path
+        self._file = open(path, "rb", buffering=0)
+        self._buf = bytearray(size)
+
+    def read(self):
+        self._file.seek(0)
+        n = 0
+        while True:
+            got = self._file.readinto(memoryview(self._buf)[n:])
+            if not got:
+                break
+            n += got
+            if n == len(self._buf):
+                self._buf.extend(bytes(len(self._buf)))
+        return bytes(memoryview(self._buf)[:n])
+
+    def close(self):
+        self._file.close()
+
+
+class ProcfsSource:
+    name = "procfs"
+
+    def __init__(self, root="/proc"):
+        self.root = root
+        self._page_size = os.sysconf("SC_PAGE_SIZE")
+        self._clock_ticks = os.sysconf("SC_CLK_TCK")
+
+        self._stat = _ProcFile(os.path.join(root, "stat"))
+        self._meminfo = _ProcFile(os.path.join(root, "meminfo"))
+        self._net_dev = _ProcFile(os.path.join(root, "net", "dev")) if os.path.exists(os.path.join(root, "net", "dev")) else None
+        self._diskstats = _ProcFile(os.path.join(root, "diskstats")) if os.path.exists(os.path.join(root, "diskstats")) else None
+
+        self._pid_buf = bytearray(4096)
+        self._prev_cpu_times = None
+        # pid -> (starttime, cpu ticks); starttime guards against PID reuse
+        self._prev_proc_times = {}
+        self._prev_proc_wall = None
+        # pid -> (starttime, cmdline, username); read once per process
+        self._static = {}
+        self._usernames = {}
+        self._total_memory = self.memory()[0].total
+        self._boot_time = self._read_boot_time()
+
+        self.cpu_percent()
+
+    def close(self):
+        for f in (self._stat, self._meminfo, self._net_dev, self._diskstats):
+            if f is not None:
+                f.close()
+
+    def _read_boot_time(self):
+        for line in self._stat.read().split(b"\n"):
+            if line.startswith(b"btime "):
+                return int(line.split()[1])
+        return 0
+
+    def _username(self, uid):
+        name = self._usernames.get(uid)
+        if name is None:
+            try:
+                name = pwd.getpwuid(uid).pw_name
+            except KeyError:
+                name = str(uid)
+            self._usernames[uid] = name
+        return name
+
+    def _read_static(self, pid, starttime):
+        path = f"{self.root}/{pid}"
+        try:
+            with open(f"{path}/cmdline", "rb") as f:
+                cmdline = f.read().replace(b"\0", b" ").strip().decode(errors="replace")
+        except OSError:
+            cmdline = ""
+        try:
+            username = self._username(os.stat(path).st_uid)
+        except OSError:
+            username = ""
+        entry = (starttime, cmdline, username)
+        self._static[pid] = entry
+        return entry
+
+    def cpu_times(self):
+        # (ncpu + 1, 10) array of jiffies; row 0 is the aggregate "cpu" line
+        rows = []
+        for line in self._stat.read().split(b"\n"):
+            if not line.startswith(b"cpu"):
+                if rows:
+                    break
+                continue
+            fields = line.split()[1:11]
+            fields.extend([b"0"] * (10 - len(fields)))
+            rows.append(fields)
+        return np.array(rows, dtype=np.int64)
+
+    def cpu_percent(self):
+        times = self.cpu_times()
+        prev, self._prev_cpu_times = self._prev_cpu_times, times
+        if prev is None or prev.shape != times.shape:
+            return 0.0, [0.0] * (len(times) - 1)
+
+        # Same definition as psutil: guest time is already part of user/nice,
+        # idle includes iowait
+        delta = times - prev
+        total = delta[:, :8].sum(axis=1)
+        busy = total - delta[:, 3] - delta[:, 4]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            percent = np.where(total > 0, busy * 100.0 / total, 0.0)
+        percent = np.round(np.clip(percent, 0.0, 100.0), 1)
+        return float(percent[0]), percent[1:].tolist()
+
+    def memory(self):
+        info = {}
+        for line in self._meminfo.read().split(b"\n"):
+            key, _, rest = line.partition(b":")
+            if rest:
+                info[key] = int(rest.split()[0]) * 1024
+
+        total = info.get(b"MemTotal", 0)
+        free = info.get(b"MemFree", 0)
+        cached = info.get(b"Cached", 0) + info.get(b"SReclaimable", 0)
+        available = info.get(b"MemAvailable", free + info.get(b"Buffers", 0) + cached)
+        used = total - available
+        percent = round((total - available) * 100.0 / total, 1) if total else 0.0
+
+        swap_total = info.get(b"SwapTotal", 0)
+        swap_free = info.get(b"SwapFree", 0)
+        swap_used = swap_total - swap_free
+        swap_percent = round(swap_used * 100.0 / swap_total, 1) if swap_total else 0.0
+
+        return (Memory(total, available, percent, used, free),
+                Swap(swap_total, swap_used, swap_free, swap_percent))
+
+    def net_io(self, pernic=False):
+        counters = {}
+        if self._net_dev is not None:
+            for line in self._net_dev.read().split(b"\n")[2:]:
+                name, _, rest = line.partition(b":")
+                fields = rest.split()
+                if len(fields) < 16:
+                    continue
+                f = [int(x) for x in fields]
+                counters[name.strip().decode()] = NetIO(f[8], f[0], f[9], f[1], f[2], f[10], f[3], f[11])
+        if pernic:
+            return counters
+        return NetIO(*[sum(column) for column in zip(*counters.values())]) if counters else NetIO(0, 0, 0, 0, 0, 0, 0, 0)
+
+    def disk_io(self):
+        counters = {}
+        if self._diskstats is not None:
+            for line in self._diskstats.read().split(b"\n"):
+                fields = line.split()
+                if len(fields) < 14:
+                    continue
+                f = fields
+                counters[f[2].decode()] = DiskIO(
+                    int(f[3]), int(f[7]),
+                    int(f[5]) * SECTOR_SIZE, int(f[9]) * SECTOR_SIZE,
+                    int(f[6]), int(f[10]), int(f[12]),
+                )
+        return counters
+
+    def _read_pid_stat(self, pid):
+        try:
+            fd = os.open(f"{self.root}/{pid}/stat", os.O_RDONLY)
+        except OSError:
+            return None
+        try:
+            n = os.readv(fd, [self._pid_buf])
+        except OSError:
+            return None
+        finally:
+            os.close(fd)
+        return bytes(memoryview(self._pid_buf)[:n])
+
+    def process_io(self, pids):
+        # {pid: (read_bytes, write_bytes)} for just these PIDs; /proc/<pid>/io
+        # is only readable for our own processes unless running as root
+        counters = {}
+        for pid in pids:
+            try:
+                with open(f"{self.root}/{pid}/io", "rb") as f:
+                    data = f.read()
+            except OSError:
+                continue
+            values = dict(line.split(b": ", 1) for line in data.splitlines() if b": " in line)
+            try:
+                counters[pid] = (int(values[b"read_bytes"]), int(values[b"write_bytes"]))
+            except (KeyError, ValueError):
+                pass
+        return counters
+
+    def processes(self):
+        now = time.monotonic()
+        wall = now - self._prev_proc_wall if self._prev_proc_wall is not None else None
+        self._prev_proc_wall = now
+
+        prev = self._prev_proc_times
+        current = {}
+        rows = []
+        scale = 100.0 / (self._clock_ticks * wall) if wall else None
+        page_size = self._page_size
+        total_memory = self._total_memory or 1
+
+        for entry in os.listdir(self.root):
+            if not entry.isdigit():
+                continue
+            data = self._read_pid_stat(entry)
+            if not data:
+                continue
+
+            # comm may contain spaces and parentheses; it ends at the last ')'
+            lparen = data.find(b"(")
+            rparen = data.rfind(b")")
+            fields = data[rparen + 2:].split()
+            pid = int(entry)
+            ticks = int(fields[11]) + int(fields[12])
+            starttime = int(fields[19])
+            rss = int(fields[21]) * page_size
+
+            cpu_percent = None
+            before = prev.get(pid)
+            if scale is not None and before is not None and before[0] == starttime:
+                cpu_percent = round((ticks - before[1]) * scale, 1)
+            current[pid] = (starttime, ticks)
+
+            static = self._static.get(pid)
+            if static is None or static[0] != starttime:
+                static = self._read_static(pid, starttime)
+
+            rows.append({
+                "pid": pid,
+                "name": data[lparen + 1:rparen].decode(errors="replace"),
+                "status": STATUS.get(chr(fields[0][0]), "unknown"),
+                "cpu_percent": cpu_percent,
+                "memory_percent": rss / total_memory * 100,
+                "rss": rss,
+                "ppid": int(fields[1]),
+                "num_threads": int(fields[17]),
+                "cmdline": static[1],
+                "username": static[2],
+                "create_time": self._boot_time + starttime / self._clock_ticks,
+            })
+
+        self._prev_proc_times = current
+        if len(self._static) > len(current):
+            for pid in [pid for pid in self._static if pid not in current]:
+                del self._static[pid]
+        return rows
@@ -0,0 +1,265 @@
+import heapq
+import os
+import threading
+
+import numpy as np
+
+from timeseries import RingBuffer
+
+
+# History for the heaviest processes only. CPU and memory each keep a weighted
+# Space-Saving summary of SUMMARY_FACTOR * k counters, fed every process sample
+# with that tick's top ``k`` consumers of the resource (weighted by their share
+# of all CPUs or of RAM, times the seconds since the last sample). The
+# processes with the largest guaranteed counts (count minus the error
+# inherited on entry) claim the resource's share of ``k`` slots and get a
+# RingBuffer of CPU, RSS, I/O and thread count. Claimed counters are pinned,
+# so a stream of short-lived PIDs only churns the unclaimed ones, and a
+# newcomer takes a slot only once its own consumption beats the weakest
+# holder's. Memory stays at ``k`` buffers however many PIDs come and go.
+# Counts decay with HALF_LIFE, so an old offender eventually makes room; an
+# exited process keeps its series until it is displaced or ages out.
+#
+# Rows are bucketed to RESOLUTION seconds, keeping the maximum of each bucket
+# so short spikes survive. I/O counters are read only for tracked processes.
+
+COLUMNS = ["cpu_percent", "rss", "read_rate", "write_rate", "num_threads"]
+DEFAULT_TRACKED = 20
+SUMMARY_FACTOR = 4
+RESOLUTION = 10.0
+HALF_LIFE = 1800.0
+
+
+class SpaceSaving:
+    # Weighted Space-Saving (Metwally et al., 2005): at most ``k`` counters.
+    # An unmonitored key replaces the smallest counter and inherits its count,
+    # which is recorded as that key's possible overestimate. Keys in ``keep``
+    # are never the ones replaced.
+    def __init__(self, k):
+        self.k = k
+        self._counts = {}
+        self._errors = {}
+
+    def __len__(self):
+        return len(self._counts)
+
+    def __contains__(self, key):
+        return key in self._counts
+
+    def add(self, key, weight, keep=()):
+        # Returns the evicted key, if any
+        counts = self._counts
+        if key in counts:
+            counts[key] += weight
+            return None
+        if len(counts) < self.k:
+            counts[key] = weight
+            self._errors[key] = 0.0
+            return None
+        evicted = min((k for k in counts if k not in keep), key=counts.get)
+        floor = counts.pop(evicted)
+        del self._errors[evicted]
+        counts[key] = floor + weight
+        self._errors[key] = floor
+        return evicted
+
+    def discard(self, key):
+        self._counts.pop(key, None)
+        self._errors.pop(key, None)
+
+    def decay(self, factor):
+        for key in self._counts:
+            self._counts[key] *= factor
+            self._errors[key] *= factor
+
+    def count(self, key):
+        return self._counts.get(key, 0.0), self._errors.get(key, 0.0)
+
+    def guaranteed(self, key):
+        # Lower bound on the key's true count
+        return self._counts.get(key, 0.0) - self._errors.get(key, 0.0)
+
+
+class _Tracked:
+    def __init__(self, row, buffer, now):
+        self.pid = row["pid"]
+        self.create_time = row.get("create_time")
+        self.buffer = buffer
+        self.running = True
+        self.last_seen = now
+        self.describe(row)
+        self._bucket_start = None
+        self._peak = None
+        self._io = None
+        self._io_time = None
+
+    def describe(self, row):
+        self.name = row["name"]
+        self.cmdline = row.get("cmdline") or ""
+        self.username = row.get("username") or ""
+
+    def add(self, row, io, now, resolution):
+        values = [row["cpu_percent"] or 0.0, row["rss"] or 0, row["num_threads"] or 0]
+        if self._peak is None:
+            self._bucket_start, self._peak = now, values
+        else:
+            self._peak = [max(a, b) for a, b in zip(self._peak, values)]
+        # The first sample is written straight away so a new process shows up
+        if now - self._bucket_start >= resolution or self._io_time is None:
+            return self.flush(now, io)
+        return False
+
+    def flush(self, now, io=None):
+        # Writes the pending bucket, if any; returns whether it did
+        if self._peak is None:
+            return False
+        read_rate = write_rate = None
+        if io is not None and self._io is not None and now > self._io_time:
+            elapsed = now - self._io_time
+            read_rate = max(io[0] - self._io[0], 0) / elapsed
+            write_rate = max(io[1] - self._io[1], 0) / elapsed
+        cpu, rss, threads = self._peak
+        self.buffer.append(now, [cpu, rss, read_rate, write_rate, threads])
+        self._io, self._io_time = io, now
+        self._peak = None
+        return True
+
+
+class ProcessHistory:
+    def __init__(self, k=None, seconds=6 * 3600, resolution=RESOLUTION, half_life=HALF_LIFE, cpu_count=None):
+        if k is None:
+            k = int(os.environ.get("TASK_MANAGER_TRACKED_PROCESSES", DEFAULT_TRACKED))
+        self.k = k
+        self.seconds = seconds
+        self.resolution = resolution
+        self.half_life = half_life
+        self.cpu_count = cpu_count or os.cpu_count() or 1
+        self._capacity = int(seconds / resolution) + 1
+        self._shares = {
+            "cpu": lambda row: (row["cpu_percent"] or 0.0) / (100.0 * self.cpu_count),
+            "memory": lambda row: row["memory_percent"] / 100.0,
+        }
+        self._slots = {"cpu": k - k // 2, "memory": k // 2}
+        self._summaries = {resource: SpaceSaving(SUMMARY_FACTOR * k) for resource in self._shares}
+        self._claims = {resource: set() for resource in self._shares}
+        self._tracked = {}  # (pid, create_time) -> _Tracked
+        self._free = []  # cleared buffers of evicted processes, reused first
+        self._last_update = None
+        self._lock = threading.Lock()
+        # Bumped whenever a series gains a row or the tracked set changes, so
+        # readers can skip re-rendering unchanged data
+        self.version = 0
+
+    @property
+    def nbytes(self):
+        return sum(t.buffer.nbytes for t in self._tracked.values()) + sum(b.nbytes for b in self._free)
+
+    def _release(self, key):
+        # Drops the buffer once no resource claims the process any more
+        if key in self._tracked and not any(key in claims for claims in self._claims.values()):
+            tracked = self._tracked.pop(key)
+            tracked.buffer.clear()
+            self._free.append(tracked.buffer)
+
+    def _rank(self, resource, rows, elapsed, now):
+        share, summary, claims = self._shares[resource], self._summaries[resource], self._claims[resource]
+        newcomers = []
+        for row in heapq.nlargest(self.k, rows, key=share):
+            key = (row["pid"], row.get("create_time"))
+            summary.add(key, share(row) * elapsed, keep=claims)
+            if key not in claims:
+                newcomers.append((key, row))
+
+        for key, row in newcomers:
+            if key not in summary:
+                continue  # displaced by a later newcomer in this same tick
+            if len(claims) >= self._slots[resource]:
+                weakest = min(claims, key=summary.guaranteed)
+                if summary.guaranteed(key) <= summary.guaranteed(weakest):
+                    continue
+                claims.discard(weakest)
+                self._release(weakest)
+            claims.add(key)
+            if key not in self._tracked:
+                buffer = self._free.pop() if self._free else RingBuffer(self._capacity, COLUMNS)
+                self._tracked[key] = _Tracked(row, buffer, now)
+
+    def update(self, rows, now, read_io=None):
+        # ``rows``: one process sample. ``read_io(pids)`` returns
+        # {pid: (read_bytes, write_bytes)}, and is only asked about tracked PIDs.
+        elapsed = now - self._last_update if self._last_update is not None else 1.0
+        self._last_update = now
+        with self._lock:
+            tracked_before = set(self._tracked)
+            changed = False
+            decay = 0.5 ** (elapsed / self.half_life)
+            for resource, summary in self._summaries.items():
+                summary.decay(decay)
+                self._rank(resource, rows, elapsed, now)
+
+            current = {}
+            for row in rows:
+                key = (row["pid"], row.get("create_time"))
+                if key in self._tracked:
+                    current[key] = row
+            io = read_io([key[0] for key in current]) if read_io is not None and current else {}
+
+            for key, tracked in list(self._tracked.items()):
+                row = current.get(key)
+                if row is not None:
+                    tracked.running, tracked.last_seen = True, now
+                    tracked.describe(row)
+                    changed |= tracked.add(row, io.get(key[0]), now, self.resolution)
+                else:
+                    if tracked.running:
+                        # Just exited: keep its last partial bucket
+                        tracked.flush(tracked.last_seen)
+                        changed = True
+                    tracked.running = False
+                    if now - tracked.last_seen > self.seconds:
+                        # Its whole series has aged out of the window
+                        for resource, summary in self._summaries.items():
+                            summary.discard(key)
+                            self._claims[resource].discard(key)
+                        self._release(key)
+            if changed or set(self._tracked) != tracked_before:
+                self.version += 1
+
+    def processes(self):
+        # Tracked processes, heaviest first, with their latest bucket
+        with self._lock:
+            tracked = list(self._tracked.items())
+            scores = {key: {resource: summary.guaranteed(key) for resource, summary in self._summaries.items()}
+                      for key, _ in tracked}
+        result = []
+        for key, t in tracked:
+            _, latest = t.buffer.latest()
+            entry = {
+                "pid": t.pid,
+                "name": t.name,
+                "username": t.username,
+                "cmdline": t.cmdline,
+                "create_time": t.create_time,
+                "running": t.running,
+                "last_seen": t.last_seen,
+                # Guaranteed decayed share-seconds of all CPUs / all RAM
+                "cpu_score": scores[key]["cpu"],
+                "memory_score": scores[key]["memory"],
+            }
+            for i, column in enumerate(COLUMNS):
+                entry[column] = None if latest is None or np.isnan(latest[i]) else float(latest[i])
+            result.append(entry)
+        result.sort(key=lambda entry: entry["cpu_score"] + entry["memory_score"], reverse=True)
+        return result
+
+    def series(self, pid, column, seconds=None, create_time=None):
+        # (times, values) for one tracked process; empty arrays when the
+        # process is not tracked. Without ``create_time`` the most recently
+        # seen process with that PID is used.
+        with self._lock:
+            candidates = [t for key, t in self._tracked.items()
+                          if key[0] == pid and (create_time is None or key[1] == create_time)]
+        if not candidates:
+            return np.empty(0), np.empty(0)
+        tracked = max(candidates, key=lambda t: t.last_seen)
+        return tracked.buffer.column(column, seconds=seconds)
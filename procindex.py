@@ -0,0 +1,115 @@
+import functools
+import heapq
+import re
+import threading
+
+
+# Searchable index over the collector's process rows. Each process gets one
+# lower-cased "name / cmdline / user" search string, built when the process is
+# first seen (keyed by pid + create time) and reused on every later tick; the
+# parent -> children map is rebuilt in the same pass. Queries filter, sort and
+# slice on the server, so a page only ever carries the rows it shows.
+
+COLUMNS = ["pid", "name", "username", "status", "cpu_percent", "memory_percent", "rss",
+           "num_threads", "ppid", "cmdline"]
+TEXT_COLUMNS = {"name", "username", "status", "cmdline"}
+
+
+@functools.lru_cache(maxsize=64)
+def _compile(pattern):
+    return re.compile(pattern, re.IGNORECASE)
+
+
+def _sort_key(column):
+    # Missing values (e.g. cpu_percent on a process's first tick) sort lowest
+    empty = "" if column in TEXT_COLUMNS else 0
+    return lambda row: (row[column] is not None, row[column] if row[column] is not None else empty)
+
+
+class ProcessIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rows = []
+        self._by_pid = {}
+        self._search = {}  # pid -> (create_time, search string)
+        self._children = {}
+
+    def __len__(self):
+        return len(self._rows)
+
+    def update(self, rows):
+        previous = self._search
+        search = {}
+        by_pid = {}
+        children = {}
+        for row in rows:
+            pid = row["pid"]
+            by_pid[pid] = row
+            entry = previous.get(pid)
+            if entry is None or entry[0] != row.get("create_time"):
+                text = "\n".join((row["name"] or "", row.get("cmdline") or "", row.get("username") or ""))
+                entry = (row.get("create_time"), text.lower())
+            search[pid] = entry
+            children.setdefault(row["ppid"], []).append(pid)
+
+        with self._lock:
+            self._rows, self._by_pid, self._search, self._children = rows, by_pid, search, children
+
+    def rows(self):
+        with self._lock:
+            return self._rows
+
+    def get(self, pid):
+        with self._lock:
+            return self._by_pid.get(pid)
+
+    def users(self):
+        with self._lock:
+            rows = self._rows
+        return sorted({row.get("username") or "" for row in rows})
+
+    def descendants(self, pid, children=None):
+        # ``pid`` and every process below it, parents first
+        if children is None:
+            with self._lock:
+                children = self._children
+        found = [pid]
+        for parent in found:
+            found.extend(child for child in children.get(parent, ()) if child != parent)
+        return found
+
+    def query(self, search="", regex=False, user=None, ppid=None, tree=False,
+              sort=(("cpu_percent", True),), offset=0, limit=50):
+        # Returns (matching count, rows for [offset, offset + limit)).
+        # ``sort`` is a sequence of (column, descending) pairs, most
+        # significant first. ``ppid`` limits to that parent's children, or
+        # with ``tree`` to its whole subtree. Raises re.error on a bad regex.
+        with self._lock:
+            rows, by_pid, index, children = self._rows, self._by_pid, self._search, self._children
+
+        if ppid is not None:
+            pids = self.descendants(ppid, children)[1:] if tree else children.get(ppid, [])
+            rows = [by_pid[pid] for pid in pids if pid in by_pid]
+        if user:
+            rows = [row for row in rows if row.get("username") == user]
+        if search:
+            if regex:
+                match = _compile(search).search
+                rows = [row for row in rows if match(index[row["pid"]][1])]
+            else:
+                needle = search.lower()
+                rows = [row for row in rows if needle in index[row["pid"]][1]]
+
+        total = len(rows)
+        sort = list(sort)
+        if len(sort) == 1:
+            # One key: partial selection of just the rows up to this page
+            column, descending = sort[0]
+            select = heapq.nlargest if descending else heapq.nsmallest
+            page = select(offset + limit, rows, key=_sort_key(column))[offset:]
+        else:
+            ordered = list(rows)
+            for column, descending in reversed(sort):
+                ordered.sort(key=_sort_key(column), reverse=descending)
+            page = ordered[offset:offset + limit]
+        return total, page
@@ -0,0 +1,144 @@
+import fnmatch
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import psutil
+
+
+# Bulk process termination off the UI thread. A job signals every target with
+# SIGTERM, waits for all of them at once with psutil.wait_procs(), sends
+# SIGKILL to whatever is still alive after the grace period and waits again.
+# The job records one result per target as it goes, so a page can poll it on
+# each refresh instead of blocking on the kill.
+#
+# Targets come from the collector's process index, so they can be a few
+# seconds stale: each one carries its create time and a PID that has since
+# been reused by another process is skipped rather than killed.
+
+TERMINATE_TIMEOUT = 5.0
+KILL_TIMEOUT = 3.0
+KILL_WORKERS = 4
+
+_executor = ThreadPoolExecutor(max_workers=KILL_WORKERS, thread_name_prefix="process-kill")
+_job_ids = itertools.count(1)
+
+
+def protected_pids():
+    # This process and its ancestors: killing "everything owned by me" should
+    # not take down the monitor or the shell that started it
+    me = psutil.Process()
+    return {me.pid} | {parent.pid for parent in me.parents()}
+
+
+def select_targets(index, pid=None, tree=False, name=None, user=None):
+    # Rows of the processes to signal: ``pid`` (with ``tree``, it and every
+    # descendant, deepest first), every process whose name matches the glob
+    # ``name``, and/or every process owned by ``user``. Filters combine with AND.
+    if pid is not None:
+        pids = index.descendants(pid)[::-1] if tree else [pid]
+        rows = [row for row in map(index.get, pids) if row is not None]
+    else:
+        rows = index.rows()
+    if name:
+        rows = [row for row in rows if fnmatch.fnmatchcase(row["name"], name)]
+    if user:
+        rows = [row for row in rows if row.get("username") == user]
+    protected = protected_pids()
+    return [row for row in rows if row["pid"] not in protected]
+
+
+class KillJob:
+    def __init__(self, targets, terminate_timeout=TERMINATE_TIMEOUT, kill_timeout=KILL_TIMEOUT):
+        self.id = next(_job_ids)
+        self.terminate_timeout = terminate_timeout
+        self.kill_timeout = kill_timeout
+        self.started = time.time()
+        self.finished = None
+        self._lock = threading.Lock()
+        # One result per target, in target order
+        self._results = {row["pid"]: {
+            "pid": row["pid"],
+            "name": row["name"],
+            "user": row.get("username") or "",
+            "outcome": "pending",
+            "signal": None,
+            "returncode": None,
+            "seconds": None,
+        } for row in targets}
+        self._create_times = {row["pid"]: row.get("create_time") for row in targets}
+
+    @property
+    def done(self):
+        return self.finished is not None
+
+    def results(self):
+        with self._lock:
+            return [dict(result) for result in self._results.values()]
+
+    def counts(self):
+        # {outcome: number of targets}
+        counts = {}
+        for result in self.results():
+            counts[result["outcome"]] = counts.get(result["outcome"], 0) + 1
+        return counts
+
+    def _set(self, pid, **fields):
+        with self._lock:
+            self._results[pid].update(fields)
+
+    def _exited(self, proc):
+        # wait_procs() callback, called as each process goes away
+        with self._lock:
+            result = self._results[proc.pid]
+            result["outcome"] = "killed" if result["signal"] == "SIGKILL" else "terminated"
+            result["returncode"] = proc.returncode
+            result["seconds"] = time.time() - self.started
+
+    def _signal(self, procs, name, send):
+        sent = []
+        for proc in procs:
+            try:
+                send(proc)
+                self._set(proc.pid, signal=name, outcome="signalled")
+                sent.append(proc)
+            except psutil.NoSuchProcess:
+                self._set(proc.pid, outcome="already exited", seconds=time.time() - self.started)
+            except psutil.AccessDenied:
+                self._set(proc.pid, outcome="access denied")
+        return sent
+
+    def run(self):
+        try:
+            procs = []
+            for pid, create_time in self._create_times.items():
+                try:
+                    proc = psutil.Process(pid)
+                    # Same check as Process.is_running(): the PID must still
+                    # belong to the process that was selected
+                    if create_time is not None and abs(proc.create_time() - create_time) > 0.01:
+                        self._set(pid, outcome="already exited")
+                        continue
+                    procs.append(proc)
+                except psutil.NoSuchProcess:
+                    self._set(pid, outcome="already exited")
+                except psutil.AccessDenied:
+                    self._set(pid, outcome="access denied")
+
+            procs = self._signal(procs, "SIGTERM", psutil.Process.terminate)
+            _, alive = psutil.wait_procs(procs, timeout=self.terminate_timeout, callback=self._exited)
+            if alive:
+                alive = self._signal(alive, "SIGKILL", psutil.Process.kill)
+                _, alive = psutil.wait_procs(alive, timeout=self.kill_timeout, callback=self._exited)
+            for proc in alive:
+                self._set(proc.pid, outcome="still running")
+        finally:
+            self.finished = time.time()
+
+
+def kill(targets, terminate_timeout=TERMINATE_TIMEOUT, kill_timeout=KILL_TIMEOUT):
+    # Starts a KillJob on the worker pool and returns it straight away
+    job = KillJob(targets, terminate_timeout, kill_timeout)
+    _executor.submit(job.run)
+    return job
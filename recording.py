@@ -0,0 +1,383 @@
+import argparse
+import csv
+import glob
+import json
+import logging
+import mmap
+import os
+import platform
+import struct
+import threading
+import time
+import zlib
+
+import numpy as np
+
+from timeseries import downsample
+
+
+# Session recordings: every sampled series written to an append-only binary
+# file, for replaying the graphs after the fact.
+#
+# A recording file is a JSON header (magic, column names, start time, host)
+# followed by fixed-size rows: a float64 timestamp and one float32 per column,
+# NaN where a metric was not sampled. Fixed rows mean a reader can memory-map
+# the file and view it as one NumPy record array without parsing anything, so
+# opening a day-long recording costs nothing and a time lookup is a binary
+# search. A crash can at most leave a partial last row, which readers ignore.
+#
+# The column set is fixed per file: when a new series appears (a device is
+# added) or the file is a day old, the recorder starts a new file. Rates only
+# appear from the second sample on, so during a file's first SETTLE_ROWS rows
+# a new series rewrites the file with the wider layout instead.
+#
+# Optional process-table snapshots go to a companion ".procs" file of
+# [float64 time][uint32 length][zlib-compressed JSON rows] records.
+
+MAGIC = b"TMREC1\n"
+SUFFIX = ".tmrec"
+PROCS_SUFFIX = ".procs"
+DEFAULT_DIR = os.path.join(os.path.expanduser("~"), ".task_manager", "recordings")
+ROTATE_SECONDS = 24 * 3600
+RETENTION_DAYS = 7
+FLUSH_INTERVAL = 5.0
+SETTLE_ROWS = 60
+PROCESS_COLUMNS = ["pid", "name", "username", "status", "cpu_percent", "memory_percent", "rss", "num_threads"]
+_PROCS_HEADER = struct.Struct("<dI")
+_HEADER_LENGTH = struct.Struct("<I")
+
+logger = logging.getLogger("task_manager.recording")
+
+
+def _row_dtype(columns):
+    return np.dtype([("time", "<f8"), ("values", "<f4", (len(columns),))])
+
+
+class Recorder:
+    def __init__(self, directory=DEFAULT_DIR, process_interval=None, rotate_seconds=ROTATE_SECONDS,
+                 retention_days=RETENTION_DAYS, flush_interval=FLUSH_INTERVAL):
+        # ``process_interval``: seconds between process-table snapshots (None: off)
+        self.directory = directory
+        self.process_interval = process_interval
+        self.rotate_seconds = rotate_seconds
+        self.retention_days = retention_days
+        self.flush_interval = flush_interval
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self.path = None
+        self._file = None
+        self._procs = None
+        self._columns = None
+        self._index = None
+        self._dtype = None
+        self._started = None
+        self._settling = None  # rows of the current file while it may be rewritten
+        self._last_flush = 0.0
+        self._last_processes = None
+
+    def _open(self, timestamp, columns, path=None):
+        self._close_files()
+        if path is None:
+            base = os.path.join(self.directory, time.strftime("%Y%m%d-%H%M%S", time.localtime(timestamp)))
+            path = base + SUFFIX
+            n = 1
+            while os.path.exists(path):
+                n += 1
+                path = f"{base}-{n}{SUFFIX}"
+        header = json.dumps({"columns": columns, "start": timestamp, "host": platform.node()}).encode("utf-8")
+        # Pad so rows start 8-byte aligned
+        header += b" " * (-(len(MAGIC) + _HEADER_LENGTH.size + len(header)) % 8)
+        self._file = open(path, "wb")
+        self._file.write(MAGIC + _HEADER_LENGTH.pack(len(header)) + header)
+        self._procs = open(path[:-len(SUFFIX)] + PROCS_SUFFIX, "ab") if self.process_interval else None
+        self.path = path
+        self._columns = columns
+        self._index = {name: i for i, name in enumerate(columns)}
+        self._dtype = _row_dtype(columns)
+        self._started = timestamp
+        self._settling = []
+        self._prune(timestamp)
+
+    def _prune(self, now):
+        if not self.retention_days:
+            return
+        cutoff = now - self.retention_days * 24 * 3600
+        for path in glob.glob(os.path.join(self.directory, "*" + SUFFIX)):
+            if path != self.path and os.path.getmtime(path) < cutoff:
+                for stale in (path, path[:-len(SUFFIX)] + PROCS_SUFFIX):
+                    try:
+                        os.remove(stale)
+                    except OSError:
+                        pass
+
+    def append(self, timestamp, values, processes=None):
+        # ``values``: {series name: value}; None and missing entries are NaN
+        values = {name: value for name, value in values.items() if value is not None}
+        with self._lock:
+            if (self._file is None or not values.keys() <= self._index.keys()
+                    or timestamp - self._started >= self.rotate_seconds):
+                columns = list(values) if self._columns is None else self._columns + [
+                    name for name in values if name not in self._index]
+                if self._settling is not None and timestamp - self._started < self.rotate_seconds:
+                    # Still young: rewrite it with the new columns. Unlinking
+                    # first leaves a reader's mapping on the old, intact inode.
+                    path, settled = self.path, self._settling
+                    self._close_files()
+                    os.remove(path)
+                    self._open(self._started, columns, path)
+                    for row in settled:
+                        self._write_row(*row)
+                else:
+                    self._open(timestamp, columns)
+
+            self._write_row(timestamp, values)
+
+            if (processes is not None and self._procs is not None
+                    and (self._last_processes is None or timestamp - self._last_processes >= self.process_interval)):
+                payload = zlib.compress(json.dumps(
+                    [[row.get(column) for column in PROCESS_COLUMNS] for row in processes]).encode("utf-8"))
+                self._procs.write(_PROCS_HEADER.pack(timestamp, len(payload)) + payload)
+                self._last_processes = timestamp
+
+            now = time.monotonic()
+            if now - self._last_flush >= self.flush_interval:
+                self._flush_locked()
+                self._last_flush = now
+
+    def _write_row(self, timestamp, values):
+        row = np.zeros(1, dtype=self._dtype)
+        row["time"] = timestamp
+        row_values = row["values"][0]
+        row_values[:] = np.nan
+        for name, value in values.items():
+            row_values[self._index[name]] = value
+        self._file.write(row.tobytes())
+        if self._settling is not None:
+            self._settling.append((timestamp, values))
+            if len(self._settling) >= SETTLE_ROWS:
+                self._settling = None
+
+    def _flush_locked(self):
+        for f in (self._file, self._procs):
+            if f is not None:
+                f.flush()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _close_files(self):
+        for f in (self._file, self._procs):
+            if f is not None:
+                f.close()
+        self._file = self._procs = None
+
+    def close(self):
+        with self._lock:
+            self._close_files()
+
+
+def list_recordings(directory=DEFAULT_DIR):
+    # Newest first
+    return sorted(glob.glob(os.path.join(directory, "*" + SUFFIX)), reverse=True)
+
+
+def _close_map(mapping):
+    # Arrays handed out by column() may still view the map; it is then
+    # released when the last of them is garbage collected
+    if mapping is not None:
+        try:
+            mapping.close()
+        except BufferError:
+            pass
+
+
+class Recording:
+    # Read-only, memory-mapped view of a recording file. The file may still be
+    # growing; refresh() picks up rows written since it was opened.
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        prefix = self._file.read(len(MAGIC) + _HEADER_LENGTH.size)
+        if prefix[:len(MAGIC)] != MAGIC:
+            self._file.close()
+            raise ValueError(f"{path} is not a recording")
+        (length,) = _HEADER_LENGTH.unpack(prefix[len(MAGIC):])
+        header = json.loads(self._file.read(length))
+        self.columns = header["columns"]
+        self.host = header.get("host")
+        self._index = {name: i for i, name in enumerate(self.columns)}
+        self._offset = len(prefix) + length
+        self._dtype = _row_dtype(self.columns)
+        self._mmap = None
+        self._rows = None
+        self.refresh()
+
+        self._procs_index = None
+        self._procs_times = None
+        self._procs_mmap = None
+        self._procs_file = None
+        procs_path = path[:-len(SUFFIX)] + PROCS_SUFFIX
+        if os.path.exists(procs_path) and os.path.getsize(procs_path):
+            self._procs_file = open(procs_path, "rb")
+            self._procs_mmap = mmap.mmap(self._procs_file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._procs_index = self._index_processes()
+            self._procs_times = np.array([t for t, _ in self._procs_index])
+
+    def refresh(self):
+        size = os.fstat(self._file.fileno()).st_size
+        count = max(size - self._offset, 0) // self._dtype.itemsize
+        if self._rows is not None and count == len(self._rows):
+            return
+        self._rows = None
+        _close_map(self._mmap)
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+        if count:
+            self._rows = np.frombuffer(self._mmap, dtype=self._dtype, count=count, offset=self._offset)
+        else:
+            self._rows = np.zeros(0, dtype=self._dtype)
+
+    def __len__(self):
+        return len(self._rows)
+
+    @property
+    def times(self):
+        return self._rows["time"]
+
+    @property
+    def start(self):
+        return float(self.times[0]) if len(self) else None
+
+    @property
+    def end(self):
+        return float(self.times[-1]) if len(self) else None
+
+    def span(self, start=None, end=None):
+        # Row range [lo, hi) between ``start`` and ``end``
+        times = self.times
+        lo = 0 if start is None else np.searchsorted(times, start, side="left")
+        hi = len(times) if end is None else np.searchsorted(times, end, side="right")
+        return lo, hi
+
+    def column(self, name, start=None, end=None):
+        # (times, values) views between ``start`` and ``end`` (Unix times)
+        i = self._index.get(name)
+        lo, hi = self.span(start, end)
+        if i is None:
+            return np.empty(0), np.empty(0)
+        rows = self._rows[lo:hi]
+        return rows["time"], rows["values"][:, i]
+
+    def _index_processes(self):
+        # [(time, offset)] by hopping over the record headers
+        index = []
+        data, offset = self._procs_mmap, 0
+        while offset + _PROCS_HEADER.size <= len(data):
+            timestamp, length = _PROCS_HEADER.unpack_from(data, offset)
+            if offset + _PROCS_HEADER.size + length > len(data):
+                break  # partial last record
+            index.append((timestamp, offset))
+            offset += _PROCS_HEADER.size + length
+        return index
+
+    def processes(self, at):
+        # The process-table snapshot taken at or before ``at``, as row dicts
+        if not self._procs_index:
+            return None
+        i = np.searchsorted(self._procs_times, at, side="right") - 1
+        if i < 0:
+            return None
+        _, offset = self._procs_index[i]
+        _, length = _PROCS_HEADER.unpack_from(self._procs_mmap, offset)
+        start = offset + _PROCS_HEADER.size
+        rows = json.loads(zlib.decompress(self._procs_mmap[start:start + length]))
+        return [dict(zip(PROCESS_COLUMNS, row)) for row in rows]
+
+    def chunks(self, rows=65536):
+        # Successive record-array slices, for streaming export
+        for start in range(0, len(self), rows):
+            yield self._rows[start:start + rows]
+
+    def close(self):
+        self._rows = None
+        _close_map(self._mmap)
+        _close_map(self._procs_mmap)
+        for handle in (self._file, self._procs_file):
+            if handle is not None:
+                handle.close()
+
+
+class ReplayCursor:
+    # Looks like the collector to LiveChart: history() answers from the
+    # recording as if "now" were ``position``
+    def __init__(self, recording, interval=1.0):
+        self.recording = recording
+        self.interval = interval
+        self.position = recording.start
+
+    def seek(self, position):
+        self.position = min(max(position, self.recording.start), self.recording.end)
+
+    def advance(self, seconds):
+        self.seek(self.position + seconds)
+        return self.position < self.recording.end
+
+    def history(self, name, seconds=None, max_points=None, method="minmax"):
+        start = None if seconds is None else self.position - seconds
+        times, values = self.recording.column(name, start, self.position)
+        if max_points is not None:
+            times, values = downsample(times, values.astype(np.float64), max_points, method=method)
+        return times, values
+
+
+def export_csv(recording, output, columns=None):
+    # Streams the recording to CSV one chunk at a time
+    columns = columns or recording.columns
+    indices = [recording.columns.index(name) for name in columns]
+    with open(output, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["time"] + columns)
+        for chunk in recording.chunks():
+            values = chunk["values"][:, indices]
+            for t, row in zip(chunk["time"].tolist(), values.tolist()):
+                writer.writerow([t] + ["" if v != v else v for v in row])
+
+
+def export_parquet(recording, output, columns=None):
+    # One Parquet row group per chunk, so memory stays at one chunk
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    columns = columns or recording.columns
+    indices = [recording.columns.index(name) for name in columns]
+    schema = pa.schema([("time", pa.timestamp("us", tz="UTC"))] + [(name, pa.float32()) for name in columns])
+    with pq.ParquetWriter(output, schema, compression="zstd") as writer:
+        for chunk in recording.chunks():
+            arrays = [pa.array((chunk["time"] * 1e6).astype("int64"), type=pa.timestamp("us", tz="UTC"))]
+            arrays += [pa.array(chunk["values"][:, i], type=pa.float32(), from_pandas=True) for i in indices]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export a task manager recording.")
+    parser.add_argument("recording", help="path to a .tmrec file")
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv")
+    parser.add_argument("--output", help="output file (default: the recording name with .csv/.parquet)")
+    parser.add_argument("--columns", nargs="+", help="series to export (default: all)")
+    args = parser.parse_args(argv)
+
+    output = args.output or args.recording[:-len(SUFFIX)] + "." + args.format
+    recording = Recording(args.recording)
+    try:
+        if args.format == "csv":
+            export_csv(recording, output, args.columns)
+        else:
+            export_parquet(recording, output, args.columns)
+        print(f"Wrote {len(recording)} rows to {output}")
+    finally:
+        recording.close()
+
+
+if __name__ == "__main__":
+    main()
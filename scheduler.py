@@ -0,0 +1,148 @@
+import threading
+import time
+
+
+# Per-metric sampling intervals. Each metric group starts at its base interval
+# and then:
+#   - backs off (x BACKOFF, up to ``max_interval``) while its value is stable,
+#   - returns to base as soon as the value moves,
+#   - backs off the same way while there is nothing to read,
+#   - drops to ``min_interval`` while a threshold is crossed,
+#   - is slowed by IDLE_FACTOR when no session has looked for IDLE_AFTER s.
+#
+# The collector asks ``due()`` which groups to sample on each wake-up and feeds
+# the fresh values back through ``observe()``.
+
+BACKOFF = 1.5
+IDLE_FACTOR = 5.0
+IDLE_AFTER = 30.0
+
+
+class MetricSchedule:
+    def __init__(self, name, base, min_interval=None, max_interval=None, high=None, low=None, tolerance=1.0):
+        # ``high``/``low``: tighten while value >= high or value <= low.
+        # ``tolerance``: changes smaller than this count as stable.
+        self.name = name
+        self.base = base
+        self.min_interval = min_interval if min_interval is not None else base
+        self.max_interval = max_interval if max_interval is not None else base
+        self.high = high
+        self.low = low
+        self.tolerance = tolerance
+
+        self.interval = base
+        self.state = "base"
+        self.last_value = None
+        self.next_due = 0.0
+
+    def crossed(self, value):
+        return ((self.high is not None and value >= self.high)
+                or (self.low is not None and value <= self.low))
+
+    def observe(self, value):
+        if value is None:
+            # Nothing to read (no battery, no GPU) or the read failed
+            self.interval = min(self.interval * BACKOFF, self.max_interval)
+            self.state = "unavailable"
+        elif self.crossed(value):
+            self.interval, self.state = self.min_interval, "alert"
+        elif self.last_value is not None and abs(value - self.last_value) < self.tolerance:
+            self.interval = min(self.interval * BACKOFF, self.max_interval)
+            self.state = "stable"
+        else:
+            self.interval, self.state = self.base, "active"
+        if value is not None:
+            self.last_value = value
+
+
+def default_schedules(interval=1.0):
+    # Intervals scale with the collector's base interval
+    return [
+        MetricSchedule("cpu", interval, 0.25 * interval, 5 * interval, high=90, tolerance=2.0),
+        MetricSchedule("memory", interval, 0.5 * interval, 10 * interval, high=90, tolerance=0.5),
+        MetricSchedule("disk_usage", 30 * interval, 10 * interval, 300 * interval, high=95, tolerance=0.1),
+        MetricSchedule("network", interval, 0.5 * interval, 10 * interval, tolerance=1024.0),
+        MetricSchedule("disk_io", interval, 0.5 * interval, 10 * interval, tolerance=64 * 1024.0),
+        MetricSchedule("battery", 30 * interval, 10 * interval, 300 * interval, low=10, tolerance=1.0),
+        MetricSchedule("gpu", interval, 0.5 * interval, 10 * interval, high=90, tolerance=2.0),
+        MetricSchedule("power", interval, interval, 10 * interval, tolerance=1.0),
+        MetricSchedule("processes", interval, interval, 5 * interval, tolerance=1.0),
+        MetricSchedule("cgroup", interval, 0.5 * interval, 10 * interval, high=25, tolerance=1.0),
+    ]
+
+
+class AdaptiveScheduler:
+    def __init__(self, schedules, adaptive=True):
+        # With ``adaptive`` off every metric stays at its base interval
+        self.schedules = {s.name: s for s in schedules}
+        self.adaptive = adaptive
+        self._lock = threading.Lock()
+        self._last_viewer = None
+
+    def touch(self, now=None):
+        # Called by anything that reads the collector on someone's behalf. The
+        # first touch after an idle spell brings every group forward, so a
+        # newly opened page does not wait out the slowed-down intervals.
+        # Returns True when it did, so the caller can wake the sampler.
+        now = time.monotonic() if now is None else now
+        woke = not self.viewers_attached(now) and self.adaptive
+        if woke:
+            with self._lock:
+                for schedule in self.schedules.values():
+                    schedule.next_due = min(schedule.next_due, now)
+        self._last_viewer = now
+        return woke
+
+    def viewers_attached(self, now=None):
+        now = time.monotonic() if now is None else now
+        return self._last_viewer is not None and now - self._last_viewer < IDLE_AFTER
+
+    def _effective(self, schedule, idle):
+        if not self.adaptive:
+            return schedule.base
+        if idle and schedule.state != "alert":
+            return schedule.interval * IDLE_FACTOR
+        return schedule.interval
+
+    def due(self, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            return {name for name, s in self.schedules.items() if now >= s.next_due}
+
+    def observe(self, values, now=None):
+        # ``values``: {group: representative value} for the groups just sampled
+        now = time.monotonic() if now is None else now
+        idle = not self.viewers_attached(now)
+        with self._lock:
+            for name, value in values.items():
+                schedule = self.schedules[name]
+                schedule.observe(value)
+                schedule.next_due = now + self._effective(schedule, idle)
+
+    def shortest_interval(self, name):
+        # The fastest a group can be sampled (its alert rate), for sizing
+        # buffers that get one row per sample
+        schedule = self.schedules[name]
+        return schedule.min_interval if self.adaptive else schedule.base
+
+    def next_wakeup(self, now=None):
+        # Seconds until the earliest group is due
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            return max(0.0, min(s.next_due for s in self.schedules.values()) - now)
+
+    def rates(self, now=None):
+        # One row per group for the UI
+        idle = not self.viewers_attached(now)
+        with self._lock:
+            rows = []
+            for s in self.schedules.values():
+                interval = self._effective(s, idle)
+                rows.append({
+                    "metric": s.name,
+                    "base_s": s.base,
+                    "interval_s": interval,
+                    "hz": 1.0 / interval if interval else 0.0,
+                    "state": "idle" if idle and self.adaptive and s.state != "alert" else s.state,
+                })
+            return rows
@@ -0,0 +1,108 @@
+import functools
+import glob
+import os
+import platform
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError, wait
+
+import psutil
+
+
+# Host facts that cannot change while the process runs are read once, and
+# per-mount disk usage is gathered concurrently so a hung network or FUSE
+# mount only costs its own timeout instead of freezing the whole page.
+
+DISK_USAGE_WORKERS = 8
+DISK_USAGE_TIMEOUT = 2.0
+
+
+@functools.lru_cache(maxsize=None)
+def static_info():
+    uname = platform.uname()
+    cpu_freq = psutil.cpu_freq()
+    return {
+        "uname": uname,
+        "physical_cores": psutil.cpu_count(logical=False),
+        "logical_cores": psutil.cpu_count(logical=True),
+        "max_frequency": cpu_freq.max if cpu_freq else None,
+        "min_frequency": cpu_freq.min if cpu_freq else None,
+        "boot_time": psutil.boot_time(),
+    }
+
+
+def _parse_cpulist(text):
+    # "0-3,8,10-11" -> [0, 1, 2, 3, 8, 10, 11]
+    cpus = []
+    for part in text.strip().split(","):
+        if part:
+            low, _, high = part.partition("-")
+            cpus.extend(range(int(low), int(high or low) + 1))
+    return cpus
+
+
+@functools.lru_cache(maxsize=None)
+def cpu_topology(root="/sys/devices/system"):
+    # {"socket": {cpu: package id}, "numa": {cpu: node}} from sysfs; empty
+    # dicts where the host does not expose them (non-Linux, no NUMA)
+    sockets = {}
+    for path in glob.glob(os.path.join(root, "cpu", "cpu[0-9]*", "topology", "physical_package_id")):
+        cpu = int(os.path.basename(os.path.dirname(os.path.dirname(path)))[3:])
+        try:
+            with open(path) as f:
+                sockets[cpu] = int(f.read())
+        except (OSError, ValueError):
+            pass
+    nodes = {}
+    for path in glob.glob(os.path.join(root, "node", "node[0-9]*", "cpulist")):
+        node = int(os.path.basename(os.path.dirname(path))[4:])
+        try:
+            with open(path) as f:
+                cpus = _parse_cpulist(f.read())
+        except (OSError, ValueError):
+            continue
+        nodes.update(dict.fromkeys(cpus, node))
+    return {"socket": sockets, "numa": nodes}
+
+
+# One pool for the whole process. A statvfs() stuck on a dead mount cannot be
+# cancelled, so the pool is bounded and mounts whose previous call is still
+# running are skipped instead of queueing another thread behind it.
+_executor = ThreadPoolExecutor(max_workers=DISK_USAGE_WORKERS, thread_name_prefix="disk-usage")
+_pending = {}
+_pending_lock = threading.Lock()
+
+
+def _submit(mountpoint):
+    with _pending_lock:
+        future = _pending.get(mountpoint)
+        if future is not None and not future.done():
+            return future, True
+        future = _executor.submit(psutil.disk_usage, mountpoint)
+        _pending[mountpoint] = future
+        return future, False
+
+
+def disk_partitions_usage(timeout=DISK_USAGE_TIMEOUT, all=False):
+    # Returns one dict per partition: {"partition", "usage", "status"} where
+    # status is "ok", "unresponsive" (timed out, or still stuck from an
+    # earlier call) or "unavailable" (permission or OS error)
+    partitions = psutil.disk_partitions(all=all)
+    futures = [(partition,) + _submit(partition.mountpoint) for partition in partitions]
+    # All mounts share one deadline rather than paying the timeout serially
+    wait([future for _, future, stuck in futures if not stuck], timeout=timeout)
+
+    results = []
+    for partition, future, stuck in futures:
+        usage = None
+        if stuck or not future.done():
+            status = "unresponsive"
+        else:
+            try:
+                usage = future.result(timeout=0)
+                status = "ok"
+            except TimeoutError:
+                status = "unresponsive"
+            except OSError:
+                status = "unavailable"
+        results.append({"partition": partition, "usage": usage, "status": status})
+    return results
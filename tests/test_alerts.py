@@ -0,0 +1,139 @@
+import io
+import threading
+
+import pytest
+
+import alerts
+from alerts import AlertEngine, Extreme, Percentile, Rule, WebhookSink, process_values
+
+
+# Rules driven with synthetic timestamps; events are collected by a list sink.
+
+def engine(**spec):
+    spec.setdefault("name", "hot")
+    spec.setdefault("metric", "cpu")
+    spec.setdefault("threshold", 90)
+    events = []
+    return AlertEngine([Rule.from_dict(spec)], [events.append]), events
+
+
+def feed(alert_engine, samples, metric="cpu"):
+    # ``samples``: [(t, value), ...]; returns the states of the events emitted
+    return [event["state"] for t, value in samples for event in alert_engine.observe(t, {metric: value})]
+
+
+def test_hysteresis_resolves_only_past_clear_level():
+    alert_engine, events = engine(clear=80)
+    assert feed(alert_engine, [(0, 95), (1, 85), (2, 89)]) == ["firing"]
+    assert alert_engine.active()[0].name == "hot"
+    assert feed(alert_engine, [(3, 79)]) == ["resolved"]
+    assert not alert_engine.active()
+    assert events[-1]["threshold"] == 80
+
+
+def test_for_delay_and_reset():
+    alert_engine, _ = engine(**{"for": 10})
+    assert feed(alert_engine, [(0, 95), (5, 95)]) == []
+    assert alert_engine.rules[0].state == "pending"
+    # Dipping below the threshold restarts the delay
+    assert feed(alert_engine, [(6, 50), (7, 95), (16, 95)]) == []
+    assert feed(alert_engine, [(17, 95)]) == ["firing"]
+
+
+def test_cooldown_suppresses_refiring():
+    alert_engine, _ = engine(cooldown=60)
+    assert feed(alert_engine, [(0, 95), (1, 50)]) == ["firing", "resolved"]
+    # Fires again within the cooldown: no notification, and so no resolve
+    assert feed(alert_engine, [(2, 95), (3, 50)]) == []
+    assert alert_engine.rules[0].state == "ok"
+    assert feed(alert_engine, [(61, 95)]) == ["firing"]
+
+
+def test_resolves_after_cooldown_has_passed():
+    alert_engine, _ = engine(cooldown=600)
+    assert feed(alert_engine, [(t, 95) for t in range(0, 700, 10)]) == ["firing"]
+    assert feed(alert_engine, [(700, 50)]) == ["resolved"]
+
+
+def test_shared_aggregate_waits_for_coverage():
+    # Both rules use one avg-over-100s instance, trusted from 80 s of samples
+    rules = [Rule("a", "cpu", 50, aggregate="avg", window=100), Rule("b", "cpu", 70, aggregate="avg", window=100)]
+    events = []
+    alert_engine = AlertEngine(rules, [events.append])
+    assert len(alert_engine._aggregates) == 1
+    for t in range(0, 80, 10):
+        alert_engine.observe(t, {"cpu": 60})
+    assert not events
+    alert_engine.observe(80, {"cpu": 60})
+    assert [event["rule"] for event in events] == ["a"]
+
+
+def test_extreme_evicts_old_samples():
+    largest, smallest = Extreme(10), Extreme(10, largest=False)
+    for t, value in [(0, 50), (1, 10), (2, 30), (3, 20)]:
+        largest.add(t, value)
+        smallest.add(t, value)
+    assert (largest.value(), smallest.value()) == (50, 10)
+    largest.add(11, 5)
+    smallest.add(11, 5)
+    assert (largest.value(), smallest.value()) == (30, 5)
+    largest.add(14, 1)
+    assert largest.value() == 5
+
+
+def test_percentile_evicts_old_samples():
+    p90 = Percentile(100, 90)
+    for t in range(100):
+        p90.add(t, 1000.0 if t < 20 else 10.0)
+    assert p90.value() == pytest.approx(1000.0, rel=Percentile.RATIO - 1)
+    for t in range(100, 120):
+        p90.add(t, 10.0)
+    assert p90.value() == pytest.approx(10.0, rel=Percentile.RATIO - 1)
+    assert sum(p90._counts) == len(p90._samples)
+
+
+def test_process_values_report_zero_for_exited_processes():
+    rows = [{"name": "db", "rss": 100, "cpu_percent": 5.0}, {"name": "db", "rss": 50, "cpu_percent": None},
+            {"name": "other", "rss": 1, "cpu_percent": 1.0}]
+    assert process_values(rows, {"db", "gone"}) == {
+        "process:db:rss": 150, "process:db:cpu": 5.0, "process:gone:rss": 0, "process:gone:cpu": 0.0}
+
+
+def test_rule_on_exited_process_resolves():
+    alert_engine, _ = engine(metric="process:db:rss", threshold=100)
+    assert alert_engine.process_names == {"db"}
+    running = process_values([{"name": "db", "rss": 500, "cpu_percent": 0.0}], alert_engine.process_names)
+    assert [event["state"] for event in alert_engine.observe(0, running)] == ["firing"]
+    exited = process_values([], alert_engine.process_names)
+    assert [event["state"] for event in alert_engine.observe(1, exited)] == ["resolved"]
+
+
+def test_failing_sink_does_not_stop_others():
+    events = []
+
+    def broken(event):
+        raise RuntimeError("sink down")
+
+    alert_engine = AlertEngine([Rule("hot", "cpu", 90)], [broken, events.append])
+    alert_engine.observe(0, {"cpu": 95})
+    assert [event["state"] for event in events] == ["firing"]
+
+
+def test_webhook_thread_survives_send_errors(monkeypatch):
+    sent = []
+    done = threading.Event()
+
+    def urlopen(request, timeout):
+        if not sent:
+            sent.append(None)
+            raise RuntimeError("malformed response")
+        sent.append(request.data)
+        done.set()
+        return io.BytesIO()
+
+    monkeypatch.setattr(alerts.urllib.request, "urlopen", urlopen)
+    sink = WebhookSink("http://localhost:9/alerts")
+    sink({"rule": "first"})
+    sink({"rule": "second"})
+    assert done.wait(5)
+    assert sent[1] == b'{"rule": "second"}'
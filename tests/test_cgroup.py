@@ -0,0 +1,118 @@
+import os
+
+import pytest
+
+import cgroup
+import procfs
+from benchmarks.fakeproc import write_cgroup, write_tree
+from collector import make_source
+
+
+# CgroupSource against a fake cgroup v2 directory from benchmarks/fakeproc.py,
+# found through $TASK_MANAGER_CGROUP_PATH, over a procfs source reading a
+# synthetic /proc tree for the host values.
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cgroup.time, "monotonic", lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def host(tmp_path):
+    source = procfs.ProcfsSource(write_tree(str(tmp_path / "proc"), processes=5, cpus=8, nics=1, disks=1))
+    yield source
+    source.close()
+
+
+@pytest.fixture
+def cgroup_path(tmp_path, monkeypatch):
+    path = str(tmp_path / "cgroup")
+    monkeypatch.setenv("TASK_MANAGER_CGROUP_PATH", path)
+    return path
+
+
+def test_cpu_percent_against_quota(host, cgroup_path, clock):
+    write_cgroup(cgroup_path, cpu_quota=200000, cpu_period=100000, usage_usec=10 ** 9)
+    source = cgroup.CgroupSource(host)
+    assert source.path == cgroup_path
+    assert source.cpu_limit() == 2.0
+    clock[0] += 2.0
+    write_cgroup(cgroup_path, usage_usec=10 ** 9 + 2 * 10 ** 6)  # one core for two seconds
+    percent, cores = source.cpu_percent()
+    assert percent == 50.0
+    assert len(cores) == 8  # per-core values are the host's
+
+
+def test_cpu_percent_without_quota(host, cgroup_path, clock):
+    # No quota: measured against the cpuset's CPUs
+    write_cgroup(cgroup_path, cpu_quota=None, cpus="0-1,4-5", usage_usec=10 ** 9)
+    source = cgroup.CgroupSource(host)
+    assert source.cpu_limit() == 4.0
+    clock[0] += 1.0
+    write_cgroup(cgroup_path, cpu_quota=None, cpus="0-1,4-5", usage_usec=10 ** 9 + 10 ** 6)
+    assert source.cpu_percent()[0] == 25.0
+
+
+def test_memory_against_limit(host, cgroup_path):
+    gib, mib = 1024 ** 3, 1024 ** 2
+    write_cgroup(cgroup_path, memory_max=2 * gib, memory_current=gib, inactive_file=128 * mib)
+    memory, swap = cgroup.CgroupSource(host).memory()
+    used = gib - 128 * mib
+    assert memory == procfs.Memory(2 * gib, 2 * gib - used, round(used * 100.0 / (2 * gib), 1), used, gib)
+    # memory.swap.max is "max": the host's swap size
+    assert (swap.total, swap.used) == (host.memory()[1].total, 0)
+
+
+def test_memory_without_limit(host, cgroup_path):
+    write_cgroup(cgroup_path, memory_max=None, memory_current=1024 ** 3, inactive_file=0)
+    memory, _ = cgroup.CgroupSource(host).memory()
+    host_total = host.memory()[0].total
+    assert memory.total == host_total
+    assert memory.percent == round(1024 ** 3 * 100.0 / host_total, 1)
+
+
+def test_throttling_io_and_pressure(host, cgroup_path, clock):
+    write_cgroup(cgroup_path, usage_usec=10 ** 9, nr_periods=1000, nr_throttled=100, throttled_usec=5 * 10 ** 6)
+    source = cgroup.CgroupSource(host)
+    first = source.stats()
+    assert first["throttled_percent"] is None and first["io_read_rate"] is None
+
+    clock[0] += 2.0
+    write_cgroup(cgroup_path, usage_usec=10 ** 9 + 10 ** 6, nr_periods=1100, nr_throttled=125,
+                 throttled_usec=5 * 10 ** 6 + 500000)
+    stats = source.stats()
+    assert stats["cpu_limit"] == 2.0
+    assert stats["throttled_percent"] == 25.0
+    assert stats["throttled_ms_per_s"] == 250.0
+    # Two devices, each 4 bytes read and 2 written per usage microsecond
+    assert stats["io_read_rate"] == 2 * 4 * 10 ** 6 / 2.0
+    assert stats["io_write_rate"] == 2 * 2 * 10 ** 6 / 2.0
+    assert (stats["cpu_some_avg10"], stats["memory_some_avg10"], stats["memory_full_avg10"],
+            stats["io_some_avg10"], stats["io_full_avg10"]) == (1.5, 0.25, 0.1, 3.0, 1.0)
+    assert set(stats) == set(cgroup.METRICS)
+
+
+def test_missing_files_fall_back_to_host(host, cgroup_path, clock):
+    # The root cgroup has no cpu.max, memory.max or memory.current
+    write_cgroup(cgroup_path)
+    for name in ("cpu.max", "memory.max", "memory.current", "cpu.pressure"):
+        os.remove(os.path.join(cgroup_path, name))
+    source = cgroup.CgroupSource(host)
+    assert source.cpu_limit() == 8.0
+    assert source.memory() == host.memory()
+    assert source.stats()["cpu_some_avg10"] is None
+
+
+def test_requires_cgroup_v2(host, tmp_path, monkeypatch):
+    monkeypatch.setenv("TASK_MANAGER_CGROUP_PATH", str(tmp_path))
+    with pytest.raises(RuntimeError):
+        cgroup.CgroupSource(host)
+
+
+def test_make_source_wraps_host_source(cgroup_path):
+    write_cgroup(cgroup_path)
+    source = make_source("cgroup")
+    assert isinstance(source, cgroup.CgroupSource) and source.path == cgroup_path
+    source.close()
@@ -0,0 +1,33 @@
+import procfs
+from benchmarks.fakeproc import write_tree
+from collector import MetricsCollector
+from gpu import FakeNVML
+
+
+def broken_memory():
+    raise ValueError("unparsable meminfo")
+
+
+def test_failing_group_does_not_stall_the_others(tmp_path, caplog):
+    source = procfs.ProcfsSource(write_tree(str(tmp_path / "proc"), processes=5, cpus=2, nics=1, disks=1))
+    source.memory = broken_memory
+    collector = MetricsCollector(source=source, cpu_count=2, gpu_backend=FakeNVML(1))
+    due = {"cpu", "memory", "network", "processes"}
+
+    snapshot = collector.sample(due)
+    assert "cpu_percent" in snapshot and len(snapshot["processes"]) == 5
+    assert "memory" not in snapshot
+    assert collector.snapshot() is snapshot
+    assert len(collector.history("cpu")[0]) == 1
+    assert len(collector.history("memory")[0]) == 0
+
+    schedules = collector.scheduler.schedules
+    assert schedules["memory"].state == "unavailable"
+    assert schedules["memory"].interval > schedules["memory"].base
+    assert schedules["cpu"].state != "unavailable"
+
+    # Logged once, not on every failing tick
+    collector.sample(due)
+    assert len([record for record in caplog.records if "memory" in record.getMessage()]) == 1
+    collector.gpus.close()
+    source.close()
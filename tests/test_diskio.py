@@ -0,0 +1,30 @@
+from collections import namedtuple
+
+from diskio import FIELDS, DeviceFilter, DiskIORates
+
+Counters = namedtuple("Counters", FIELDS)
+
+
+def counters(names, scale=1):
+    return {name: Counters(*(scale * (i + 1) for i in range(len(FIELDS)))) for name in names}
+
+
+def test_cap_applies_without_include(caplog):
+    names = [f"sd{chr(ord('a') + i)}" for i in range(10)]
+    rates = DiskIORates(DeviceFilter(include=""), max_devices=8)
+    for tick in range(3):
+        rates.update(counters(names, tick + 1), float(tick), now=float(tick))
+    assert rates.devices() == names[:8]
+    # Each dropped device is logged once
+    dropped = [record.getMessage() for record in caplog.records]
+    assert len(dropped) == 2 and "sdi" in dropped[0] and "sdj" in dropped[1]
+
+
+def test_include_pattern_is_exempt_from_cap():
+    names = [f"nvme{i}n1" for i in range(12)]
+    rates = DiskIORates(DeviceFilter(include=r"^nvme"), max_devices=8)
+    rates.update(counters(names), 0.0, now=0.0)
+    rates.update(counters(names, 2), 1.0, now=1.0)
+    assert rates.devices() == sorted(names)
+    times, values = rates.history("nvme11n1", "read_bytes")
+    assert values[-1] == 3.0  # read_bytes went from 3 to 6 in one second
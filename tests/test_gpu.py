@@ -0,0 +1,87 @@
+import math
+
+import pynvml
+
+import gpu
+from collector import MetricsCollector
+from gpu import FakeNVML, GpuMonitor
+
+
+# GpuMonitor against FakeNVML, whose values follow a fixed per-device pattern.
+
+def test_samples_every_device():
+    nvml = FakeNVML(3, memory_total=8 * 1024 ** 3)
+    monitor = GpuMonitor(nvml)
+    assert [device.name for device in monitor.devices] == ["Fake GPU 0", "Fake GPU 1", "Fake GPU 2"]
+
+    readings = monitor.sample()
+    assert [reading.index for reading in readings] == [0, 1, 2]
+    for handle, reading in enumerate(readings):
+        assert reading.utilization == (handle * 17 + 7) % 101
+        assert reading.memory_used == 8 * 1024 ** 3 * ((handle * 13 + 3) % 90 + 5) // 100
+        assert reading.memory_total == 8 * 1024 ** 3
+        assert reading.power == 30 + (handle * 11 + 5) % 200
+        assert reading.temperature == 35 + (handle * 5 + 1) % 45
+    assert gpu.average(readings, "utilization") == sum(r.utilization for r in readings) / 3
+    assert gpu.total(readings, "power") == sum(r.power for r in readings)
+
+    # Handles, names and memory sizes were looked up once, at start-up
+    monitor.sample()
+    assert nvml.calls["nvmlDeviceGetHandleByIndex"] == 3
+    assert nvml.calls["nvmlDeviceGetName"] == 3
+    monitor.close()
+    assert not nvml.initialized
+
+
+def test_unsupported_fields_are_missing():
+    nvml = FakeNVML(2, unsupported={"nvmlDeviceGetPowerUsage", "nvmlDeviceGetTemperature"})
+    monitor = GpuMonitor(nvml)
+    for _ in range(3):
+        readings = monitor.sample()
+        assert all(reading.power is None and reading.temperature is None for reading in readings)
+        assert all(reading.utilization is not None and reading.memory_used is not None for reading in readings)
+    # Asked once per device, then remembered as unsupported
+    assert nvml.calls["nvmlDeviceGetPowerUsage"] == 2
+    assert nvml.calls["nvmlDeviceGetTemperature"] == 2
+    assert gpu.total(readings, "power") is None
+    assert gpu.metric_values(readings[0])[2:] == [None, None]
+
+
+class FlakyNVML(FakeNVML):
+    # Fails the first utilisation read with a transient error
+    def nvmlDeviceGetUtilizationRates(self, handle):
+        if not self.calls.get("nvmlDeviceGetUtilizationRates"):
+            self._call("nvmlDeviceGetUtilizationRates", handle)
+            raise pynvml.NVMLError(pynvml.NVML_ERROR_GPU_IS_LOST)
+        return super().nvmlDeviceGetUtilizationRates(handle)
+
+
+def test_transient_errors_are_retried():
+    monitor = GpuMonitor(FlakyNVML(1))
+    assert monitor.sample()[0].utilization is None
+    assert monitor.sample()[0].utilization is not None
+
+
+class NoDriver(FakeNVML):
+    def nvmlInit(self):
+        raise pynvml.NVMLError(pynvml.NVML_ERROR_DRIVER_NOT_LOADED)
+
+
+def test_no_driver_means_no_gpus():
+    monitor = GpuMonitor(NoDriver(2))
+    assert len(monitor) == 0
+    assert monitor.sample() == []
+    monitor.close()
+
+
+def test_collector_records_unsupported_fields_as_nan():
+    collector = MetricsCollector(source=object(), cpu_count=1,
+                                 gpu_backend=FakeNVML(2, unsupported={"nvmlDeviceGetPowerUsage"}))
+    snapshot = collector.sample({"gpu"})
+    assert snapshot["gpu_power"] is None
+    assert snapshot["gpu_utilization"] == gpu.average(snapshot["gpus"], "utilization")
+    _, power = collector.history("gpu/1/power")
+    _, temperature = collector.history("gpu/1/temperature")
+    assert math.isnan(power[-1])
+    assert temperature[-1] == snapshot["gpus"][1].temperature
+    collector.gpus.close()
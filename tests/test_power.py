@@ -0,0 +1,94 @@
+import os
+
+import pytest
+
+import power
+from power import PowerMonitor, estimate_cpu_power, estimate_ram_power
+
+
+# PowerMonitor against a temporary /sys/class/powercap tree, with
+# time.monotonic() advanced by hand.
+
+def write_zone(root, entry, name, energy, max_energy_range=262143328850):
+    path = os.path.join(root, entry)
+    os.makedirs(path, exist_ok=True)
+    for filename, content in (("name", name), ("max_energy_range_uj", max_energy_range), ("energy_uj", energy)):
+        with open(os.path.join(path, filename), "w") as f:
+            f.write(f"{content}\n")
+    return path
+
+
+def set_energy(root, entry, energy):
+    # In place, as the zone keeps energy_uj open
+    with open(os.path.join(root, entry, "energy_uj"), "r+") as f:
+        f.write(f"{energy}\n")
+        f.truncate()
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(power.time, "monotonic", lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def powercap(tmp_path):
+    root = str(tmp_path / "powercap")
+    write_zone(root, "intel-rapl:0", "package-0", 1000000)
+    write_zone(root, "intel-rapl:0:0", "core", 500000)
+    write_zone(root, "intel-rapl:0:1", "dram", 2000000)
+    write_zone(root, "intel-rapl:1", "psys", 9000000)
+    return root
+
+
+def test_watts_from_energy_deltas(powercap, clock):
+    monitor = PowerMonitor(4, root=powercap)
+    assert monitor.has_rapl
+    clock[0] += 2.0
+    set_energy(powercap, "intel-rapl:0", 31000000)  # 30 J in 2 s
+    set_energy(powercap, "intel-rapl:0:1", 6000000)  # 4 J in 2 s
+    set_energy(powercap, "intel-rapl:1", 99000000)  # psys would double count
+    assert monitor.sample(50.0, 2000, 50.0) == (15.0, 2.0, "rapl")
+    monitor.close()
+
+
+def test_counter_wraparound(tmp_path, clock):
+    root = str(tmp_path / "powercap")
+    write_zone(root, "intel-rapl:0", "package-0", 9000000, max_energy_range=10000000)
+    monitor = PowerMonitor(4, root=root)
+    clock[0] += 1.0
+    set_energy(root, "intel-rapl:0", 1000000)
+    cpu_power, _, source = monitor.sample(50.0, 2000, 50.0)
+    assert (cpu_power, source) == (2.0, "rapl")
+    monitor.close()
+
+
+def test_estimate_without_rapl(tmp_path, clock):
+    monitor = PowerMonitor(4, root=str(tmp_path / "missing"))
+    assert not monitor.has_rapl
+    assert monitor.sample(50.0, 3000, 40.0) == (estimate_cpu_power(50.0, 3000, 4), estimate_ram_power(40.0),
+                                                "estimate")
+
+
+def test_unreadable_zone_is_skipped(tmp_path, clock):
+    root = str(tmp_path / "powercap")
+    path = write_zone(root, "intel-rapl:0", "package-0", 0)
+    os.remove(os.path.join(path, "energy_uj"))  # root-only on many kernels
+    monitor = PowerMonitor(4, root=root)
+    assert not monitor.zones
+    assert monitor.sample(50.0, 2000, 50.0)[2] == "estimate"
+
+
+def test_failed_read_falls_back_for_that_tick(powercap, clock):
+    monitor = PowerMonitor(4, root=powercap)
+    clock[0] += 1.0
+    set_energy(powercap, "intel-rapl:0", "")
+    assert monitor.sample(50.0, 2000, 50.0) == (estimate_cpu_power(50.0, 2000, 4), estimate_ram_power(50.0),
+                                                "estimate")
+    clock[0] += 1.0
+    set_energy(powercap, "intel-rapl:0", 3000000)
+    set_energy(powercap, "intel-rapl:0:1", 3000000)
+    # Both deltas span the failed tick: 2 J and 1 J over 2 s
+    assert monitor.sample(50.0, 2000, 50.0) == (1.0, 0.5, "rapl")
+    monitor.close()
@@ -0,0 +1,35 @@
+import numpy as np
+
+from collector import MetricsCollector
+from gpu import FakeNVML
+from timeseries import RingBuffer
+
+
+def test_bucket_averages_into_one_row():
+    buffer = RingBuffer(4, ["a", "b"], bucket=1.0)
+    buffer.append(10.0, [1.0, None])
+    buffer.append(10.25, [3.0, 2.0])
+    buffer.append(10.5, [5.0, None])
+    buffer.append(11.1, [7.0, 7.0])
+    times, values = buffer.window()
+    assert times.tolist() == [10.0, 11.1]
+    assert values.tolist() == [[3.0, 2.0], [7.0, 7.0]]
+
+
+def test_bucket_keeps_window_at_faster_rate():
+    # Four samples per bucket still fit ``capacity`` buckets
+    buffer = RingBuffer(10, ["a"], bucket=1.0)
+    for i in range(80):
+        buffer.append(100.0 + i * 0.25, [float(i)])
+    times, values = buffer.window()
+    assert len(times) == 10
+    assert times[0] == 110.0
+    assert values[-1, 0] == np.mean([76, 77, 78, 79])
+
+
+def test_core_history_sized_by_base_interval():
+    collector = MetricsCollector(interval=1.0, history_seconds=3600, source=object(), cpu_count=4,
+                                 gpu_backend=FakeNVML(0), adaptive=True)
+    assert collector._cores_history.capacity == 3600
+    assert collector._cores_history.bucket == 1.0
+    assert collector._history["cpu"].capacity == 4 * 3600
@@ -0,0 +1,239 @@
+import operator
+import threading
+import time
+
+import numpy as np
+
+
+# Compact in-memory history for the collector.
+#
+# Every row is written twice, at ``i`` and ``i + capacity``, so the most recent
+# ``n`` rows are always one contiguous slice of the backing array. That lets
+# ``window()`` hand out NumPy views instead of copying on every read. One spare
+# row is kept so a full-length view survives the next append untouched.
+#
+# With ``bucket`` set, rows are at most one per ``bucket`` seconds: a value
+# appended within the newest row's bucket is averaged into that row, so
+# ``capacity`` rows cover ``capacity * bucket`` seconds however often the
+# caller samples. (That row changes in place, also in views already handed out.)
+
+class RingBuffer:
+    def __init__(self, capacity, columns, dtype=np.float32, bucket=None):
+        self.capacity = int(capacity)
+        self.columns = list(columns)
+        self.bucket = bucket
+        self._index = {name: i for i, name in enumerate(self.columns)}
+        self._size = self.capacity + 1
+        self._times = np.zeros(2 * self._size, dtype=np.float64)
+        self._values = np.full((2 * self._size, len(self.columns)), np.nan, dtype=dtype)
+        self._head = 0
+        self._count = 0
+        # Samples averaged into the newest row, and that row's bucket number
+        self._folded = 0
+        self._bucket_id = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return min(self._count, self.capacity)
+
+    @property
+    def nbytes(self):
+        return self._times.nbytes + self._values.nbytes
+
+    def append(self, timestamp, values):
+        # ``values`` is either a sequence aligned with ``columns`` or a dict;
+        # missing entries and None are stored as NaN
+        if isinstance(values, dict):
+            row = [values.get(name) for name in self.columns]
+        else:
+            row = values
+        row = np.asarray([np.nan if v is None else v for v in row], dtype=self._values.dtype)
+
+        with self._lock:
+            bucket_id = None if self.bucket is None else int(timestamp // self.bucket)
+            if self._count and bucket_id is not None and bucket_id == self._bucket_id:
+                self._fold(row)
+                return
+            i = self._head
+            self._times[i] = timestamp
+            self._times[i + self._size] = timestamp
+            self._values[i, :len(row)] = row
+            self._values[i + self._size, :len(row)] = row
+            self._head = (i + 1) % self._size
+            self._count += 1
+            self._folded = 1
+            self._bucket_id = bucket_id
+
+    def _fold(self, row):
+        # Running mean into the newest row (which keeps its first timestamp);
+        # NaN on either side leaves the other one. A mean of delta-based
+        # readings (CPU %, byte rates) is what one read per bucket would give.
+        i = (self._head - 1) % self._size
+        n = self._folded
+        current = self._values[i, :len(row)]
+        merged = np.where(np.isnan(current), row, np.where(np.isnan(row), current, current + (row - current) / (n + 1)))
+        self._values[i, :len(row)] = merged
+        self._values[i + self._size, :len(row)] = merged
+        self._folded = n + 1
+
+    def clear(self):
+        # Forget every row but keep the allocation, so the buffer can be reused
+        with self._lock:
+            self._head = 0
+            self._count = 0
+            self._folded = 0
+            self._bucket_id = None
+
+    def _bounds(self, n):
+        end = self._head + self._size if self._head < n else self._head
+        return end - n, end
+
+    def window(self, seconds=None, last=None):
+        # Zero-copy views of the newest rows: ``times`` (n,) and ``values`` (n, columns)
+        with self._lock:
+            n = len(self)
+            if last is not None:
+                n = min(n, int(last))
+            start, end = self._bounds(n)
+            times = self._times[start:end]
+            values = self._values[start:end]
+        if seconds is not None and len(times):
+            cut = np.searchsorted(times, times[-1] - seconds, side="left")
+            times, values = times[cut:], values[cut:]
+        return times, values
+
+    def column(self, name, seconds=None, last=None):
+        times, values = self.window(seconds=seconds, last=last)
+        return times, values[:, self._index[name]]
+
+    def latest(self):
+        with self._lock:
+            if not self._count:
+                return None, None
+            i = (self._head - 1) % self._size
+            return self._times[i], self._values[i].copy()
+
+
+class CounterDeltas:
+    # Deltas of monotonic per-device counters ({name: namedtuple} from psutil
+    # or procfs). All devices are packed into one (devices, fields) array per
+    # tick, so the cost is a few NumPy operations however many devices exist.
+
+    def __init__(self, fields):
+        self.fields = tuple(fields)
+        self._getter = operator.attrgetter(*self.fields)
+        self._names = []
+        self._counters = None
+        self._time = None
+
+    def update(self, counters, now=None):
+        # Returns (names, counters, deltas, elapsed). ``deltas`` rows are NaN
+        # for devices seen for the first time; ``elapsed`` is None on the first
+        # call.
+        now = time.monotonic() if now is None else now
+        width = len(self.fields)
+        names = list(counters)
+        current = np.array([self._row(c) for c in counters.values()], dtype=np.int64)
+        current = current.reshape(len(names), width)
+
+        prev = self._aligned_previous(names)
+        elapsed = now - self._time if self._time is not None else None
+        self._names, self._counters, self._time = names, current, now
+
+        deltas = np.full(current.shape, np.nan)
+        if prev is not None and elapsed and elapsed > 0:
+            delta = current - prev
+            # A counter that went backwards was reset (driver reload, device
+            # re-created, 32-bit wrap); everything counted since is the delta
+            deltas = np.where(delta < 0, current, delta).astype(np.float64)
+            deltas[prev[:, 0] < 0] = np.nan
+        else:
+            elapsed = None
+        return names, current, deltas, elapsed
+
+    def _row(self, counters):
+        # Fields are looked up by name: psutil's tuples differ per platform
+        # (e.g. busy_time is Linux/FreeBSD only) and missing ones count as 0
+        try:
+            return self._getter(counters)
+        except AttributeError:
+            return tuple(getattr(counters, name, 0) for name in self.fields)
+
+    def _aligned_previous(self, names):
+        # Previous counters in the order of ``names``; -1 rows for new devices
+        if self._counters is None:
+            return None
+        if names == self._names:
+            return self._counters
+        index = {name: i for i, name in enumerate(self._names)}
+        prev = np.full((len(names), len(self.fields)), -1, dtype=np.int64)
+        for i, name in enumerate(names):
+            j = index.get(name)
+            if j is not None:
+                prev[i] = self._counters[j]
+        return prev
+
+
+def _finite(x, y):
+    mask = np.isfinite(y)
+    if mask.all():
+        return x, y
+    return x[mask], y[mask]
+
+
+def downsample_minmax(x, y, max_points):
+    # Keep the min and the max of each bucket, in time order, so spikes survive
+    x, y = _finite(np.asarray(x), np.asarray(y))
+    n = len(y)
+    if n <= max_points or max_points < 4:
+        return x, y
+
+    buckets = max_points // 2
+    per_bucket = n // buckets
+    usable = per_bucket * buckets
+    offset = n - usable  # drop the oldest remainder so the newest point is kept
+
+    shaped = y[offset:].reshape(buckets, per_bucket)
+    base = offset + np.arange(buckets) * per_bucket
+    lo = base + shaped.argmin(axis=1)
+    hi = base + shaped.argmax(axis=1)
+
+    idx = np.empty(2 * buckets, dtype=np.intp)
+    idx[0::2] = np.minimum(lo, hi)
+    idx[1::2] = np.maximum(lo, hi)
+    return x[idx], y[idx]
+
+
+def downsample_lttb(x, y, max_points):
+    # Largest-Triangle-Three-Buckets (Steinarsson, 2013)
+    x, y = _finite(np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64))
+    n = len(y)
+    if n <= max_points or max_points < 3:
+        return x, y
+
+    edges = np.linspace(1, n - 1, max_points - 1).astype(np.intp)
+    idx = np.empty(max_points, dtype=np.intp)
+    idx[0] = 0
+    idx[-1] = n - 1
+
+    a = 0
+    for b in range(max_points - 2):
+        start, end = edges[b], edges[b + 1]
+        next_end = edges[b + 2] if b + 2 < len(edges) else n
+        next_start = end
+        avg_x = x[next_start:next_end].mean() if next_end > next_start else x[-1]
+        avg_y = y[next_start:next_end].mean() if next_end > next_start else y[-1]
+
+        bx = x[start:end]
+        by = y[start:end]
+        area = np.abs((x[a] - avg_x) * (by - y[a]) - (x[a] - bx) * (avg_y - y[a]))
+        a = start + int(area.argmax())
+        idx[b + 1] = a
+
+    return x[idx], y[idx]
+
+
+def downsample(x, y, max_points=1000, method="minmax"):
+    if method == "lttb":
+        return downsample_lttb(x, y, max_points)
+    return downsample_minmax(x, y, max_points)